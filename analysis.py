@@ -0,0 +1,214 @@
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# ----------------- خط لوله تحلیل یک شیت -----------------
+# این توابع به Streamlit وابسته نیستند تا بتوان آن‌ها را خارج از مسیر درخواست
+# (مثلاً در پایشگر پوشه یا پردازش پس‌زمینه) هم اجرا کرد.
+
+AVERAGE_COLUMN = 'میانگین نمرات'
+
+
+# ----------------- موتور شناسایی نقش ستون‌ها -----------------
+# عنوان‌ها پیش از تطبیق یکسان‌سازی می‌شوند (ی/ي، ک/ك، نیم‌فاصله و فاصله‌های اضافه)
+# و همه الگوهای هر نقش در یک عبارت منظم کامپایل‌شده بررسی می‌شوند. عددی بودن
+# ستون‌ها هم با یک تبدیل برداری روی بلوک نمونه همه ستون‌ها سنجیده می‌شود.
+
+SUBJECT_PATTERNS = [
+    'قرآن', 'دینی', 'املا', 'انشا', 'ادبیات', 'عربی', 'زبان',
+    'علوم', 'ریاضی', 'اجتماعی', 'تفکر', 'هنر', 'هوش',
+    'کار و فناوری', 'فیزیک', 'شیمی', 'زیست', 'تاریخ', 'جغرافیا'
+]
+CLASS_PATTERNS = ['کلاس', 'class', 'پایه', 'رشته', 'گروه']
+
+DETECTION_SAMPLE_ROWS = 50
+MIN_NUMERIC_VALUES = 6
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه', 'أ': 'ا', 'إ': 'ا',
+    '\u200c': ' ', '\u200f': '', '\u200e': '', 'ـ': '',
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    '٫': '.', '٬': ''
+})
+
+
+def normalize_header(text):
+    """یکسان‌سازی نویسه‌های فارسی/عربی و فاصله‌ها در عنوان ستون"""
+    return ' '.join(str(text).translate(_CHAR_MAP).lower().split())
+
+
+def _compile_patterns(patterns):
+    # فاصله بین کلمات یک الگو اختیاری است (مثلاً «کارو فناوری»)
+    words = sorted((normalize_header(p).split() for p in patterns), key=len, reverse=True)
+    return re.compile('|'.join(r'\s*'.join(re.escape(w) for w in pattern) for pattern in words))
+
+
+SUBJECT_RE = _compile_patterns(SUBJECT_PATTERNS)
+CLASS_RE = _compile_patterns(CLASS_PATTERNS)
+
+
+def numeric_ratios(df, sample_rows=DETECTION_SAMPLE_ROWS):
+    """نسبت مقادیر عددی به مقادیر غیرخالی هر ستون در یک گذر روی بلوک نمونه"""
+    block = df.head(sample_rows)
+    values = block.to_numpy(dtype=object)
+    present = ~pd.isna(values)
+    flat = pd.Series(values.ravel()).astype(str).str.translate(_CHAR_MAP).str.strip()
+    numeric = pd.to_numeric(flat, errors='coerce').notna().to_numpy().reshape(values.shape) & present
+
+    numeric_count = numeric.sum(axis=0)
+    present_count = present.sum(axis=0)
+    ratio = np.divide(numeric_count, present_count, out=np.zeros(len(df.columns)), where=present_count > 0)
+    return pd.DataFrame({'numeric_count': numeric_count, 'numeric_ratio': ratio}, index=df.columns)
+
+
+@dataclass
+class ColumnRoles:
+    """نقش‌های شناسایی‌شده ستون‌ها به همراه امتیاز اطمینان"""
+    subject_columns: list
+    class_column: object
+    name_cols: dict
+    scores: pd.DataFrame
+    confidence: dict
+
+
+def identify_name_columns(df, headers=None):
+    """شناسایی ستون‌های نام و نام خانوادگی"""
+    name_cols = {'نام': None, 'نام خانوادگی': None}
+    headers = headers if headers is not None else [normalize_header(col) for col in df.columns]
+
+    for col, col_str in zip(df.columns, headers):
+        if 'نام' in col_str and 'خانوادگی' in col_str:
+            name_cols['نام خانوادگی'] = col
+        elif 'نام' in col_str and name_cols['نام'] is None:
+            name_cols['نام'] = col
+
+    return name_cols
+
+
+def student_names(df, name_cols):
+    """نام کامل هر دانش‌آموز (یا شناسه جایگزین در نبود ستون نام)"""
+    if name_cols.get('نام') and name_cols.get('نام خانوادگی'):
+        return df[name_cols['نام']].astype(str) + ' ' + df[name_cols['نام خانوادگی']].astype(str)
+    if name_cols.get('نام'):
+        return df[name_cols['نام']].astype(str)
+    return 'دانش‌آموز ' + (df.index + 1).astype(str)
+
+
+def empty_roles():
+    """نقش‌های یک شیت بدون ستون (مثلاً شیت خالی)"""
+    return ColumnRoles(
+        subject_columns=[],
+        class_column=None,
+        name_cols={'نام': None, 'نام خانوادگی': None},
+        scores=pd.DataFrame(),
+        confidence={'subject': 0.0, 'class': 0.0, 'name': 0.0}
+    )
+
+
+def detect_column_roles(df, sample_rows=DETECTION_SAMPLE_ROWS):
+    """شناسایی ستون‌های درس، کلاس و نام در یک گذر"""
+    if len(df.columns) == 0:
+        return empty_roles()
+    headers = [normalize_header(col) for col in df.columns]
+    scores = numeric_ratios(df, sample_rows)
+    scores['subject_header'] = [bool(SUBJECT_RE.search(h)) for h in headers]
+    scores['class_header'] = [bool(CLASS_RE.search(h)) for h in headers]
+
+    # ستون درسی: تطبیق عنوان، و در نبود آن ستون‌های عمدتاً عددی
+    header_match = scores['subject_header'] & (scores.index != AVERAGE_COLUMN)
+    if header_match.any():
+        is_subject = header_match
+        scores['subject'] = np.where(is_subject, 0.6 + 0.4 * scores['numeric_ratio'], 0.0)
+    else:
+        is_subject = (scores['numeric_count'] >= MIN_NUMERIC_VALUES) & (scores['numeric_ratio'] >= 0.5)
+        scores['subject'] = np.where(is_subject, 0.5 * scores['numeric_ratio'], 0.0)
+    subject_columns = list(scores.index[is_subject.to_numpy()])
+
+    # ستون کلاس: تطبیق عنوان، و در نبود آن اولین ستون غیرعددی غیردرسی
+    candidates = ~is_subject & (scores.index != AVERAGE_COLUMN)
+    scores['class'] = np.where(
+        scores['class_header'], 1.0,
+        np.where(candidates & (scores['numeric_ratio'] < 1), 0.5 * (1 - scores['numeric_ratio']), 0.0)
+    )
+    if scores['class_header'].any():
+        class_column = scores.index[scores['class_header'].to_numpy()][0]
+    elif (scores['class'] > 0).any():
+        class_column = scores.index[(scores['class'] > 0).to_numpy()][0]
+    else:
+        class_column = df.columns[0]
+
+    name_cols = identify_name_columns(df, headers)
+    confidence = {
+        'subject': float(scores.loc[subject_columns, 'subject'].mean()) if subject_columns else 0.0,
+        'class': float(scores.loc[class_column, 'class']),
+        'name': 1.0 if name_cols['نام'] is not None else 0.0
+    }
+
+    return ColumnRoles(
+        subject_columns=subject_columns,
+        class_column=class_column,
+        name_cols=name_cols,
+        scores=scores,
+        confidence=confidence
+    )
+
+
+def clean_scores(df, subject_columns):
+    """تبدیل نمرات به عدد و محاسبه میانگین هر دانش‌آموز"""
+    df_clean = df.copy()
+    for col in subject_columns:
+        values = df_clean[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            # ارقام فارسی/عربی در نمرات متنی
+            values = values.astype(str).str.translate(_CHAR_MAP)
+        df_clean[col] = pd.to_numeric(values, errors='coerce')
+
+    df_clean[AVERAGE_COLUMN] = df_clean[subject_columns].mean(axis=1).round(2)
+    df_clean = df_clean.dropna(subset=[AVERAGE_COLUMN])
+    return df_clean
+
+
+@dataclass
+class SheetAnalysis:
+    """نتیجه پیش‌پردازش یک شیت"""
+    df: pd.DataFrame
+    df_clean: pd.DataFrame = None
+    subject_columns: list = field(default_factory=list)
+    class_column: object = None
+    name_cols: dict = field(default_factory=dict)
+    roles: ColumnRoles = None
+    # تفاوت با نسخه قبلی همین شیت (فقط برای فایل‌های دوباره آپلود شده)
+    delta: object = None
+
+
+def prepare_sheet(df, on_stage=None):
+    """اجرای کامل شناسایی ستون‌ها و پاک‌سازی نمرات برای یک شیت
+
+    on_stage: تابع اختیاری که با نام هر مرحله ('detecting'، 'aggregating') صدا زده می‌شود
+    """
+    on_stage = on_stage or (lambda stage: None)
+
+    on_stage('detecting')
+    roles = detect_column_roles(df)
+    if not roles.subject_columns:
+        return SheetAnalysis(df=df, roles=roles)
+
+    on_stage('aggregating')
+    return SheetAnalysis(
+        df=df,
+        df_clean=clean_rows(df, roles),
+        subject_columns=roles.subject_columns,
+        class_column=roles.class_column,
+        name_cols=roles.name_cols,
+        roles=roles
+    )
+
+
+def clean_rows(df, roles):
+    """نمرات پاک‌شده و کلاس یکسان‌شده سطرهای df با نقش‌های داده‌شده"""
+    df_clean = clean_scores(df, roles.subject_columns)
+    df_clean[roles.class_column] = df_clean[roles.class_column].astype(str).str.strip()
+    return df_clean
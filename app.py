@@ -1,9 +1,37 @@
+import time
+
+RUN_STARTED = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
 from io import BytesIO
 import os
+import sys
+import uuid
+
+# ----------------- پروفایل اجرا (فقط مدیر) -----------------
+# پروفایل فقط برای اجرایی که مدیر درخواست کرده روشن می‌شود: همین اسکریپت زیر
+# cProfile دوباره اجرا می‌شود و پروفایل حتی با st.stop یا st.rerun ذخیره می‌شود
+if st.session_state.pop('profile_next_run', False):
+    import profiler
+    profiler.run_profiled(__file__, st.session_state.setdefault('session_id', uuid.uuid4().hex))
+    # اجرای بعدی پروفایل ذخیره‌شده را نمایش می‌دهد
+    st.rerun()
+
+from ingest import (
+    PREFLIGHT_OK, PREFLIGHT_REJECT, PREFLIGHT_WARN, UPLOAD_TYPES, list_sheet_names, preflight_workbook,
+    pyarrow_available, workbook_hash
+)
+
+# کتابخانه‌های سنگین (pandas، plotly و ماژول‌های تحلیل) پس از نمایش بخش آپلود و
+# انتخاب شیت وارد می‌شوند تا اولین نمایش صفحه منتظر آن‌ها نماند.
+
+# ----------------- زمان‌بندی اجرا -----------------
+startup_timings = []
+cold_modules = [m for m in ('pandas', 'plotly.express') if m not in sys.modules]
+
+def mark_stage(stage):
+    """ثبت زمان سپری شده از شروع اجرای اسکریپت تا پایان یک مرحله"""
+    startup_timings.append((stage, (time.perf_counter() - RUN_STARTED) * 1000))
 
 # ----------------- تنظیمات صفحه -----------------
 st.set_page_config(
@@ -15,30 +43,93 @@ st.set_page_config(
 st.title("📊 داشبورد تحلیل کارنامه ترم اول")
 st.markdown("---")
 
+# ----------------- حالت نمایش -----------------
+DISTRICT_MODE = "منطقه (چند مدرسه)"
+view_mode = st.sidebar.radio("حالت نمایش", ["تک مدرسه", DISTRICT_MODE], horizontal=True)
+
+if view_mode == DISTRICT_MODE:
+    import district_view
+    district_view.render()
+    st.stop()
+
 # ----------------- بخش آپلود فایل -----------------
 st.sidebar.header("📁 آپلود فایل جدید")
 
 uploaded_file = st.sidebar.file_uploader(
-    "فایل اکسل کارنامه را انتخاب کنید",
-    type=['xlsx', 'xls'],
-    help="فایل باید ساختار استاندارد کارنامه را داشته باشد"
+    "فایل کارنامه را انتخاب کنید",
+    type=UPLOAD_TYPES,
+    help="فایل اکسل، CSV یا Parquet/Arrow با ساختار استاندارد کارنامه"
 )
 
+# ----------------- پایش پوشه خروجی‌ها -----------------
+# در صورت تنظیم RAVESH_WATCH_DIR، آخرین خروجی سامانه مدرسه در پس‌زمینه پردازش می‌شود
+WATCH_DIR = os.environ.get("RAVESH_WATCH_DIR")
+
+@st.cache_resource
+def get_watcher(directory):
+    """ایجاد یک پایشگر مشترک برای همه نشست‌ها"""
+    from watcher import WorkbookWatcher
+    return WorkbookWatcher(directory).start()
+
+snapshot = None
+
+# ----------------- نمای اشتراکی -----------------
+# نمای ذخیره‌شده با ?view=<شناسه> بدون خواندن فایل و محاسبه دوباره باز می‌شود
+shared_view = None
+view_params = {}
+
+@st.cache_resource
+def get_shared_view(view_id):
+    """بازگشایی مشترک یک نما برای همه نشست‌ها (فایل‌ها به حافظه نگاشت می‌شوند)"""
+    from shared_views import load_view
+    return load_view(view_id)
+
+if uploaded_file is None and st.query_params.get('view'):
+    try:
+        if not pyarrow_available():
+            raise ValueError("برای باز کردن نما، کتابخانه pyarrow را نصب کنید.")
+        shared_view = get_shared_view(st.query_params['view'])
+    except (OSError, ValueError, KeyError) as e:
+        st.error(f"❌ نمای اشتراکی باز نشد: {str(e)}")
+        st.stop()
+    view_params = shared_view.params
+
 # ----------------- مدیریت فایل -----------------
 if uploaded_file is not None:
     # استفاده از فایل آپلود شده
     file_source = "آپلود شده"
     
-    # خواندن فایل
+    # خواندن فهرست شیت‌ها
     try:
-        xls = pd.ExcelFile(BytesIO(uploaded_file.read()))
-        # Reset file pointer
-        uploaded_file.seek(0)
+        sheet_names = list_sheet_names(uploaded_file.getvalue(), uploaded_file.name)
     except Exception as e:
-        st.error(f"❌ خطا در خواندن فایل اکسل: {str(e)}")
+        st.error(f"❌ خطا در خواندن فایل: {str(e)}")
         st.stop()
         
-else:
+elif shared_view is None:
+    if WATCH_DIR and os.path.isdir(WATCH_DIR):
+        watcher = get_watcher(WATCH_DIR)
+        snapshot = watcher.latest()
+        if watcher.pending:
+            st.sidebar.caption(f"⏳ در حال پردازش: {', '.join(sorted(watcher.pending))}")
+        if snapshot is not None:
+            ready_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.ready_at))
+            st.sidebar.caption(f"🔄 پایش خودکار: {snapshot.name} (آماده از {ready_at})")
+        latest_error = watcher.latest_error()
+        if latest_error is not None:
+            st.sidebar.warning(f"⚠️ خطای پایش {latest_error[0]}: {latest_error[1]}")
+
+if uploaded_file is None and shared_view is not None:
+    # استفاده از نمای اشتراکی ذخیره‌شده
+    file_source = f"نمای اشتراکی ({shared_view.view_id})"
+    sheet_names = [shared_view.sheet]
+
+elif uploaded_file is None and snapshot is not None:
+    # استفاده از آخرین نسخه آماده پوشه پایش
+    file_source = f"پوشه پایش ({snapshot.name})"
+    sheet_names = snapshot.sheet_names
+
+elif uploaded_file is None:
     # استفاده از فایل پیش‌فرض
     FILE_NAME = "14040919_1300.xlsx"
     file_source = "پیش‌فرض"
@@ -48,13 +139,32 @@ else:
         st.stop()
     
     try:
-        xls = pd.ExcelFile(FILE_NAME)
+        sheet_names = list_sheet_names(FILE_NAME)
     except Exception as e:
         st.error(f"❌ خطا در خواندن فایل اکسل: {str(e)}")
         st.stop()
 
 st.sidebar.info(f"منبع فایل: **{file_source}**")
 
+# ----------------- نسخه داده -----------------
+# شناسه محتوای فایل برای کلیدهای کش؛ برای هر آپلود فقط یک بار محاسبه می‌شود
+if uploaded_file is not None:
+    if st.session_state.get('data_version_id') != uploaded_file.file_id:
+        st.session_state['data_version_id'] = uploaded_file.file_id
+        st.session_state['data_version'] = workbook_hash(uploaded_file.getvalue())
+    data_version = st.session_state['data_version']
+elif shared_view is not None:
+    data_version = f"view:{shared_view.view_id}"
+elif snapshot is not None:
+    data_version = snapshot.content_hash
+else:
+    file_stat = os.stat(FILE_NAME)
+    file_id = (FILE_NAME, file_stat.st_size, file_stat.st_mtime_ns)
+    if st.session_state.get('data_version_id') != file_id:
+        st.session_state['data_version_id'] = file_id
+        st.session_state['data_version'] = workbook_hash(FILE_NAME)
+    data_version = st.session_state['data_version']
+
 # ----------------- Sidebar -----------------
 with st.sidebar:
     st.markdown("---")
@@ -63,37 +173,254 @@ with st.sidebar:
     # انتخاب شیت
     selected_base = st.selectbox(
         "انتخاب پایه / شیت",
-        xls.sheet_names,
+        sheet_names,
         index=0
     )
+    show_overview = st.toggle(
+        "🗂️ نمای کلی همه پایه‌ها",
+        disabled=len(sheet_names) < 2,
+        help="تعداد دانش‌آموزان، میانگین و ضعیف‌ترین دروس همه شیت‌ها در کنار هم"
+    )
     
     st.markdown("---")
     st.header("ℹ️ اطلاعات فایل")
-    st.write(f"تعداد شیت‌ها: **{len(xls.sheet_names)}**")
-    st.write(f"شیت‌های موجود: {', '.join(xls.sheet_names)}")
+    st.write(f"تعداد شیت‌ها: **{len(sheet_names)}**")
+    st.write(f"شیت‌های موجود: {', '.join(sheet_names)}")
+
+mark_stage("نمایش بخش آپلود و انتخاب شیت")
+
+# ----------------- وارد کردن کتابخانه‌های تحلیل -----------------
+import pandas as pd
+
+from analysis import prepare_sheet
+from report_cards import build_student_records, generate_report_cards_zip, pdf_renderer_available
+from comparison import (
+    CORRECTION_METHODS, DEFAULT_ALPHA, anova_table, class_sufficient_stats, pairwise_table, revise_sufficient_stats
+)
+from correlation import MIN_PAIR_COUNT, class_subject_means, strongest_pairs, subject_correlation
+from normalization import (
+    MODE_RAW, NORMALIZATION_MODES, NORMALIZED_COLUMN, normalized_average, revise_normalized
+)
+from risk import RISK_COLUMN, RiskThresholds, class_baselines, class_risk_summary, revise_baselines, watch_list
+from sketches import DEFAULT_ERROR, build_sketches, merge_sketches, revise_sketches
+from thresholds import RESOLUTIONS, pass_curves, revise_pass_curves
+
+mark_stage("وارد کردن pandas و ماژول‌های تحلیل")
+
+# ----------------- بررسی اولیه ساختار شیت‌ها -----------------
+# فقط عنوان‌ها و چند سطر نمونه خوانده می‌شوند؛ شیت‌های رد شده کامل خوانده نمی‌شوند
+# این بررسی عمداً هم‌زمان با درخواست اجرا می‌شود: سبک است و فهرست شیت‌هایی که به
+# پردازش پس‌زمینه سپرده می‌شوند و پیام رد شیت انتخاب‌شده به نتیجه آن وابسته است
+preflight = None
+
+if snapshot is None and shared_view is None:
+    if st.session_state.get('preflight_version') != data_version:
+        try:
+            if uploaded_file is not None:
+                preflight = preflight_workbook(uploaded_file.getvalue(), uploaded_file.name)
+            else:
+                preflight = preflight_workbook(FILE_NAME)
+        except Exception as e:
+            st.error(f"❌ خطا در خواندن فایل: {str(e)}")
+            st.stop()
+        st.session_state['preflight_version'] = data_version
+        st.session_state['preflight'] = preflight
+    preflight = st.session_state['preflight']
+    
+    status_icons = {PREFLIGHT_OK: '✅', PREFLIGHT_WARN: '⚠️', PREFLIGHT_REJECT: '❌'}
+    with st.sidebar.expander("🛫 بررسی اولیه شیت‌ها"):
+        st.dataframe(
+            pd.DataFrame([{
+                'شیت': p.sheet,
+                'وضعیت': status_icons[p.status],
+                'ردیف‌ها': p.rows,
+                'دروس': len(p.roles.subject_columns),
+                'کلاس': str(p.roles.class_column),
+            } for p in preflight.values()]),
+            hide_index=True
+        )
+        for p in preflight.values():
+            for message in p.messages:
+                st.caption(f"{p.sheet}: {message}")
+    
+    sheet_preflight = preflight.get(selected_base)
+    if sheet_preflight is not None and sheet_preflight.status == PREFLIGHT_REJECT and not show_overview:
+        st.error(f"❌ شیت «{selected_base}» ساختار کارنامه ندارد: {'، '.join(sheet_preflight.messages)}")
+        st.stop()
+
+mark_stage("بررسی اولیه ساختار شیت‌ها")
+
+# ----------------- حافظه نشست -----------------
+# داده‌های سنگین نشست در ثبت مشترک نشست‌ها حساب می‌شوند؛ نشست بیکار روی دیسک
+# ریخته یا رها می‌شود و در اینجا، با بازگشت کاربر، بازسازی می‌شود
+from sessions import POLICY_SPILL, STATUS_DROPPED, SessionRegistry
+
+@st.cache_resource
+def get_session_registry():
+    """ثبت مشترک نشست‌ها با رشته پاک‌سازی نشست‌های بیکار"""
+    return SessionRegistry().start()
+
+session_registry = get_session_registry()
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+# نتایج مشتق‌شده و قابل بازسازی نشست (ماتریس‌ها، خط پایه‌ها، کارنامه‌ها)
+session_cache = st.session_state.setdefault('session_cache', {})
+dropped_job = st.session_state.get('ingest_job')
+# نشست منقضی از ثبت حذف شده است؛ کار پردازش رهاشده آن هم باید کنار گذاشته شود
+if session_registry.resume(session_id) == STATUS_DROPPED or (dropped_job is not None and dropped_job[1].released):
+    st.session_state.pop('ingest_job', None)
+
+# ----------------- پردازش پس‌زمینه فایل آپلود شده -----------------
+# شیت‌ها در پس‌زمینه خوانده می‌شوند و هر شیت به محض آماده شدن قابل استفاده است
+ingest_job = None
+
+if uploaded_file is not None:
+    from background import STAGE_LABELS, IngestJob
+    
+    job_state = st.session_state.get('ingest_job')
+    if job_state is None or job_state[0] != uploaded_file.file_id:
+        previous_results = {}
+        passing_sheets = [
+            sheet for sheet in sheet_names
+            if sheet not in preflight or preflight[sheet].status != PREFLIGHT_REJECT
+        ]
+        if job_state is not None:
+            job_state[1].cancel()
+            # فایل با همان شیت‌های قابل تحلیل احتمالاً نسخه اصلاح‌شده فایل قبلی است
+            if set(job_state[1].sheet_names) == set(passing_sheets):
+                previous_results = dict(job_state[1].results)
+        ingest_job = IngestJob(
+            uploaded_file.getvalue(), passing_sheets, previous=previous_results, file_name=uploaded_file.name,
+            data_version=data_version, previous_version=job_state[1].data_version if previous_results else None
+        )
+        ingest_job.prioritize(selected_base)
+        st.session_state['ingest_job'] = (uploaded_file.file_id, ingest_job.start())
+    ingest_job = st.session_state['ingest_job'][1]
+    ingest_job.prioritize(selected_base)
+    
+    seen_ready = tuple(ingest_job.ready_sheets)
+    seen_done = ingest_job.done
+    
+    @st.fragment(run_every=None if seen_done else 0.5)
+    def show_ingest_progress():
+        """نمایش پیشرفت هر شیت و کنترل لغو"""
+        # با آماده شدن شیت جدید یا پایان کار، کل صفحه دوباره اجرا می‌شود
+        if tuple(ingest_job.ready_sheets) != seen_ready or ingest_job.done != seen_done:
+            st.rerun()
+        
+        st.progress(ingest_job.progress(), text="پردازش فایل آپلود شده")
+        for sheet in ingest_job.sheet_names:
+            st.caption(f"{sheet}: {STAGE_LABELS[ingest_job.stages[sheet]]}")
+        
+        if not ingest_job.done and st.button("⛔ لغو پردازش"):
+            ingest_job.cancel()
+            st.rerun()
+    
+    if not seen_done or len(seen_ready) < len(ingest_job.sheet_names):
+        with st.sidebar:
+            show_ingest_progress()
+
+session_registry.track(session_id, ingest_job, session_cache)
+
+# شیت‌های پردازش‌شده فایل پیش‌فرض برای نسخه فعلی داده (مشترک بین نمای تک‌شیت و نمای کلی)
+if session_cache.get('prepared_sheets', (None,))[0] != data_version:
+    session_cache['prepared_sheets'] = (data_version, {})
+prepared_sheets = session_cache['prepared_sheets'][1]
+
+# ----------------- نمای کلی پایه‌ها -----------------
+# شیت‌های پردازش‌شده دوباره خوانده نمی‌شوند؛ بقیه شیت‌های فایل پیش‌فرض به طور هم‌زمان
+# پردازش می‌شوند و شیت‌های فایل آپلود شده منتظر پردازش پس‌زمینه می‌مانند
+if show_overview:
+    import overview_view
+    
+    if session_cache.get('grade_overview', (None,))[0] != data_version:
+        session_cache['grade_overview'] = (data_version, {})
+    overview_errors = {
+        sheet: '، '.join(p.messages)
+        for sheet, p in (preflight or {}).items() if p.status == PREFLIGHT_REJECT
+    }
+    overview_source, overview_file_name = None, None
+    overview_pending = {}
+    if shared_view is not None:
+        overview_analyses = {shared_view.sheet: shared_view.analysis}
+    elif snapshot is not None:
+        overview_analyses = snapshot.sheets
+        overview_errors.update(snapshot.errors)
+    elif ingest_job is not None:
+        # شیت‌ها فقط یک بار، در پردازش پس‌زمینه، خوانده می‌شوند؛ شیت‌های در حال پردازش
+        # با مرحله فعلی نمایش داده می‌شوند و با آماده شدن هر شیت صفحه به‌روز می‌شود
+        overview_analyses = dict(ingest_job.results)
+        overview_errors.update(ingest_job.errors)
+        for sheet, stage in ingest_job.stages.items():
+            if stage == 'cancelled':
+                overview_errors[sheet] = STAGE_LABELS[stage]
+            elif sheet not in overview_analyses and sheet not in overview_errors:
+                overview_pending[sheet] = STAGE_LABELS[stage]
+    else:
+        # شیت‌هایی که در نمای تک‌شیت پردازش شده‌اند دوباره خوانده نمی‌شوند
+        overview_analyses = dict(prepared_sheets)
+        overview_source = FILE_NAME
+    
+    overview_view.render(
+        sheet_names, session_cache['grade_overview'][1], overview_analyses, overview_errors,
+        overview_source, overview_file_name, pending=overview_pending
+    )
+    st.stop()
 
 # ----------------- بارگذاری شیت انتخابی -----------------
-def load_sheet_data(sheet_name, uploaded_file_obj=None, file_path=None):
+def load_sheet_data(sheet_name, file_path):
     """بارگذاری داده‌های یک شیت"""
     try:
-        if uploaded_file_obj is not None:
-            uploaded_file_obj.seek(0)
-            df = pd.read_excel(BytesIO(uploaded_file_obj.read()), sheet_name=sheet_name)
-        else:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-        return df
+        return pd.read_excel(file_path, sheet_name=sheet_name)
     except Exception as e:
         st.error(f"❌ خطا در خواندن شیت {sheet_name}: {str(e)}")
         return None
 
 # بارگذاری داده‌ها
-if uploaded_file is not None:
-    df = load_sheet_data(selected_base, uploaded_file_obj=uploaded_file)
+if shared_view is not None:
+    sheet_analysis = shared_view.analysis
+    df = sheet_analysis.df
+    # آماره‌های ذخیره‌شده با همان کلیدهای کش نتایج نشست قرار می‌گیرند
+    view_aggregates = shared_view.aggregates
+    view_key = (data_version, shared_view.sheet)
+    if 'correlations' in view_aggregates:
+        session_cache.setdefault('correlations', {})[view_key + (view_params['selected_class'],)] = (
+            view_aggregates['correlations']
+        )
+    if 'risk_baselines' in view_aggregates:
+        session_cache['risk_baselines'] = (view_key, view_aggregates['risk_baselines'])
+    if 'pass_curves' in view_aggregates:
+        session_cache['pass_curves'] = (
+            view_key + (view_params['pass_resolution'],), view_aggregates['pass_curves']
+        )
+elif snapshot is not None:
+    if selected_base in snapshot.errors:
+        st.error(f"❌ خطا در خواندن شیت {selected_base}: {snapshot.errors[selected_base]}")
+        st.stop()
+    sheet_analysis = snapshot.sheets[selected_base]
+    df = sheet_analysis.df
+elif ingest_job is not None:
+    if selected_base in ingest_job.errors:
+        st.error(f"❌ خطا در خواندن شیت {selected_base}: {ingest_job.errors[selected_base]}")
+        st.stop()
+    if not ingest_job.is_ready(selected_base):
+        if ingest_job.cancelled:
+            st.warning("⛔ پردازش فایل لغو شد. برای تحلیل، فایل را دوباره آپلود کنید.")
+        else:
+            st.info(f"⏳ شیت **{selected_base}** در حال پردازش است: {STAGE_LABELS[ingest_job.stages[selected_base]]}")
+        st.stop()
+    sheet_analysis = ingest_job.results[selected_base]
+    df = sheet_analysis.df
+elif selected_base in prepared_sheets:
+    sheet_analysis = prepared_sheets[selected_base]
+    df = sheet_analysis.df
 else:
-    df = load_sheet_data(selected_base, file_path=FILE_NAME)
+    df = load_sheet_data(selected_base, FILE_NAME)
+    
+    if df is None:
+        st.stop()
+    sheet_analysis = prepared_sheets[selected_base] = prepare_sheet(df)
 
-if df is None:
-    st.stop()
+mark_stage("خواندن و پیش‌پردازش شیت")
 
 # نمایش اطلاعات فایل
 with st.expander("🔍 مشاهده اطلاعات فایل آپلود شده", expanded=False):
@@ -107,39 +434,40 @@ with st.expander("🔍 مشاهده اطلاعات فایل آپلود شده",
     
     st.write("نمونه‌ای از داده‌ها:")
     st.dataframe(df.head(), use_container_width=True)
-
-# ----------------- شناسایی خودکار ستون‌های دروس -----------------
-def identify_subject_columns(df):
-    """شناسایی خودکار ستون‌های دروس"""
-    # لیست احتمالی نام دروس
-    subject_patterns = [
-        'قرآن', 'دینی', 'املا', 'انشا', 'ادبیات', 'عربی', 'زبان',
-        'علوم', 'ریاضی', 'اجتماعی', 'تفکر', 'هنر', 'هوش', 
-        'کار و فناوری', 'فیزیک', 'شیمی', 'زیست', 'تاریخ', 'جغرافیا'
-    ]
-    
-    subject_columns = []
-    for col in df.columns:
-        col_str = str(col).strip()
-        for pattern in subject_patterns:
-            if pattern in col_str:
-                subject_columns.append(col)
-                break
-    
-    # اگر ستون درسی پیدا نشد
-    if not subject_columns:
-        for col in df.columns:
-            try:
-                numeric_check = pd.to_numeric(df[col].head(10), errors='coerce')
-                if numeric_check.notna().sum() > 5:
-                    subject_columns.append(col)
-            except:
-                continue
     
-    return subject_columns
+    # میزان اطمینان شناسایی خودکار نقش ستون‌ها
+    roles = sheet_analysis.roles
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("اطمینان ستون‌های درسی", f"{roles.confidence['subject']:.0%}")
+    with col2:
+        st.metric("اطمینان ستون کلاس", f"{roles.confidence['class']:.0%}", help=f"ستون انتخاب شده: {roles.class_column}")
+    with col3:
+        st.metric("اطمینان ستون نام", f"{roles.confidence['name']:.0%}")
 
-# شناسایی دروس
-subject_columns = identify_subject_columns(df)
+# ----------------- تغییرات نسبت به نسخه قبلی -----------------
+if sheet_analysis.delta is not None:
+    sheet_delta = sheet_analysis.delta
+    with st.expander(f"🔁 تغییرات نسبت به نسخه قبلی ({sheet_delta.edit_count} دانش‌آموز)", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("تغییر کرده", len(sheet_delta.changed))
+        with col2:
+            st.metric("اضافه شده", len(sheet_delta.added))
+        with col3:
+            st.metric("حذف شده", len(sheet_delta.removed))
+        with col4:
+            st.metric("بدون تغییر", sheet_delta.unchanged)
+        
+        if not sheet_delta.changes.empty:
+            st.dataframe(sheet_delta.changes, use_container_width=True, hide_index=True)
+        if sheet_delta.added:
+            st.write(f"دانش‌آموزان جدید: {', '.join(sheet_delta.added)}")
+        if sheet_delta.removed:
+            st.write(f"دانش‌آموزان حذف شده: {', '.join(sheet_delta.removed)}")
+
+# ----------------- شناسایی خودکار ستون‌های دروس -----------------
+subject_columns = sheet_analysis.subject_columns
 
 if not subject_columns:
     st.error("❌ هیچ ستون درسی شناسایی نشد! لطفاً مطمئن شوید فایل ساختار صحیحی دارد.")
@@ -147,69 +475,90 @@ if not subject_columns:
 
 st.success(f"✅ {len(subject_columns)} ستون درسی شناسایی شد")
 
-# ----------------- محاسبه میانگین نمرات -----------------
-df_clean = df.copy()
-for col in subject_columns:
-    df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
-
-df_clean['میانگین نمرات'] = df_clean[subject_columns].mean(axis=1).round(2)
-df_clean = df_clean.dropna(subset=['میانگین نمرات'])
+# ----------------- محاسبه میانگین نمرات و شناسایی ستون‌های کلاس و نام -----------------
+df_clean = sheet_analysis.df_clean
+class_column = sheet_analysis.class_column
+name_cols = sheet_analysis.name_cols
 
-# ----------------- شناسایی ستون کلاس -----------------
-def identify_class_column(df):
-    """شناسایی خودکار ستون کلاس"""
-    class_patterns = ['کلاس', 'class', 'پایه', 'رشته', 'گروه']
-    
-    for col in df.columns:
-        col_str = str(col).strip().lower()
-        for pattern in class_patterns:
-            if pattern in col_str:
-                return col
+# ----------------- به‌روزرسانی افزایشی نسخه اصلاح‌شده -----------------
+# آماره‌های تجمیعی نسخه قبلی همین شیت فقط با سطرهای کنار رفته و جایگزین به‌روز و با
+# نسخه جدید داده کلید می‌خورند؛ آنچه قابل انتقال نیست (مثلاً با اضافه شدن کلاس) در
+# ادامه از نو ساخته می‌شود
+revision = sheet_analysis.delta
+if revision is not None and revision.base_version not in (None, data_version):
+    previous_key = (revision.base_version, selected_base)
+    aggregate_columns = subject_columns + ['میانگین نمرات']
     
-    # اگر پیدا نشد
-    for col in df.columns:
-        if col not in subject_columns and col != 'میانگین نمرات':
-            try:
-                pd.to_numeric(df[col].head(10), errors='raise')
-            except:
-                return col
+    cached = session_cache.get('sketches')
+    if cached is not None and cached[0][:2] == previous_key:
+        session_cache['sketches'] = (
+            (data_version, selected_base) + cached[0][2:],
+            revise_sketches(
+                cached[1], revision.retracted, revision.inserted, df_clean, class_column, aggregate_columns,
+                error=cached[0][2]
+            )
+        )
     
-    return df.columns[0]
-
-class_column = identify_class_column(df_clean)
-df_clean[class_column] = df_clean[class_column].astype(str).str.strip()
-
-# ----------------- شناسایی ستون‌های نام -----------------
-def identify_name_columns(df):
-    """شناسایی ستون‌های نام و نام خانوادگی"""
-    name_cols = {'نام': None, 'نام خانوادگی': None}
+    cached = session_cache.get('pass_curves')
+    if cached is not None and cached[0][:2] == previous_key:
+        revised_curves = revise_pass_curves(cached[1], revision.retracted, revision.inserted, class_column)
+        if revised_curves is not None:
+            session_cache['pass_curves'] = ((data_version, selected_base) + cached[0][2:], revised_curves)
     
-    for col in df.columns:
-        col_str = str(col).strip().lower()
-        if 'نام' in col_str and 'خانوادگی' in col_str:
-            name_cols['نام خانوادگی'] = col
-        elif 'نام' in col_str and name_cols['نام'] is None:
-            name_cols['نام'] = col
+    cached = session_cache.get('class_tests')
+    if cached is not None and cached[0] == previous_key:
+        revised_stats = revise_sufficient_stats(cached[1], revision.retracted, revision.inserted, class_column)
+        if revised_stats is not None:
+            session_cache['class_tests'] = ((data_version, selected_base), revised_stats)
     
-    return name_cols
+    cached = session_cache.get('risk_baselines')
+    if cached is not None and cached[0] == previous_key:
+        revised_baselines = revise_baselines(cached[1], revision.retracted, revision.inserted, class_column)
+        if revised_baselines is not None:
+            session_cache['risk_baselines'] = ((data_version, selected_base), revised_baselines)
+            # امتیازهای نرمال‌شده سطرهای کلاس‌های تغییرکرده دوباره محاسبه می‌شوند
+            cached = session_cache.get('normalized')
+            if cached is not None and cached[0] == previous_key and revision.aligned:
+                revision_classes = revision.affected_classes(class_column)
+                session_cache['normalized'] = ((data_version, selected_base), {
+                    mode: revise_normalized(
+                        values, df_clean, class_column, subject_columns, mode, revised_baselines, revision_classes
+                    )
+                    for mode, values in cached[1].items()
+                })
+
+# ----------------- خلاصه‌های چندکی -----------------
+# میانه و چارک‌ها برای هر ترکیبی از کلاس‌ها با ادغام خلاصه‌ها به دست می‌آیند
+BOX_POINTS_LIMIT = 5000
 
-name_cols = identify_name_columns(df_clean)
+sketch_error = st.session_state.get('sketch_error', view_params.get('sketch_error', DEFAULT_ERROR))
+# خلاصه‌ها برای هر شیت و خطای مجاز یک بار ساخته می‌شوند؛ اجراهای بعدی فقط ادغام می‌کنند
+sketches_key = (data_version, selected_base, sketch_error)
+if session_cache.get('sketches', (None,))[0] != sketches_key:
+    session_cache['sketches'] = (
+        sketches_key,
+        build_sketches(df_clean, class_column, subject_columns + ['میانگین نمرات'], error=sketch_error)
+    )
+sketches = session_cache['sketches'][1]
 
 # ----------------- انتخاب کلاس -----------------
 classes = sorted(df_clean[class_column].dropna().unique())
 
 with st.sidebar:
     st.markdown("---")
+    class_options = ["همه کلاس‌ها"] + list(classes)
     selected_class = st.selectbox(
         "انتخاب کلاس",
-        ["همه کلاس‌ها"] + list(classes),
-        index=0
+        class_options,
+        index=class_options.index(view_params['selected_class']) if view_params.get('selected_class') in class_options else 0
     )
 
 if selected_class != "همه کلاس‌ها":
     df_filtered = df_clean[df_clean[class_column] == selected_class].copy()
+    filtered_classes = [selected_class]
 else:
     df_filtered = df_clean.copy()
+    filtered_classes = list(classes)
 
 # ----------------- شاخص‌های کلیدی -----------------
 st.subheader("📊 شاخص‌های عملکردی")
@@ -237,25 +586,58 @@ with col5:
 
 st.markdown("---")
 
+# ----------------- وارد کردن plotly -----------------
+# plotly فقط زمانی وارد می‌شود که اولین نمودار لازم است
+import plotly.express as px
+import plotly.graph_objects as go
+
+import charts
+from figure_cache import FigureCache
+
+@st.cache_resource
+def get_figure_cache():
+    """کش نمودارهای مشترک بین نشست‌ها"""
+    return FigureCache()
+
+figure_cache = get_figure_cache()
+figure_key = (data_version, selected_base, selected_class)
+
+# ----------------- کش پایدار نتایج -----------------
+# جدول‌های مشتق‌شده روی دیسک نگه داشته می‌شوند و پس از راه‌اندازی دوباره سرور گرم می‌مانند
+from result_cache import ResultCache
+
+@st.cache_resource
+def get_result_cache():
+    """کش نتایج روی دیسک، مشترک بین نشست‌ها"""
+    return ResultCache()
+
+result_cache = get_result_cache()
+
+mark_stage("وارد کردن plotly")
+
 # ----------------- تحلیل تک‌تک دروس -----------------
 st.subheader("📚 تحلیل عملکرد درسی")
 
-# محاسبه آمار هر درس
-subject_stats = []
-for subject in subject_columns:
-    if subject in df_filtered.columns:
-        stats = {
-            'درس': subject,
-            'میانگین': df_filtered[subject].mean(),
-            'بیشترین': df_filtered[subject].max(),
-            'کمترین': df_filtered[subject].min(),
-            'انحراف معیار': df_filtered[subject].std(),
-            'تعداد نمره': df_filtered[subject].count()
-        }
-        subject_stats.append(stats)
+# محاسبه آمار هر درس از ادغام خلاصه‌های کلاس‌های انتخاب‌شده (بدون گذر روی سطرها)
+def build_subject_stats():
+    subject_stats = []
+    for subject in subject_columns:
+        if subject in df_filtered.columns:
+            sketch = merge_sketches(sketches, filtered_classes, subject)
+            stats = {
+                'درس': subject,
+                'میانگین': sketch.mean(),
+                'بیشترین': sketch.max if sketch.n else None,
+                'کمترین': sketch.min if sketch.n else None,
+                'انحراف معیار': sketch.std(),
+                'تعداد نمره': sketch.n
+            }
+            subject_stats.append(stats)
+    return pd.DataFrame(subject_stats).round(2)
+
+subject_df = result_cache.get_or_build(figure_key + ('subject_stats',), build_subject_stats)
 
-if subject_stats:
-    subject_df = pd.DataFrame(subject_stats).round(2)
+if not subject_df.empty:
     subject_df_sorted = subject_df.sort_values('میانگین', ascending=False)
     
     # نمایش تحلیل دروس
@@ -263,19 +645,10 @@ if subject_stats:
     
     with col1:
         # نمودار میانگین دروس
-        fig_subjects = px.bar(
-            subject_df_sorted,
-            x='درس',
-            y='میانگین',
-            title='میانگین نمره هر درس',
-            color='میانگین',
-            color_continuous_scale='RdYlGn',
-            text='میانگین'
-        )
-        fig_subjects.update_layout(
-            xaxis_tickangle=-45,
-            height=400
-        )
+        def build_subjects_figure():
+            return charts.subject_bar(subject_df_sorted)
+        
+        fig_subjects = figure_cache.get_or_build(figure_key + ('subjects',), build_subjects_figure)
         st.plotly_chart(fig_subjects, use_container_width=True)
     
     with col2:
@@ -288,11 +661,24 @@ if subject_stats:
 else:
     st.warning("⚠️ هیچ آمار درسی برای نمایش وجود ندارد.")
 
+# ----------------- خط پایه کلاس‌ها -----------------
+# میانگین و انحراف معیار هر درس در هر کلاس برای هر شیت یک بار محاسبه می‌شود و
+# رتبه‌بندی نرمال‌شده و فهرست مراقبت هر دو از آن استفاده می‌کنند
+baseline_key = (data_version, selected_base)
+if session_cache.get('risk_baselines', (None,))[0] != baseline_key:
+    session_cache['risk_baselines'] = (
+        baseline_key, class_baselines(df_clean, class_column, subject_columns)
+    )
+baselines = session_cache['risk_baselines'][1]
+
 # ----------------- تب‌های اصلی -----------------
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
     "📈 توزیع نمرات", 
     "🏫 مقایسه کلاس‌ها", 
+    "🔗 همبستگی دروس",
     "🥇 رتبه‌بندی", 
+    "🚨 در معرض خطر",
+    "🎚️ سناریوی نمره قبولی",
     "📋 داده خام",
     "⚙️ تنظیمات پیشرفته"
 ])
@@ -304,18 +690,10 @@ with tab1:
     with col1:
         # هیستوگرام
         if not df_filtered.empty:
-            fig_hist = px.histogram(
-                df_filtered,
-                x='میانگین نمرات',
-                nbins=15,
-                title='توزیع میانگین نمرات',
-                color_discrete_sequence=['#2E86AB'],
-                opacity=0.8
-            )
-            fig_hist.update_layout(
-                xaxis_title='میانگین نمرات',
-                yaxis_title='تعداد دانش‌آموزان'
-            )
+            def build_hist_figure():
+                return charts.average_histogram(df_filtered)
+            
+            fig_hist = figure_cache.get_or_build(figure_key + ('hist',), build_hist_figure)
             st.plotly_chart(fig_hist, use_container_width=True)
         else:
             st.warning("داده‌ای برای نمایش هیستوگرام وجود ندارد.")
@@ -323,19 +701,40 @@ with tab1:
     with col2:
         # نمودار جعبه‌ای
         if not df_filtered.empty and len(df_filtered) > 1:
-            fig_box = px.box(
-                df_filtered,
-                y='میانگین نمرات',
-                title='پراکندگی نمرات',
-                points='all',
-                color_discrete_sequence=['#A23B72']
-            )
-            fig_box.update_layout(height=400)
+            average_sketch = merge_sketches(sketches, filtered_classes, 'میانگین نمرات')
+            
+            def build_box_figure():
+                if len(df_filtered) <= BOX_POINTS_LIMIT:
+                    fig_box = px.box(
+                        df_filtered,
+                        y='میانگین نمرات',
+                        title='پراکندگی نمرات',
+                        points='all',
+                        color_discrete_sequence=['#A23B72']
+                    )
+                else:
+                    # برای داده‌های بزرگ، جعبه از چارک‌های خلاصه رسم می‌شود
+                    q1, median, q3 = average_sketch.quantile([0.25, 0.5, 0.75])
+                    iqr = q3 - q1
+                    fig_box = go.Figure(go.Box(
+                        name='میانگین نمرات',
+                        q1=[q1],
+                        median=[median],
+                        q3=[q3],
+                        lowerfence=[max(average_sketch.min, q1 - 1.5 * iqr)],
+                        upperfence=[min(average_sketch.max, q3 + 1.5 * iqr)],
+                        marker_color='#A23B72'
+                    ))
+                    fig_box.update_layout(title='پراکندگی نمرات')
+                fig_box.update_layout(height=400)
+                return fig_box
+            
+            fig_box = figure_cache.get_or_build(figure_key + ('box', sketch_error), build_box_figure)
             st.plotly_chart(fig_box, use_container_width=True)
             
             # نمایش آمار توصیفی
             st.write("📊 آمار توصیفی:")
-            desc_stats = df_filtered['میانگین نمرات'].describe().round(2)
+            desc_stats = average_sketch.describe().round(2)
             st.write(desc_stats)
         else:
             st.warning("داده کافی برای نمودار جعبه‌ای وجود ندارد.")
@@ -345,30 +744,32 @@ with tab2:
     if selected_class == "همه کلاس‌ها":
         if len(df_clean[class_column].unique()) > 1:
             # محاسبه آمار برای هر کلاس
-            class_stats = df_clean.groupby(class_column)['میانگین نمرات'].agg([
-                ('تعداد', 'count'),
-                ('میانگین', 'mean'),
-                ('انحراف معیار', 'std'),
-                ('کمترین', 'min'),
-                ('میانه', 'median'),
-                ('بیشترین', 'max')
-            ]).round(2).reset_index()
+            def build_class_stats():
+                # همه ستون‌ها از خلاصه‌های چندکی هر کلاس (بدون گذر روی سطرها یا مرتب‌سازی)
+                class_sketches = [sketches[(cls, 'میانگین نمرات')] for cls in classes]
+                class_stats = pd.DataFrame({
+                    class_column: classes,
+                    'تعداد': [sketch.n for sketch in class_sketches],
+                    'میانگین': [sketch.mean() for sketch in class_sketches],
+                    'انحراف معیار': [sketch.std() for sketch in class_sketches],
+                    'کمترین': [sketch.min for sketch in class_sketches],
+                    'میانه': [sketch.quantile(0.5) for sketch in class_sketches],
+                    'بیشترین': [sketch.max for sketch in class_sketches],
+                })
+                return class_stats.round(2).sort_values('میانگین', ascending=False)
             
-            class_stats = class_stats.sort_values('میانگین', ascending=False)
+            class_stats = result_cache.get_or_build(
+                (data_version, selected_base, 'class_stats', sketch_error), build_class_stats
+            )
             
             col1, col2 = st.columns(2)
             
             with col1:
                 # نمودار مقایسه کلاس‌ها
-                fig_class = px.bar(
-                    class_stats,
-                    x=class_column,
-                    y='میانگین',
-                    title='میانگین نمره هر کلاس',
-                    color='میانگین',
-                    text='میانگین',
-                    color_continuous_scale='plasma'
-                )
+                def build_class_figure():
+                    return charts.class_bar(class_stats, class_column)
+                
+                fig_class = figure_cache.get_or_build((data_version, selected_base, 'class'), build_class_figure)
                 st.plotly_chart(fig_class, use_container_width=True)
             
             with col2:
@@ -379,38 +780,177 @@ with tab2:
                     use_container_width=True,
                     hide_index=True
                 )
+            
+            # آزمون معناداری تفاوت کلاس‌ها از آماره‌های بسنده هر کلاس
+            st.markdown("#### 🧪 آیا تفاوت کلاس‌ها معنادار است؟")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                correction = st.selectbox(
+                    "روش تصحیح مقایسه‌های چندگانه",
+                    list(CORRECTION_METHODS),
+                    format_func=CORRECTION_METHODS.get
+                )
+            with col2:
+                alpha = st.select_slider("سطح معناداری", options=[0.01, 0.05, 0.1], value=DEFAULT_ALPHA)
+            with col3:
+                only_significant = st.checkbox("فقط جفت‌های معنادار", value=True)
+            
+            stats_key = (data_version, selected_base)
+            if session_cache.get('class_tests', (None,))[0] != stats_key:
+                session_cache['class_tests'] = (
+                    stats_key,
+                    class_sufficient_stats(df_clean, class_column, subject_columns + ['میانگین نمرات'])
+                )
+            class_test_stats = session_cache['class_tests'][1]
+            
+            st.write("📊 تحلیل واریانس یک‌طرفه (ANOVA) هر درس:")
+            st.dataframe(anova_table(class_test_stats, alpha), use_container_width=True, hide_index=True)
+            
+            pairwise_df = pairwise_table(class_test_stats, correction, alpha)
+            significant_count = int(pairwise_df['معنادار'].sum())
+            st.write(
+                f"🔀 آزمون t ولش برای {len(pairwise_df)} مقایسه جفتی "
+                f"({significant_count} مقایسه معنادار پس از تصحیح):"
+            )
+            if only_significant:
+                pairwise_df = pairwise_df[pairwise_df['معنادار']]
+            st.dataframe(
+                pairwise_df.sort_values('p تصحیح‌شده'),
+                use_container_width=True,
+                height=400,
+                hide_index=True
+            )
+            st.download_button(
+                "🧪 دانلود نتایج مقایسه جفتی (CSV)",
+                data=pairwise_df.to_csv(index=False, encoding='utf-8-sig'),
+                file_name=f"مقایسه_کلاس‌ها_{selected_base}.csv",
+                mime="text/csv"
+            )
         else:
             st.info("فقط یک کلاس در داده‌ها وجود دارد.")
     else:
         st.info(f"📌 در حال مشاهده کلاس **{selected_class}** هستید. برای مقایسه کلاس‌ها، گزینه 'همه کلاس‌ها' را انتخاب کنید.")
 
-# ---------- تب ۳: رتبه‌بندی ----------
+# ---------- تب ۳: همبستگی دروس ----------
 with tab3:
+    # ماتریس‌ها برای هر شیت و فیلتر کلاس یک بار محاسبه می‌شوند
+    correlation_cache = session_cache.setdefault('correlations', {})
+    if figure_key not in correlation_cache:
+        for key in [k for k in correlation_cache if k[0] != data_version]:
+            del correlation_cache[key]
+        correlation_cache[figure_key] = (
+            subject_correlation(df_filtered, subject_columns),
+            class_subject_means(df_filtered, class_column, subject_columns)
+        )
+    subject_corr, class_means = correlation_cache[figure_key]
+    
+    if len(subject_columns) > 1 and len(df_filtered) >= MIN_PAIR_COUNT:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            def build_correlation_figure():
+                return charts.correlation_heatmap(subject_corr.corr)
+            
+            fig_corr = figure_cache.get_or_build(figure_key + ('corr',), build_correlation_figure)
+            st.plotly_chart(fig_corr, use_container_width=True)
+        with col2:
+            st.write("🔗 جفت دروس با بیشترین همبستگی:")
+            st.dataframe(strongest_pairs(subject_corr.corr), use_container_width=True, hide_index=True)
+        
+        with st.expander("📐 ماتریس کوواریانس"):
+            st.dataframe(subject_corr.cov.round(2), use_container_width=True)
+    else:
+        st.warning("داده کافی برای محاسبه همبستگی دروس وجود ندارد.")
+    
+    if not class_means.empty:
+        def build_heatmap_figure():
+            return charts.class_subject_heatmap(class_means)
+        
+        fig_heat = figure_cache.get_or_build(figure_key + ('heatmap',), build_heatmap_figure)
+        st.plotly_chart(fig_heat, use_container_width=True)
+
+# ---------- تب ۴: رتبه‌بندی ----------
+with tab4:
+    ranking_mode = st.radio(
+        "مبنای رتبه‌بندی",
+        list(NORMALIZATION_MODES),
+        index=list(NORMALIZATION_MODES).index(view_params.get('ranking_mode', MODE_RAW)),
+        format_func=NORMALIZATION_MODES.get,
+        horizontal=True,
+        help="در حالت‌های نرمال‌شده، نمره هر درس ابتدا نسبت به همان درس در کلاس دانش‌آموز سنجیده می‌شود "
+             "تا سخت‌گیری یا آسان‌گیری معلم هر کلاس در رتبه کل پایه اثر نگذارد"
+    )
+    
     if not df_filtered.empty:
-        # آماده‌سازی داده برای رتبه‌بندی
-        ranking_df = df_filtered.copy()
-        
-        # ایجاد نام کامل
-        full_name = ""
-        if name_cols['نام'] and name_cols['نام خانوادگی']:
-            if name_cols['نام'] in ranking_df.columns and name_cols['نام خانوادگی'] in ranking_df.columns:
-                ranking_df['نام کامل'] = ranking_df[name_cols['نام']].astype(str) + ' ' + ranking_df[name_cols['نام خانوادگی']].astype(str)
-                full_name = 'نام کامل'
-        elif name_cols['نام']:
-            if name_cols['نام'] in ranking_df.columns:
-                ranking_df['نام کامل'] = ranking_df[name_cols['نام']].astype(str)
-                full_name = 'نام کامل'
-        
-        if not full_name:
-            ranking_df['شناسه'] = 'دانش‌آموز ' + (ranking_df.index + 1).astype(str)
-            full_name = 'شناسه'
-        
-        # مرتب‌سازی و رتبه‌بندی
-        ranking_df = ranking_df.sort_values('میانگین نمرات', ascending=False)
-        ranking_df['رتبه'] = range(1, len(ranking_df) + 1)
+        # جدول رتبه‌بندی در کش پایدار نتایج نگه داشته می‌شود
+        rank_column = 'میانگین نمرات' if ranking_mode == MODE_RAW else NORMALIZED_COLUMN
+        
+        def normalized_scores():
+            # امتیاز نرمال‌شده کل شیت برای هر حالت یک بار محاسبه می‌شود؛ جابه‌جایی بین
+            # حالت‌ها یا کلاس‌ها فقط مرتب‌سازی دوباره است
+            if session_cache.get('normalized', (None,))[0] != baseline_key:
+                session_cache['normalized'] = (baseline_key, {})
+            normalized = session_cache['normalized'][1]
+            if ranking_mode not in normalized:
+                normalized[ranking_mode] = normalized_average(
+                    df_clean, class_column, subject_columns, ranking_mode, baselines
+                )
+            return normalized[ranking_mode]
+        
+        def ranking_rows(rows):
+            """سطرهای جدول رتبه‌بندی با نام کامل دانش‌آموز"""
+            ranking_df = rows.copy()
+            
+            # ایجاد نام کامل
+            full_name = ""
+            if name_cols['نام'] and name_cols['نام خانوادگی']:
+                if name_cols['نام'] in ranking_df.columns and name_cols['نام خانوادگی'] in ranking_df.columns:
+                    ranking_df['نام کامل'] = ranking_df[name_cols['نام']].astype(str) + ' ' + ranking_df[name_cols['نام خانوادگی']].astype(str)
+                    full_name = 'نام کامل'
+            elif name_cols['نام']:
+                if name_cols['نام'] in ranking_df.columns:
+                    ranking_df['نام کامل'] = ranking_df[name_cols['نام']].astype(str)
+                    full_name = 'نام کامل'
+            
+            if not full_name:
+                ranking_df['شناسه'] = 'دانش‌آموز ' + (ranking_df.index + 1).astype(str)
+                full_name = 'شناسه'
+            return ranking_df, full_name
+        
+        def rank(ranking_df):
+            if ranking_mode != MODE_RAW:
+                ranking_df[NORMALIZED_COLUMN] = normalized_scores().reindex(ranking_df.index).round(3)
+            # مرتب‌سازی و رتبه‌بندی
+            ranking_df = ranking_df.sort_values([rank_column, 'میانگین نمرات'], ascending=False)
+            ranking_df['رتبه'] = range(1, len(ranking_df) + 1)
+            return ranking_df
+        
+        def build_ranking():
+            # آماده‌سازی داده برای رتبه‌بندی
+            ranking_df, full_name = ranking_rows(df_filtered)
+            return rank(ranking_df), full_name
+        
+        ranking_key = figure_key + ('ranking', ranking_mode)
+        previous_ranking = None
+        if revision is not None and revision.aligned and revision.base_version not in (None, data_version):
+            previous_ranking = result_cache.get((revision.base_version,) + ranking_key[1:])
+        
+        if previous_ranking is not None:
+            def revise_ranking():
+                # فقط سطرهای تغییرکرده جایگزین می‌شوند و جدول دوباره مرتب می‌شود
+                previous_df, full_name = previous_ranking
+                kept = previous_df.drop(index=previous_df.index.intersection(revision.retracted.index))
+                inserted = revision.inserted
+                if selected_class != "همه کلاس‌ها":
+                    inserted = inserted[inserted[class_column] == selected_class]
+                inserted, _ = ranking_rows(inserted)
+                return rank(pd.concat([kept.drop(columns='رتبه'), inserted])), full_name
+            
+            ranking_df, full_name = result_cache.get_or_build(ranking_key, revise_ranking)
+        else:
+            ranking_df, full_name = result_cache.get_or_build(ranking_key, build_ranking)
         
         # نمایش جدول رتبه‌بندی
-        display_cols = ['رتبه', full_name, 'میانگین نمرات', class_column]
+        display_cols = ['رتبه', full_name, rank_column, 'میانگین نمرات', class_column]
         
         # اضافه کردن حداکثر ۳ درس اول
         subject_display = []
@@ -435,24 +975,94 @@ with tab3:
             top_count = min(5, len(ranking_df))
             top_n = ranking_df.head(top_count)
             
-            fig_top = px.bar(
-                top_n,
-                x=full_name,
-                y='میانگین نمرات',
-                title=f'{top_count} دانش‌آموز برتر',
-                text='میانگین نمرات',
-                color='میانگین نمرات',
-                color_continuous_scale='RdYlGn'
-            )
-            fig_top.update_layout(xaxis_tickangle=-45)
+            def build_top_figure():
+                return charts.top_bar(top_n, full_name, rank_column)
+            
+            fig_top = figure_cache.get_or_build(figure_key + ('top', ranking_mode), build_top_figure)
             st.plotly_chart(fig_top, use_container_width=True)
         else:
             st.info("تعداد دانش‌آموزان برای نمایش نمودار برترین‌ها کافی نیست.")
     else:
         st.warning("داده‌ای برای رتبه‌بندی وجود ندارد.")
 
-# ---------- تب ۴: داده خام ----------
-with tab4:
+# ---------- تب ۵: دانش‌آموزان در معرض خطر ----------
+with tab5:
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        pass_mark = st.slider("نمره قبولی هر درس", 0.0, 20.0, view_params.get('pass_mark', 10.0), 0.5)
+    with col2:
+        min_average = st.slider("حداقل میانگین قابل قبول", 0.0, 20.0, view_params.get('min_average', 12.0), 0.5)
+    with col3:
+        max_failed = st.slider(
+            "حداکثر تعداد درس مردودی", 1, max(len(subject_columns), 2), view_params.get('max_failed', 2)
+        )
+    with col4:
+        z_threshold = st.slider(
+            "آستانه افت نسبت به کلاس (نمره z)", -3.0, 0.0, view_params.get('z_threshold', -1.5), 0.1,
+            help="نمره درسی که به این اندازه انحراف معیار زیر میانگین همان درس در کلاس باشد ضعیف شمرده می‌شود"
+        )
+    
+    thresholds = RiskThresholds(
+        pass_mark=pass_mark, min_average=min_average, max_failed=max_failed, z_threshold=z_threshold
+    )
+    risk_df = watch_list(df_filtered, class_column, subject_columns, name_cols, baselines, thresholds)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.write(f"🚨 {len(risk_df)} دانش‌آموز از {len(df_filtered)} نفر در فهرست مراقبت:")
+        st.dataframe(risk_df, use_container_width=True, height=400, hide_index=True)
+    with col2:
+        st.write("📋 به تفکیک کلاس:")
+        st.dataframe(
+            class_risk_summary(risk_df, df_filtered, class_column),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.metric("بالاترین امتیاز خطر", int(risk_df[RISK_COLUMN].max()) if not risk_df.empty else 0)
+    
+    st.download_button(
+        "🚨 دانلود فهرست مراقبت (CSV)",
+        data=risk_df.to_csv(index=False, encoding='utf-8-sig'),
+        file_name=f"فهرست_مراقبت_{selected_base}_{selected_class}.csv",
+        mime="text/csv"
+    )
+
+# ---------- تب ۶: سناریوی نمره قبولی ----------
+with tab6:
+    resolution = st.select_slider(
+        "گام آستانه‌ها",
+        options=RESOLUTIONS,
+        value=view_params.get('pass_resolution', 0.5),
+        help="منحنی‌ها برای همه آستانه‌های ۰ تا ۲۰ با این گام یک بار محاسبه می‌شوند"
+    )
+    # شمارش‌ها برای هر شیت و گام یک بار ساخته می‌شوند؛ فیلتر کلاس و آستانه فقط نگاه به آرایه است
+    curves_key = (data_version, selected_base, resolution)
+    if session_cache.get('pass_curves', (None,))[0] != curves_key:
+        session_cache['pass_curves'] = (
+            curves_key,
+            pass_curves(df_clean, class_column, subject_columns + ['میانگین نمرات'], resolution)
+        )
+    curves = session_cache['pass_curves'][1]
+    
+    def build_curves_figure():
+        return charts.pass_rate_curves(curves.subject_curves(filtered_classes))
+    
+    fig_curves = figure_cache.get_or_build(figure_key + ('pass_curves', resolution), build_curves_figure)
+    st.plotly_chart(fig_curves, use_container_width=True)
+    
+    cut_off = st.slider("نمره قبولی مورد بررسی", 0.0, 20.0, view_params.get('cut_off', 10.0), resolution)
+    passed_counts, passed_rates = curves.at(cut_off, filtered_classes)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"✅ تعداد قبولی با نمره {cut_off:g}:")
+        st.dataframe(passed_counts, use_container_width=True)
+    with col2:
+        st.write(f"📊 درصد قبولی با نمره {cut_off:g}:")
+        st.dataframe(passed_rates, use_container_width=True)
+
+# ---------- تب ۷: داده خام ----------
+with tab7:
     st.write(f"📄 داده‌های خام کلاس: **{selected_class}**")
     
     if not df_filtered.empty:
@@ -512,8 +1122,8 @@ with tab4:
     else:
         st.warning("داده‌ای برای نمایش وجود ندارد.")
 
-# ---------- تب ۵: تنظیمات پیشرفته ----------
-with tab5:
+# ---------- تب ۸: تنظیمات پیشرفته ----------
+with tab8:
     st.subheader("⚙️ تنظیمات پیشرفته تحلیل")
     
     col1, col2 = st.columns(2)
@@ -524,16 +1134,26 @@ with tab5:
             "حداقل نمره برای محاسبه میانگین:",
             min_value=0,
             max_value=20,
-            value=0,
+            value=view_params.get('min_score_threshold', 0),
             help="نمرات کمتر از این مقدار در محاسبه میانگین در نظر گرفته نمی‌شوند"
         )
         
         # وزن‌دهی دروس
         st.write("### وزن‌دهی دروس (اختیاری)")
-        use_weighting = st.checkbox("فعال کردن وزن‌دهی دروس")
+        use_weighting = st.checkbox("فعال کردن وزن‌دهی دروس", value=view_params.get('use_weighting', False))
         
         if use_weighting:
             st.info("⚠️ این قابلیت در نسخه فعلی غیرفعال است")
+        
+        # دقت خلاصه‌های چندکی
+        st.write("### دقت میانه و چارک‌ها")
+        st.select_slider(
+            "حداکثر خطای مجاز (نمره):",
+            options=[0.01, 0.02, 0.05, 0.1, 0.25, 0.5],
+            value=view_params.get('sketch_error', DEFAULT_ERROR),
+            key='sketch_error',
+            help="میانه، چارک‌ها و آمار توصیفی با این دقت و بدون مرتب‌سازی کامل داده‌ها محاسبه می‌شوند"
+        )
     
     with col2:
         # دروس انتخابی
@@ -541,15 +1161,26 @@ with tab5:
         selected_subjects = st.multiselect(
             "دروس مورد نظر برای تحلیل:",
             options=subject_columns,
-            default=subject_columns[:min(6, len(subject_columns))]
+            default=view_params.get('selected_subjects', subject_columns[:min(6, len(subject_columns))])
         )
         
         if selected_subjects:
             st.success(f"{len(selected_subjects)} درس انتخاب شده است")
         
         # ریست کش
+        st.caption(
+            f"نمودارهای کش شده: {len(figure_cache)} "
+            f"({figure_cache.size / 1024 / 1024:.1f} MB، {figure_cache.hits} بار استفاده مجدد)"
+        )
+        st.caption(
+            f"جدول‌های ذخیره‌شده روی دیسک: {len(result_cache)} "
+            f"({result_cache.size / 1024 / 1024:.1f} از {result_cache.max_bytes / 1024 / 1024:.0f} MB، "
+            f"{result_cache.hits} بار استفاده مجدد، {result_cache.memory_hits} بار از حافظه)"
+        )
         if st.button("🔄 ریست حافظه کش"):
             st.cache_data.clear()
+            figure_cache.clear()
+            result_cache.clear()
             st.success("حافظه کش پاک شد!")
             st.rerun()
 
@@ -576,7 +1207,9 @@ with output_col1:
 with output_col2:
     # دانلود آمار دروس
     if 'subject_df' in locals() and not subject_df.empty:
-        subjects_csv = subject_df.to_csv(index=False, encoding='utf-8-sig')
+        subjects_csv = result_cache.get_or_build(
+            figure_key + ('subject_stats_csv',), lambda: subject_df.to_csv(index=False, encoding='utf-8-sig')
+        )
         st.download_button(
             "📊 دانلود آمار دروس (CSV)",
             data=subjects_csv,
@@ -590,7 +1223,9 @@ with output_col2:
 with output_col3:
     # دانلود رتبه‌بندی
     if 'ranking_df' in locals() and not ranking_df.empty:
-        ranking_csv = ranking_df.to_csv(index=False, encoding='utf-8-sig')
+        ranking_csv = result_cache.get_or_build(
+            figure_key + ('ranking_csv', ranking_mode), lambda: ranking_df.to_csv(index=False, encoding='utf-8-sig')
+        )
         st.download_button(
             "🥇 دانلود رتبه‌بندی (CSV)",
             data=ranking_csv,
@@ -601,30 +1236,86 @@ with output_col3:
     else:
         st.info("رتبه‌بندی برای دانلود وجود ندارد.")
 
+# ----------------- کارنامه فردی دانش‌آموزان -----------------
+with st.expander("🧾 کارنامه فردی دانش‌آموزان (ZIP)"):
+    card_formats = ['html', 'pdf'] if pdf_renderer_available() else ['html']
+    card_format = st.radio("قالب کارنامه:", card_formats, horizontal=True)
+    
+    if st.button("🖨️ ساخت کارنامه‌ها"):
+        with st.spinner("در حال ساخت کارنامه‌ها..."):
+            # رتبه و میانگین کلاس از کل پایه محاسبه و سپس به کلاس انتخابی محدود می‌شود
+            records = build_student_records(df_clean, subject_columns, class_column, name_cols)
+            records = [r for r in records if r['class_name'] in filtered_classes]
+            cards_buffer = BytesIO()
+            cards_count = generate_report_cards_zip(records, cards_buffer, fmt=card_format, title=selected_base)
+        session_cache['report_cards'] = {
+            # نسخه داده (هش محتوای فایل) تا فایل جدید با همان منبع، ZIP قبلی را برنگرداند
+            'key': (data_version, selected_base, selected_class, card_format),
+            'data': cards_buffer.getvalue(),
+            'count': cards_count
+        }
+    
+    report_cards = session_cache.get('report_cards')
+    if report_cards and report_cards['key'] == (data_version, selected_base, selected_class, card_format):
+        st.success(f"✅ {report_cards['count']} کارنامه ساخته شد")
+        st.download_button(
+            "📦 دانلود کارنامه‌ها (ZIP)",
+            data=report_cards['data'],
+            file_name=f"کارنامه‌ها_{selected_base}_{selected_class}.zip",
+            mime="application/zip"
+        )
+
+# ----------------- اشتراک‌گذاری نما -----------------
+with st.expander("🔗 اشتراک‌گذاری این نما"):
+    if shared_view is not None:
+        st.info(f"این نمای اشتراکی «{shared_view.view_id}» از {shared_view.source} است.")
+        if st.button("خروج از نمای اشتراکی"):
+            del st.query_params['view']
+            st.rerun()
+    
+    if not pyarrow_available():
+        st.caption("برای ذخیره نما، کتابخانه pyarrow را نصب کنید.")
+    elif st.button("💾 ذخیره نما و ساخت شناسه"):
+        from shared_views import save_view
+        
+        view_id = save_view(
+            sheet_analysis,
+            params={
+                'selected_base': selected_base,
+                'selected_class': selected_class,
+                'ranking_mode': ranking_mode,
+                'selected_subjects': selected_subjects,
+                'min_score_threshold': min_score_threshold,
+                'use_weighting': use_weighting,
+                'sketch_error': sketch_error,
+                'pass_mark': pass_mark,
+                'min_average': min_average,
+                'max_failed': max_failed,
+                'z_threshold': z_threshold,
+                'pass_resolution': resolution,
+                'cut_off': cut_off,
+            },
+            aggregates={
+                'correlations': session_cache.get('correlations', {}).get(figure_key),
+                'risk_baselines': session_cache['risk_baselines'][1],
+                'pass_curves': session_cache['pass_curves'][1],
+            },
+            source=f"{file_source} / {selected_base}"
+        )
+        st.success(f"✅ نما با شناسه **{view_id}** ذخیره شد")
+        st.code(f"?view={view_id}")
+
 # ----------------- راهنمای استفاده -----------------
+@st.cache_resource
+def load_help_text():
+    """متن راهنما یک بار از فایل ثابت خوانده می‌شود"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "help.md"), encoding="utf-8") as f:
+        return f.read()
+
 with st.sidebar:
     st.markdown("---")
     with st.expander("📖 راهنمای استفاده"):
-        st.markdown("""
-        ### نحوه استفاده:
-        
-        1. **آپلود فایل**: فایل اکسل کارنامه را آپلود کنید
-        2. **انتخاب شیت**: پایه/شیت مورد نظر را انتخاب کنید
-        3. **انتخاب کلاس**: کلاس خاص یا همه کلاس‌ها را انتخاب کنید
-        4. **تحلیل داده**: از تب‌های مختلف برای تحلیل استفاده کنید
-        5. **دانلود**: نتایج را در قالب CSV دانلود کنید
-        
-        ### ساختار فایل مورد انتظار:
-        - ستون «کلاس» برای شناسایی کلاس‌ها
-        - ستون‌های «نام» و «نام خانوادگی»
-        - ستون‌های دروس با نام‌های استاندارد
-        - داده‌های عددی در ستون‌های دروس
-        
-        ### نکات:
-        - فایل باید فرمت xlsx یا xls باشد
-        - سیستم به صورت خودکار ستون‌ها را شناسایی می‌کند
-        - برای بهترین تجربه از مرورگرهای مدرن استفاده کنید
-        """)
+        st.markdown(load_help_text())
 
 # ----------------- پیام موفقیت -----------------
 if not df_filtered.empty:
@@ -634,3 +1325,66 @@ if not df_filtered.empty:
     """)
 else:
     st.info("📊 منتظر ورود داده‌ها هستیم. لطفاً فایل کارنامه را آپلود کنید.")
+
+# ----------------- گزارش زمان‌بندی اجرا -----------------
+mark_stage("پایان اجرا")
+
+with st.sidebar:
+    with st.expander("⏱️ زمان‌بندی اجرا"):
+        if cold_modules:
+            st.caption(f"اجرای سرد: {', '.join(cold_modules)} در این اجرا وارد شد")
+        previous = 0.0
+        for stage, elapsed in startup_timings:
+            st.write(f"{stage}: **{elapsed - previous:.0f}** ms (تجمعی {elapsed:.0f} ms)")
+            previous = elapsed
+
+# ----------------- پروفایل اجرا -----------------
+import profiler
+
+if profiler.is_admin(st.query_params):
+    with st.sidebar:
+        with st.expander("🧪 پروفایل اجرا (مدیر)"):
+            if st.button("پروفایل اجرای بعدی"):
+                st.session_state['profile_next_run'] = True
+                st.rerun()
+            
+            rerun_profile = profiler.latest_profile(session_id)
+            if rerun_profile is not None:
+                st.caption(f"زمان کل: {rerun_profile.total_seconds * 1000:.0f} ms")
+                st.write("📦 زمان به تفکیک کتابخانه:")
+                st.dataframe(rerun_profile.libraries, use_container_width=True, hide_index=True)
+                st.write("🔥 نقاط داغ برنامه:")
+                st.dataframe(
+                    rerun_profile.app_hotspots.drop(columns='ماژول'),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                st.write("⏳ پرهزینه‌ترین توابع:")
+                st.dataframe(rerun_profile.top_functions, use_container_width=True, hide_index=True)
+                stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(rerun_profile.created))
+                st.download_button(
+                    "📥 دانلود پروفایل (.prof)",
+                    data=rerun_profile.stats_bytes,
+                    file_name=f"profile_{stamp}.prof",
+                    mime="application/octet-stream",
+                    help="با snakeviz یا python -m pstats باز می‌شود"
+                )
+                st.download_button(
+                    "📄 دانلود گزارش متنی",
+                    data=rerun_profile.report_text,
+                    file_name=f"profile_{stamp}.txt",
+                    mime="text/plain"
+                )
+        
+        with st.expander("🧠 حافظه نشست‌ها (مدیر)"):
+            session_usage = session_registry.usage(session_id)
+            if not session_usage.empty:
+                st.metric("حافظه کل نشست‌ها", f"{session_usage['حافظه کل (MB)'].sum():.1f} MB")
+                st.dataframe(session_usage, use_container_width=True, hide_index=True)
+            st.caption(
+                f"نشست‌های بیکار پس از {session_registry.idle_seconds / 60:g} دقیقه "
+                f"{'روی دیسک ریخته' if session_registry.policy == POLICY_SPILL else 'رها'} می‌شوند"
+            )
+            if st.button("بازپس‌گیری فوری نشست‌های بیکار (بیش از ۱ دقیقه)"):
+                session_registry.sweep(idle_seconds=60)
+                st.rerun()
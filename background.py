@@ -0,0 +1,165 @@
+import threading
+from collections import deque
+from analysis import prepare_sheet
+from delta import revise_sheet
+from ingest import TableFile
+
+# ----------------- پردازش پس‌زمینه فایل آپلود شده -----------------
+# خواندن و پیش‌پردازش شیت‌ها در یک رشته پس‌زمینه انجام می‌شود؛ هر شیت به محض آماده
+# شدن قابل استفاده است. لغو بین مراحل (خواندن، شناسایی ستون‌ها، محاسبه) و در میانه
+# خواندن هر شیت اعمال می‌شود: خواندن در یک رشته کمکی انجام می‌شود و با لغو، کار منتظر
+# پایان آن نمی‌ماند.
+
+CANCEL_POLL_SECONDS = 0.1
+
+STAGES = ['queued', 'reading', 'detecting', 'aggregating', 'ready']
+STAGE_LABELS = {
+    'queued': 'در صف',
+    'reading': 'خواندن',
+    'comparing': 'مقایسه با نسخه قبلی',
+    'detecting': 'شناسایی ستون‌ها',
+    'aggregating': 'محاسبه',
+    'ready': 'آماده',
+    'error': 'خطا',
+    'cancelled': 'لغو شده',
+}
+
+
+class IngestCancelled(Exception):
+    """لغو پردازش توسط کاربر"""
+
+
+class IngestJob:
+    """پردازش پس‌زمینه همه شیت‌های یک فایل"""
+
+    def __init__(self, data, sheet_names, previous=None, file_name=None, data_version=None, previous_version=None):
+        self.data = data
+        self.file_name = file_name
+        self.data_version = data_version
+        # نتایج نسخه قبلی همین فایل (و نسخه داده آن) برای به‌روزرسانی افزایشی
+        self.previous = previous or {}
+        self.previous_version = previous_version
+        self.sheet_names = list(sheet_names)
+        self.stages = {sheet: 'queued' for sheet in self.sheet_names}
+        self.results = {}
+        self.errors = {}
+        # نتایج توسط ثبت نشست‌ها رها شده‌اند و فایل باید دوباره پردازش شود
+        self.released = False
+        self._queue = deque(self.sheet_names)
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ravesh-upload', daemon=True)
+
+    # ---------- کنترل ----------
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def release(self):
+        """رها کردن نتایج برای بازپس‌گیری حافظه"""
+        self.cancel()
+        self.released = True
+        self.results.clear()
+
+    def prioritize(self, sheet):
+        """انتقال یک شیت به ابتدای صف (مثلاً شیت انتخاب‌شده کاربر)"""
+        with self._lock:
+            if sheet in self._queue:
+                self._queue.remove(sheet)
+                self._queue.appendleft(sheet)
+
+    # ---------- وضعیت ----------
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+    def is_ready(self, sheet):
+        return self.stages.get(sheet) == 'ready'
+
+    @property
+    def ready_sheets(self):
+        return [sheet for sheet in self.sheet_names if self.is_ready(sheet)]
+
+    def progress(self):
+        """پیشرفت کلی بین ۰ و ۱"""
+        finished = ('ready', 'error', 'cancelled')
+        steps = [
+            1.0 if stage in finished else STAGES.index(stage.replace('comparing', 'detecting')) / (len(STAGES) - 1)
+            for stage in self.stages.values()
+        ]
+        return sum(steps) / len(steps) if steps else 1.0
+
+    # ---------- اجرا ----------
+    def _set_stage(self, sheet, stage):
+        if self._cancel.is_set():
+            raise IngestCancelled()
+        self.stages[sheet] = stage
+
+    def _interruptible(self, func, *args):
+        """اجرای یک گام طولانی در رشته کمکی و بررسی لغو تا پایان آن"""
+        outcome = {}
+
+        def target():
+            try:
+                outcome['value'] = func(*args)
+            except BaseException as e:
+                outcome['error'] = e
+
+        helper = threading.Thread(target=target, name='ravesh-upload-step', daemon=True)
+        helper.start()
+        while helper.is_alive():
+            if self._cancel.wait(CANCEL_POLL_SECONDS):
+                # نتیجه رشته کمکی پس از پایان دور ریخته می‌شود
+                raise IngestCancelled()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['value']
+
+    def _next_sheet(self):
+        with self._lock:
+            return self._queue.popleft() if self._queue else None
+
+    def _run(self):
+        try:
+            xls = TableFile(self.data, self.file_name)
+        except Exception as e:
+            for sheet in self.sheet_names:
+                self.stages[sheet] = 'error'
+                self.errors[sheet] = str(e)
+            return
+
+        while (sheet := self._next_sheet()) is not None:
+            try:
+                self._set_stage(sheet, 'reading')
+                df = self._interruptible(xls.parse, sheet)
+                analysis = None
+                if sheet in self.previous:
+                    self._set_stage(sheet, 'comparing')
+                    analysis = self._interruptible(revise_sheet, self.previous[sheet], df)
+                    if analysis is not None:
+                        analysis.delta.base_version = self.previous_version
+                if analysis is None:
+                    analysis = prepare_sheet(df, on_stage=lambda stage, sheet=sheet: self._set_stage(sheet, stage))
+                if self._cancel.is_set():
+                    raise IngestCancelled()
+                self.results[sheet] = analysis
+                self.stages[sheet] = 'ready'
+            except IngestCancelled:
+                break
+            except Exception as e:
+                self.stages[sheet] = 'error'
+                self.errors[sheet] = str(e)
+
+        if self._cancel.is_set():
+            for sheet, stage in self.stages.items():
+                if stage not in ('ready', 'error'):
+                    self.stages[sheet] = 'cancelled'
+        self.data = None
+        self.previous = {}
@@ -0,0 +1,147 @@
+import plotly.express as px
+
+# ----------------- نمودارهای مشترک -----------------
+# نمای تک‌مدرسه و نمای منطقه از همین توابع استفاده می‌کنند تا نمودارها یکسان بمانند.
+
+
+def subject_bar(subject_df_sorted):
+    """نمودار میانگین نمره هر درس"""
+    fig_subjects = px.bar(
+        subject_df_sorted,
+        x='درس',
+        y='میانگین',
+        title='میانگین نمره هر درس',
+        color='میانگین',
+        color_continuous_scale='RdYlGn',
+        text='میانگین'
+    )
+    fig_subjects.update_layout(
+        xaxis_tickangle=-45,
+        height=400
+    )
+    return fig_subjects
+
+
+def class_bar(class_stats, class_column):
+    """نمودار مقایسه میانگین کلاس‌ها"""
+    return px.bar(
+        class_stats,
+        x=class_column,
+        y='میانگین',
+        title='میانگین نمره هر کلاس',
+        color='میانگین',
+        text='میانگین',
+        color_continuous_scale='plasma'
+    )
+
+
+def grade_bar(overview_df):
+    """نمودار مقایسه میانگین پایه‌ها"""
+    return px.bar(
+        overview_df,
+        x='پایه',
+        y='میانگین',
+        title='میانگین نمره هر پایه',
+        color='میانگین',
+        text='میانگین',
+        hover_data=['تعداد دانش‌آموز', 'درصد قبولی'],
+        color_continuous_scale='RdYlGn'
+    )
+
+
+def top_bar(top_n, full_name, value_column='میانگین نمرات'):
+    """نمودار دانش‌آموزان برتر"""
+    fig_top = px.bar(
+        top_n,
+        x=full_name,
+        y=value_column,
+        title=f'{len(top_n)} دانش‌آموز برتر',
+        text=value_column,
+        color=value_column,
+        color_continuous_scale='RdYlGn'
+    )
+    fig_top.update_layout(xaxis_tickangle=-45)
+    return fig_top
+
+
+def average_histogram(df):
+    """هیستوگرام میانگین نمرات"""
+    fig_hist = px.histogram(
+        df,
+        x='میانگین نمرات',
+        nbins=15,
+        title='توزیع میانگین نمرات',
+        color_discrete_sequence=['#2E86AB'],
+        opacity=0.8
+    )
+    fig_hist.update_layout(
+        xaxis_title='میانگین نمرات',
+        yaxis_title='تعداد دانش‌آموزان'
+    )
+    return fig_hist
+
+
+def average_histogram_from_counts(bin_starts, counts, bin_width):
+    """هیستوگرام میانگین نمرات از شمارش‌های از پیش محاسبه‌شده"""
+    fig_hist = px.bar(
+        x=bin_starts + bin_width / 2,
+        y=counts,
+        title='توزیع میانگین نمرات',
+        color_discrete_sequence=['#2E86AB'],
+        opacity=0.8
+    )
+    fig_hist.update_traces(width=bin_width)
+    fig_hist.update_layout(
+        xaxis_title='میانگین نمرات',
+        yaxis_title='تعداد دانش‌آموزان',
+        bargap=0
+    )
+    return fig_hist
+
+
+def correlation_heatmap(corr):
+    """نقشه حرارتی همبستگی دروس"""
+    fig_corr = px.imshow(
+        corr.round(2),
+        text_auto=True,
+        zmin=-1,
+        zmax=1,
+        color_continuous_scale='RdBu',
+        title='همبستگی نمرات دروس',
+        aspect='auto'
+    )
+    fig_corr.update_layout(height=max(400, 30 * len(corr)))
+    return fig_corr
+
+
+def class_subject_heatmap(means):
+    """نقشه حرارتی میانگین هر درس در هر کلاس"""
+    fig_heat = px.imshow(
+        means.round(2),
+        text_auto=True,
+        color_continuous_scale='RdYlGn',
+        title='میانگین کلاس × درس',
+        labels={'x': 'درس', 'y': 'کلاس', 'color': 'میانگین'},
+        aspect='auto'
+    )
+    fig_heat.update_layout(height=max(400, 30 * len(means)))
+    return fig_heat
+
+
+def pass_rate_curves(curves):
+    """منحنی درصد قبولی هر درس بر حسب نمره قبولی"""
+    long_df = curves.reset_index().melt(id_vars='آستانه', var_name='درس', value_name='درصد قبولی')
+    fig_curves = px.line(
+        long_df,
+        x='آستانه',
+        y='درصد قبولی',
+        color='درس',
+        title='درصد قبولی بر حسب نمره قبولی'
+    )
+    fig_curves.update_layout(
+        xaxis_title='نمره قبولی',
+        yaxis_title='درصد قبولی',
+        yaxis_range=[0, 100],
+        height=450
+    )
+    return fig_curves
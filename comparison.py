@@ -0,0 +1,264 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ----------------- آزمون معناداری تفاوت کلاس‌ها -----------------
+# همه آزمون‌ها از آماره‌های بسنده هر کلاس (تعداد، میانگین، واریانس) ساخته می‌شوند:
+# تحلیل واریانس یک‌طرفه برای هر درس و آزمون t ولش برای همه جفت کلاس‌ها و همه
+# دروس با یک عملیات آرایه‌ای، سپس تصحیح مقایسه‌های چندگانه در هر درس.
+
+CORRECTION_METHODS = {
+    'holm': 'هولم',
+    'fdr_bh': 'بنجامینی-هوخبرگ (FDR)',
+    'bonferroni': 'بونفرونی',
+}
+DEFAULT_ALPHA = 0.05
+_TINY = 1e-300
+_MOMENT_TOLERANCE = 1e-12
+
+
+@dataclass
+class ClassStats:
+    """آماره‌های بسنده: آرایه‌های کلاس × درس"""
+    classes: list
+    subjects: list
+    n: np.ndarray
+    mean: np.ndarray
+    var: np.ndarray
+
+
+def class_sufficient_stats(df, class_column, columns):
+    """تعداد، میانگین و واریانس هر درس در هر کلاس با یک groupby"""
+    grouped = df.groupby(class_column)[columns]
+    n = grouped.count()
+    return ClassStats(
+        classes=list(n.index),
+        subjects=list(columns),
+        n=n.to_numpy(dtype=float),
+        mean=grouped.mean().to_numpy(dtype=float),
+        var=grouped.var().to_numpy(dtype=float)
+    )
+
+
+def group_moments(df, class_column, columns, classes):
+    """تعداد، میانگین و مجموع مربعات انحراف هر درس در هر کلاس (هم‌ترتیب با classes)
+
+    برای چند سطر تغییرکرده با آرایه‌ها حساب می‌شود تا هزینه groupby پرداخت نشود.
+    """
+    codes = pd.Index(classes).get_indexer(df[class_column])
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)[codes >= 0]
+    codes = codes[codes >= 0]
+    present = ~np.isnan(values)
+    x = np.where(present, values, 0.0)
+    shape = (len(classes), len(columns))
+
+    n, total, m2 = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    np.add.at(n, codes, present)
+    np.add.at(total, codes, x)
+    mean = np.divide(total, n, out=np.zeros(shape), where=n > 0)
+    np.add.at(m2, codes, np.where(present, x - mean[codes], 0.0) ** 2)
+    return n, mean, m2
+
+
+def _remove_moments(n, mean, m2, n_b, mean_b, m2_b):
+    """گروه باقی‌مانده پس از کنار گذاشتن گروه b (معکوس فرمول ترکیب چان)"""
+    n_a = n - n_b
+    mean_a = np.where(n_a > 0, (n * mean - n_b * mean_b) / np.where(n_a > 0, n_a, 1), 0.0)
+    m2_a = m2 - m2_b - (mean_b - mean_a) ** 2 * n_a * n_b / np.where(n > 0, n, 1)
+    return n_a, mean_a, np.where(n_a > 0, m2_a, 0.0)
+
+
+def _add_moments(n, mean, m2, n_b, mean_b, m2_b):
+    """ترکیب دو گروه (فرمول چان)"""
+    n_c = n + n_b
+    safe = np.where(n_c > 0, n_c, 1)
+    mean_c = np.where(n_c > 0, (n * mean + n_b * mean_b) / safe, 0.0)
+    m2_c = m2 + m2_b + (mean_b - mean) ** 2 * n * n_b / safe
+    return n_c, mean_c, m2_c
+
+
+def revise_moments(n, mean, var, removed, added):
+    """به‌روزرسانی تعداد، میانگین و واریانس با کم کردن یک گروه نمرات و افزودن گروه دیگر
+
+    removed و added: خروجی group_moments برای همان کلاس‌ها و دروس
+    """
+    m2 = np.nan_to_num(var) * np.maximum(n - 1, 0)
+    n, mean, m2 = _remove_moments(n, np.nan_to_num(mean), m2, *removed)
+    n, mean, m2 = _add_moments(n, mean, m2, *added)
+    # باقی‌مانده گرد کردن: کلاس بدون پراکندگی نباید واریانس مثبت بسیار کوچک بگیرد
+    m2 = np.where(m2 <= _MOMENT_TOLERANCE * np.maximum(n, 1) * (mean ** 2 + 1), 0.0, m2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return n, np.where(n > 0, mean, np.nan), np.where(n > 1, m2 / (n - 1), np.nan)
+
+
+def revise_sufficient_stats(stats, retracted, inserted, class_column):
+    """آماره‌های بسنده نسخه اصلاح‌شده فقط از سطرهای کنار رفته و جایگزین
+
+    اگر کلاسی اضافه یا حذف شده باشد None برمی‌گرداند تا آماره‌ها از نو ساخته شوند.
+    """
+    if not set(inserted[class_column]) <= set(stats.classes):
+        return None
+    n, mean, var = revise_moments(
+        stats.n, stats.mean, stats.var,
+        group_moments(retracted, class_column, stats.subjects, stats.classes),
+        group_moments(inserted, class_column, stats.subjects, stats.classes)
+    )
+    if (n.sum(axis=1) == 0).any():
+        return None
+    return ClassStats(classes=stats.classes, subjects=stats.subjects, n=n, mean=mean, var=var)
+
+
+# ---------- توزیع‌ها ----------
+def _betacf(a, b, x, max_iter=1000, eps=1e-13):
+    """کسر مسلسل تابع بتای ناقص (روش لنتز، برداری)"""
+    qab, qap, qam = a + b, a + 1, a - 1
+    c = np.ones_like(x)
+    d = 1 - qab * x / qap
+    d = 1 / np.where(np.abs(d) < _TINY, _TINY, d)
+    h = d
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1 + aa * d
+        d = 1 / np.where(np.abs(d) < _TINY, _TINY, d)
+        c = 1 + aa / c
+        c = np.where(np.abs(c) < _TINY, _TINY, c)
+        h = h * d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1 + aa * d
+        d = 1 / np.where(np.abs(d) < _TINY, _TINY, d)
+        c = 1 + aa / c
+        c = np.where(np.abs(c) < _TINY, _TINY, c)
+        step = d * c
+        h = h * step
+        if np.all(np.abs(step - 1) < eps):
+            break
+    return h
+
+
+_lgamma = np.vectorize(math.lgamma, otypes=[float])
+
+
+def betainc(a, b, x):
+    """تابع بتای ناقص تنظیم‌شده I_x(a, b)؛ در صورت نصب scipy از آن استفاده می‌شود"""
+    try:
+        from scipy.special import betainc as scipy_betainc
+    except ImportError:
+        pass
+    else:
+        return scipy_betainc(a, b, x)
+
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (a, b, x)))
+    result = np.full(x.shape, np.nan)
+    valid = (a > 0) & (b > 0) & (x >= 0) & (x <= 1)
+    result[valid & (x == 0)] = 0.0
+    result[valid & (x == 1)] = 1.0
+    inner = valid & (x > 0) & (x < 1)
+    if not inner.any():
+        return result
+
+    a, b, x = a[inner], b[inner], x[inner]
+    log_front = a * np.log(x) + b * np.log1p(-x) - (_lgamma(a) + _lgamma(b) - _lgamma(a + b))
+    # برای همگرایی سریع، در نیمه دوم بازه از تقارن I_x(a, b) = 1 - I_{1-x}(b, a) استفاده می‌شود
+    direct = x < (a + 1) / (a + b + 2)
+    cf = _betacf(np.where(direct, a, b), np.where(direct, b, a), np.where(direct, x, 1 - x))
+    front = np.exp(log_front)
+    result[inner] = np.where(direct, front * cf / a, 1 - front * cf / b)
+    return np.clip(result, 0.0, 1.0)
+
+
+def t_two_sided_p(t, df):
+    """مقدار p دوطرفه توزیع t"""
+    t, df = np.asarray(t, dtype=float), np.asarray(df, dtype=float)
+    return betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def f_sf(f, df1, df2):
+    """احتمال دم راست توزیع F"""
+    f, df1, df2 = (np.asarray(v, dtype=float) for v in (f, df1, df2))
+    return betainc(df2 / 2, df1 / 2, df2 / (df2 + df1 * f))
+
+
+# ---------- تصحیح مقایسه‌های چندگانه ----------
+def adjust_pvalues(p, method='holm'):
+    """تصحیح مقادیر p در هر سطر (هر سطر یک خانواده آزمون؛ NaN نادیده گرفته می‌شود)"""
+    p = np.atleast_2d(np.asarray(p, dtype=float))
+    order = np.argsort(np.where(np.isnan(p), np.inf, p), axis=1)
+    sorted_p = np.take_along_axis(p, order, axis=1)
+    m = (~np.isnan(p)).sum(axis=1, keepdims=True)
+    rank = np.arange(1, p.shape[1] + 1)
+
+    if method == 'bonferroni':
+        adjusted = sorted_p * m
+    elif method == 'holm':
+        adjusted = np.fmax.accumulate(sorted_p * (m - rank + 1), axis=1)
+    elif method == 'fdr_bh':
+        scaled = np.where(np.isnan(sorted_p), np.inf, sorted_p * m / rank)
+        adjusted = np.minimum.accumulate(scaled[:, ::-1], axis=1)[:, ::-1]
+    else:
+        raise ValueError(f"روش تصحیح ناشناخته: {method}")
+
+    adjusted = np.where(np.isnan(sorted_p), np.nan, np.minimum(adjusted, 1.0))
+    result = np.empty_like(p)
+    np.put_along_axis(result, order, adjusted, axis=1)
+    return result
+
+
+# ---------- آزمون‌ها ----------
+def anova_table(stats, alpha=DEFAULT_ALPHA):
+    """تحلیل واریانس یک‌طرفه کلاس‌ها برای هر درس"""
+    n, mean, var = stats.n, stats.mean, stats.var
+    has_data = n > 0
+    total = n.sum(axis=0)
+    groups = has_data.sum(axis=0)
+    grand_mean = np.nansum(n * mean, axis=0) / total
+    ss_between = np.nansum(n * (mean - grand_mean) ** 2, axis=0)
+    ss_within = np.nansum(np.where(n > 1, (n - 1) * var, 0.0), axis=0)
+    df1, df2 = groups - 1, total - groups
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f = (ss_between / df1) / (ss_within / df2)
+        eta_squared = ss_between / (ss_between + ss_within)
+    p = np.where((df1 > 0) & (df2 > 0), f_sf(f, df1, df2), np.nan)
+    return pd.DataFrame({
+        'درس': stats.subjects,
+        'تعداد کلاس': groups,
+        'F': np.round(f, 3),
+        'درجه آزادی': [f"{int(a)}, {int(b)}" for a, b in zip(df1, df2)],
+        'p': p,
+        'اندازه اثر (η²)': np.round(eta_squared, 3),
+        'معنادار': p < alpha,
+    })
+
+
+def pairwise_table(stats, method='holm', alpha=DEFAULT_ALPHA):
+    """آزمون t ولش برای همه جفت کلاس‌ها در همه دروس با تصحیح در هر درس"""
+    first, second = np.triu_indices(len(stats.classes), k=1)
+    n1, n2 = stats.n[first], stats.n[second]
+    m1, m2 = stats.mean[first], stats.mean[second]
+    se1, se2 = stats.var[first] / n1, stats.var[second] / n2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se = np.sqrt(se1 + se2)
+        t = (m1 - m2) / se
+        df = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    testable = (n1 > 1) & (n2 > 1) & (se > 0)
+    p = np.where(testable, t_two_sided_p(np.where(testable, t, 0), np.where(testable, df, 1)), np.nan)
+    # هر درس یک خانواده آزمون است
+    p_adjusted = adjust_pvalues(p.T, method).T
+
+    n_pairs, n_subjects = p.shape
+    pairs = pd.DataFrame({
+        'درس': np.tile(np.asarray(stats.subjects, dtype=object), n_pairs),
+        'کلاس اول': np.repeat(np.asarray(stats.classes, dtype=object)[first], n_subjects),
+        'کلاس دوم': np.repeat(np.asarray(stats.classes, dtype=object)[second], n_subjects),
+        'تفاوت میانگین': np.round((m1 - m2).ravel(), 2),
+        't': np.round(t.ravel(), 3),
+        'درجه آزادی': np.round(df.ravel(), 1),
+        'p': p.ravel(),
+        'p تصحیح‌شده': p_adjusted.ravel(),
+    })
+    pairs['معنادار'] = pairs['p تصحیح‌شده'] < alpha
+    return pairs[testable.ravel()].reset_index(drop=True)
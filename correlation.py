@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ----------------- همبستگی دروس و نقشه حرارتی کلاس × درس -----------------
+# همبستگی و کوواریانس همه جفت دروس با چند ضرب ماتریسی روی بلوک عددی نمرات به
+# دست می‌آیند؛ هر جفت فقط روی دانش‌آموزانی که نمره هر دو درس را دارند محاسبه
+# می‌شود (مانند DataFrame.corr) اما بدون حلقه روی جفت ستون‌ها.
+
+MIN_PAIR_COUNT = 3
+
+
+@dataclass
+class SubjectCorrelation:
+    """ماتریس‌های همبستگی، کوواریانس و تعداد نمرات مشترک هر جفت درس"""
+    corr: pd.DataFrame
+    cov: pd.DataFrame
+    counts: pd.DataFrame
+
+
+def pairwise_moments(values):
+    """کوواریانس و همبستگی جفتی با نادیده گرفتن NaN
+
+    values: آرایه دوبعدی (دانش‌آموز × درس)
+    خروجی: (کوواریانس، همبستگی، تعداد مشترک) همه با ابعاد درس × درس
+    """
+    present = ~np.isnan(values)
+    x = np.where(present, values, 0.0)
+    mask = present.astype(float)
+
+    # n[i, j]: تعداد دانش‌آموزانی که هر دو درس i و j را دارند
+    n = mask.T @ mask
+    # sum_x[i, j]: مجموع نمرات درس i روی همان دانش‌آموزان مشترک
+    sum_x = x.T @ mask
+    sum_xx = (x * x).T @ mask
+    sum_xy = x.T @ x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (sum_xy - sum_x * sum_x.T / n) / (n - 1)
+        var_x = (sum_xx - sum_x * sum_x / n) / (n - 1)
+        corr = cov / np.sqrt(var_x * var_x.T)
+
+    too_few = n < MIN_PAIR_COUNT
+    cov[too_few] = np.nan
+    corr[too_few] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.diag(n) >= MIN_PAIR_COUNT, 1.0, np.nan))
+    return cov, corr, n.astype(int)
+
+
+def subject_correlation(df, subject_columns):
+    """همبستگی و کوواریانس نمرات دروس"""
+    values = df[subject_columns].to_numpy(dtype=float, na_value=np.nan)
+    cov, corr, counts = pairwise_moments(values)
+    frame = lambda matrix: pd.DataFrame(matrix, index=subject_columns, columns=subject_columns)
+    return SubjectCorrelation(corr=frame(corr), cov=frame(cov), counts=frame(counts))
+
+
+def class_subject_means(df, class_column, subject_columns):
+    """میانگین هر درس در هر کلاس (سطر: کلاس، ستون: درس)"""
+    return df.groupby(class_column)[subject_columns].mean()
+
+
+def strongest_pairs(corr, top_n=10):
+    """جفت دروس با بیشترین همبستگی (مثبت یا منفی)"""
+    upper = np.triu(np.ones(corr.shape, dtype=bool), k=1)
+    pairs = corr.where(upper).stack().rename('همبستگی').reset_index()
+    pairs.columns = ['درس اول', 'درس دوم', 'همبستگی']
+    order = pairs['همبستگی'].abs().sort_values(ascending=False).index
+    return pairs.loc[order].head(top_n).round(2).reset_index(drop=True)
@@ -0,0 +1,190 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from analysis import SheetAnalysis, clean_rows, normalize_header
+
+# ----------------- تغییرات نسخه اصلاح‌شده فایل -----------------
+# وقتی فایلی با همان شیت‌ها و همان دانش‌آموزان دوباره آپلود می‌شود، سطرها با کلید
+# دانش‌آموز جفت و ستون به ستون با نسخه قبلی مقایسه می‌شوند. فقط سطرهای تغییرکرده یا
+# جدید دوباره پاک‌سازی می‌شوند و بقیه جدول پاک‌شده از نسخه قبلی برداشته می‌شود؛
+# سطرهای کنار رفته و جایگزین در SheetDelta نگه داشته می‌شوند تا آماره‌های تجمیعی
+# (خلاصه‌ها، منحنی‌های قبولی، آماره‌های بسنده و خط پایه کلاس‌ها) هم فقط با همین
+# سطرها به‌روز شوند.
+
+ID_PATTERNS = ['کد ملی', 'شماره دانش آموزی', 'کد دانش آموزی', 'شماره دانش‌آموزی', 'شناسه']
+MIN_KEY_OVERLAP = 0.5
+
+
+@dataclass
+class SheetDelta:
+    """تفاوت‌های نسخه جدید یک شیت با نسخه قبلی"""
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    changes: pd.DataFrame = None
+    unchanged: int = 0
+    # سطرهای پاک‌شده نسخه قبلی که کنار رفته‌اند و سطرهای پاک‌شده جایگزین آن‌ها
+    retracted: pd.DataFrame = None
+    inserted: pd.DataFrame = None
+    # سطرهای بدون تغییر همان نمایه نسخه قبلی را دارند (جدول‌های سطری قابل انتقال‌اند)
+    aligned: bool = False
+    # نسخه داده‌ای که نسخه قبلی از آن ساخته شده بود (توسط پردازش پس‌زمینه ثبت می‌شود)
+    base_version: str = None
+
+    @property
+    def edit_count(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def affected_classes(self, class_column):
+        """کلاس‌هایی که دست‌کم یک سطرشان کنار رفته یا اضافه شده است"""
+        return set(self.retracted[class_column]) | set(self.inserted[class_column])
+
+
+def key_columns(df, analysis):
+    """ستون‌های کلید دانش‌آموز: شناسه در صورت وجود، وگرنه نام و کلاس"""
+    id_patterns = [normalize_header(p) for p in ID_PATTERNS]
+    id_columns = [
+        col for col in df.columns
+        if any(p in normalize_header(col) for p in id_patterns)
+    ]
+    if id_columns:
+        key_columns = id_columns[:1]
+    else:
+        key_columns = [c for c in analysis.name_cols.values() if c is not None] + [analysis.class_column]
+    return [c for c in key_columns if c in df.columns]
+
+
+def student_keys(df, analysis, unique=True):
+    """کلید هر دانش‌آموز از ستون‌های کلید"""
+    columns = key_columns(df, analysis)
+    keys = df[columns[0]].astype(str).str.strip()
+    for col in columns[1:]:
+        keys = keys + ' | ' + df[col].astype(str).str.strip()
+    if not unique:
+        return keys
+    # دانش‌آموزان هم‌نام در یک کلاس با شماره تکرار از هم جدا می‌شوند
+    occurrence = keys.groupby(keys).cumcount()
+    return keys.where(occurrence == 0, keys + ' #' + (occurrence + 1).astype(str))
+
+
+def _differing_cells(old_rows, new_rows):
+    """ماتریس سلول‌های متفاوت دو جدول هم‌ترتیب (مقایسه ستون به ستون با نوع بومی هر ستون)"""
+    differs = np.zeros(new_rows.shape, dtype=bool)
+    for i, col in enumerate(new_rows.columns):
+        old_values, new_values = old_rows[col], new_rows[col]
+        if old_values.dtype == new_values.dtype and old_values.dtype.kind in 'fiub':
+            # ستون‌های عددی (نمرات) مستقیماً روی آرایه‌ها مقایسه می‌شوند
+            old_array, new_array = old_values.to_numpy(), new_values.to_numpy()
+            differs[:, i] = old_array != new_array
+            if old_array.dtype.kind == 'f':
+                differs[:, i] &= ~(np.isnan(old_array) & np.isnan(new_array))
+            continue
+        old_values = old_values.reset_index(drop=True)
+        new_values = new_values.reset_index(drop=True)
+        if old_values.dtype != new_values.dtype:
+            old_values, new_values = old_values.astype(object), new_values.astype(object)
+        same = old_values.eq(new_values).fillna(False).to_numpy(dtype=bool)
+        differs[:, i] = ~(same | (old_values.isna() & new_values.isna()).to_numpy())
+    return differs
+
+
+def _cell_changes(old_rows, new_rows, keys, differs):
+    """جدول بلند تغییرات سلول‌ها برای سطرهای تغییرکرده"""
+    old_values = old_rows.astype(object).to_numpy()
+    new_values = new_rows.astype(object).to_numpy()
+    rows, cols = np.nonzero(differs)
+    return pd.DataFrame({
+        'دانش‌آموز': np.asarray(keys)[rows],
+        'ستون': np.asarray(new_rows.columns, dtype=object)[cols],
+        'مقدار قبلی': old_values[rows, cols],
+        'مقدار جدید': new_values[rows, cols],
+    })
+
+
+def revise_sheet(previous, new_df):
+    """پردازش افزایشی شیت جدید به همراه فهرست تغییرات نسبت به نسخه قبلی
+
+    اگر new_df نسخه اصلاح‌شده همان شیت نباشد (ستون‌های متفاوت یا همپوشانی کم
+    دانش‌آموزان)، None برمی‌گرداند تا شیت از نو پردازش شود.
+    """
+    if previous is None or previous.df_clean is None:
+        return None
+    if list(previous.df.columns) != list(new_df.columns):
+        return None
+
+    columns = key_columns(new_df, previous)
+    if len(previous.df) == len(new_df) and previous.df[columns].reset_index(drop=True).equals(
+        new_df[columns].reset_index(drop=True)
+    ):
+        # حالت رایج: فقط نمرات اصلاح شده‌اند و ترتیب دانش‌آموزان همان است؛ کلیدها
+        # فقط برای سطرهای تغییرکرده ساخته می‌شوند
+        differs = _differing_cells(previous.df, new_df)
+        row_changed = differs.any(axis=1)
+        changed_keys = list(student_keys(new_df.iloc[row_changed], previous, unique=False))
+        delta = SheetDelta(changed=changed_keys, unchanged=int((~row_changed).sum()), aligned=True)
+        delta.changes = _cell_changes(
+            previous.df.iloc[row_changed], new_df.iloc[row_changed], changed_keys, differs[row_changed]
+        )
+        retract_labels = previous.df.index[row_changed]
+        insert_positions = np.flatnonzero(row_changed)
+        relabel = None
+    else:
+        # کلیدها یکتا هستند، پس جفت‌سازی با get_indexer انجام می‌شود
+        old_keys = pd.Index(student_keys(previous.df, previous).to_numpy(dtype=object))
+        new_keys = pd.Index(student_keys(new_df, previous).to_numpy(dtype=object))
+        match_position = old_keys.get_indexer(new_keys)
+        has_match = match_position >= 0
+        if has_match.sum() / max(len(old_keys), len(new_keys), 1) < MIN_KEY_OVERLAP:
+            return None
+
+        matched = np.flatnonzero(has_match)
+        old_rows = previous.df.iloc[match_position[matched]]
+        new_rows = new_df.iloc[matched]
+        differs = _differing_cells(old_rows, new_rows)
+        row_changed = differs.any(axis=1)
+        removed = new_keys.get_indexer(old_keys) < 0
+
+        delta = SheetDelta(
+            added=list(new_keys[~has_match]),
+            removed=list(old_keys[removed]),
+            changed=list(new_keys[matched[row_changed]]),
+            unchanged=int((~row_changed).sum())
+        )
+        delta.changes = _cell_changes(
+            old_rows.iloc[row_changed], new_rows.iloc[row_changed],
+            new_keys[matched[row_changed]], differs[row_changed]
+        )
+        retract_labels = previous.df.index[np.concatenate([match_position[matched[row_changed]], np.flatnonzero(removed)])]
+        insert_positions = np.sort(np.concatenate([np.flatnonzero(~has_match), matched[row_changed]]))
+        # نمایه قبلی -> نمایه جدید سطرهای بدون تغییر
+        unchanged = matched[~row_changed]
+        relabel = pd.Series(new_df.index[unchanged], index=previous.df.index[match_position[unchanged]])
+
+    return _revised_analysis(previous, new_df, delta, retract_labels, insert_positions, relabel)
+
+
+def _revised_analysis(previous, new_df, delta, retract_labels, insert_positions, relabel):
+    """جدول پاک‌شده جدید از سطرهای بدون تغییر نسخه قبلی و سطرهای دوباره پاک‌سازی‌شده"""
+    previous_clean = previous.df_clean
+    delta.retracted = previous_clean.loc[previous_clean.index.isin(retract_labels)]
+    delta.inserted = clean_rows(new_df.iloc[insert_positions], previous.roles)
+
+    if relabel is None and delta.retracted.empty and delta.inserted.empty:
+        df_clean = previous_clean
+    else:
+        kept = previous_clean.drop(index=delta.retracted.index)
+        if relabel is not None:
+            kept.index = pd.Index(relabel.loc[kept.index].to_numpy(), dtype=new_df.index.dtype)
+        df_clean = pd.concat([kept, delta.inserted]).sort_index() if len(delta.inserted) else kept.sort_index()
+
+    return SheetAnalysis(
+        df=new_df,
+        df_clean=df_clean,
+        subject_columns=previous.subject_columns,
+        class_column=previous.class_column,
+        name_cols=previous.name_cols,
+        roles=previous.roles,
+        delta=delta
+    )
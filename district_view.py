@@ -0,0 +1,175 @@
+import os
+
+import streamlit as st
+
+import charts
+from federated import (
+    CLASS_LABEL_COLUMN, aggregate_workbooks, average_histogram_counts, class_stats_table,
+    merged_average_sketch, ranking_table, subject_stats_table
+)
+from ingest import UPLOAD_TYPES
+from normalization import MODE_RAW, NORMALIZATION_MODES, NORMALIZED_COLUMN
+
+# ----------------- نمای منطقه (چند مدرسه) -----------------
+# همان شاخص‌ها، جدول‌ها و نمودارهای نمای تک‌مدرسه، این بار از ادغام آماره‌های
+# جزئی همه فایل‌های مدارس.
+
+# پوشه‌های روی سرور فقط زیر این ریشه قابل انتخاب‌اند؛ بدون تنظیم آن فقط آپلود ممکن است
+DISTRICT_ROOT = os.environ.get('RAVESH_DISTRICT_DIR')
+SOURCE_EXTENSIONS = tuple('.' + ext for ext in UPLOAD_TYPES)
+
+
+def _server_folders(root):
+    """ریشه و زیرپوشه‌های مستقیم آن"""
+    folders = ['.']
+    try:
+        folders += sorted(entry.name for entry in os.scandir(root) if entry.is_dir())
+    except OSError:
+        pass
+    return folders
+
+
+def _inside(path, root):
+    """آیا مسیر (پس از دنبال کردن پیوندها) درون ریشه است"""
+    root = os.path.realpath(root)
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+def _collect_sources():
+    """فایل‌های آپلود شده و فایل‌های پوشه سرور به صورت (نام مدرسه، منبع، نام فایل)"""
+    st.sidebar.header("🏙️ فایل‌های مدارس")
+    uploaded_files = st.sidebar.file_uploader(
+        "فایل‌های کارنامه مدارس را انتخاب کنید",
+        type=UPLOAD_TYPES,
+        accept_multiple_files=True
+    )
+    folder = None
+    if DISTRICT_ROOT and os.path.isdir(DISTRICT_ROOT):
+        folder = st.sidebar.selectbox(
+            "یا پوشه فایل‌ها روی سرور",
+            [None] + _server_folders(DISTRICT_ROOT),
+            format_func=lambda name: "—" if name is None else name
+        )
+
+    sources, key = [], []
+    for uploaded in uploaded_files or []:
+        sources.append((os.path.splitext(uploaded.name)[0], uploaded.getvalue(), uploaded.name))
+        key.append(uploaded.file_id)
+
+    if folder is not None:
+        directory = os.path.join(DISTRICT_ROOT, folder)
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if (
+                entry.is_file() and entry.name.lower().endswith(SOURCE_EXTENSIONS)
+                and _inside(entry.path, DISTRICT_ROOT)
+            ):
+                sources.append((os.path.splitext(entry.name)[0], entry.path, entry.name))
+                stat = entry.stat()
+                key.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    return sources, tuple(key)
+
+
+def render():
+    """نمایش نمای منطقه"""
+    sources, sources_key = _collect_sources()
+    if not sources:
+        st.info("📊 فایل‌های کارنامه مدارس را آپلود کنید یا پوشه آن‌ها را انتخاب کنید.")
+        return
+
+    if st.session_state.get('district_key') != sources_key:
+        progress = st.progress(0.0, text="در حال پردازش فایل‌های مدارس...")
+        partial = aggregate_workbooks(
+            sources,
+            progress=lambda done, total: progress.progress(done / total, text=f"{done} از {total} فایل پردازش شد")
+        )
+        progress.empty()
+        st.session_state['district_key'] = sources_key
+        st.session_state['district'] = partial
+    partial = st.session_state['district']
+
+    if partial.errors:
+        with st.expander(f"⚠️ {len(partial.errors)} فایل/شیت خوانده نشد"):
+            for name, error in partial.errors.items():
+                st.write(f"**{name}**: {error}")
+    if not partial.sheet_names:
+        st.error("❌ در هیچ فایلی ستون درسی شناسایی نشد!")
+        return
+
+    with st.sidebar:
+        st.markdown("---")
+        sheet = st.selectbox("انتخاب پایه / شیت", partial.sheet_names, index=0)
+        st.write(f"تعداد مدارس: **{len(partial.schools)}**")
+
+    average_sketch = merged_average_sketch(partial, sheet)
+
+    # ----------------- شاخص‌های کلیدی -----------------
+    st.subheader("📊 شاخص‌های عملکردی منطقه")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("تعداد دانش‌آموز", average_sketch.n)
+    with col2:
+        st.metric("میانگین کل", f"{average_sketch.mean():.2f}")
+    with col3:
+        st.metric("بیشترین نمره", f"{average_sketch.max:.2f}")
+    with col4:
+        st.metric("کمترین نمره", f"{average_sketch.min:.2f}")
+    with col5:
+        st.metric("انحراف معیار", f"{average_sketch.std():.2f}")
+
+    st.markdown("---")
+
+    # ----------------- تحلیل دروس -----------------
+    st.subheader("📚 تحلیل عملکرد درسی")
+    subject_df_sorted = subject_stats_table(partial, sheet)
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.plotly_chart(charts.subject_bar(subject_df_sorted), use_container_width=True)
+    with col2:
+        st.write("📊 آمار دروس:")
+        st.dataframe(
+            subject_df_sorted[['درس', 'میانگین', 'بیشترین', 'کمترین']],
+            use_container_width=True,
+            height=400
+        )
+
+    tab1, tab2, tab3 = st.tabs(["📈 توزیع نمرات", "🏫 مقایسه کلاس‌ها", "🥇 رتبه‌بندی"])
+
+    with tab1:
+        col1, col2 = st.columns(2)
+        with col1:
+            starts, counts, width = average_histogram_counts(average_sketch)
+            st.plotly_chart(charts.average_histogram_from_counts(starts, counts, width), use_container_width=True)
+        with col2:
+            st.write("📊 آمار توصیفی:")
+            st.write(average_sketch.describe().round(2))
+
+    with tab2:
+        class_stats = class_stats_table(partial, sheet)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(charts.class_bar(class_stats.head(30), CLASS_LABEL_COLUMN), use_container_width=True)
+        with col2:
+            st.write("📋 آمار کلاس‌ها:")
+            st.dataframe(class_stats, use_container_width=True, hide_index=True)
+
+    with tab3:
+        ranking_mode = st.radio(
+            "مبنای رتبه‌بندی",
+            list(NORMALIZATION_MODES),
+            format_func=NORMALIZATION_MODES.get,
+            horizontal=True,
+            key='district_ranking_mode'
+        )
+        ranking_df = ranking_table(partial, sheet, ranking_mode)
+        st.dataframe(ranking_df, use_container_width=True, height=400, hide_index=True)
+        if len(ranking_df) >= 3:
+            st.subheader("🏆 برترین‌های منطقه")
+            value_column = 'میانگین نمرات' if ranking_mode == MODE_RAW else NORMALIZED_COLUMN
+            st.plotly_chart(charts.top_bar(ranking_df.head(5), 'نام کامل', value_column), use_container_width=True)
+
+        st.download_button(
+            "🥇 دانلود رتبه‌بندی منطقه (CSV)",
+            data=ranking_df.to_csv(index=False, encoding='utf-8-sig'),
+            file_name=f"رتبه‌بندی_منطقه_{sheet}_{ranking_mode}.csv",
+            mime="text/csv"
+        )
@@ -0,0 +1,190 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from analysis import AVERAGE_COLUMN, prepare_sheet, student_names
+from ingest import TableFile
+from normalization import MODE_RAW, NORMALIZATION_MODES, NORMALIZED_COLUMN, normalized_average
+from risk import class_baselines
+from sketches import DEFAULT_ERROR, build_sketches
+
+# ----------------- تجمیع چند مدرسه (نگاشت-کاهش) -----------------
+# هر فایل در یک فرآیند کارگر به آماره‌های جزئی قابل ادغام تبدیل می‌شود: خلاصه‌های
+# چندکی (شمارش، مجموع، مجموع مربعات، کمینه/بیشینه و هیستوگرام) و بهترین K
+# دانش‌آموز. فقط همین آماره‌ها بین فرآیندها جابه‌جا می‌شوند، نه جدول‌های کامل.
+
+DEFAULT_TOP_K = 50
+SCHOOL_COLUMN = 'مدرسه'
+CLASS_LABEL_COLUMN = 'کلاس'
+
+
+@dataclass
+class PartialAggregate:
+    """آماره‌های جزئی یک یا چند فایل"""
+    # (شیت، مدرسه، کلاس) -> خلاصه میانگین نمرات دانش‌آموزان
+    classes: dict = field(default_factory=dict)
+    # (شیت، درس) -> خلاصه نمرات درس
+    subjects: dict = field(default_factory=dict)
+    # (شیت، حالت نرمال‌سازی) -> [(امتیاز، میانگین، نام، مدرسه، کلاس)] بهترین K دانش‌آموز
+    top: dict = field(default_factory=dict)
+    schools: list = field(default_factory=list)
+    errors: dict = field(default_factory=dict)
+    top_k: int = DEFAULT_TOP_K
+
+    def merge(self, other):
+        """ادغام آماره‌های جزئی یک فایل دیگر"""
+        for target, source in ((self.classes, other.classes), (self.subjects, other.subjects)):
+            for key, sketch in source.items():
+                if key in target:
+                    target[key].merge(sketch)
+                else:
+                    target[key] = sketch
+        for key, rows in other.top.items():
+            self.top[key] = heapq.nlargest(self.top_k, self.top.get(key, []) + rows)
+        self.schools.extend(other.schools)
+        self.errors.update(other.errors)
+        return self
+
+    @property
+    def sheet_names(self):
+        return sorted({sheet for sheet, _, _ in self.classes})
+
+
+def reduce_workbook(source, school, top_k=DEFAULT_TOP_K, error=DEFAULT_ERROR, file_name=None):
+    """تبدیل یک فایل (اکسل، CSV، Parquet یا Arrow) به آماره‌های جزئی (در فرآیند کارگر اجرا می‌شود)"""
+    partial = PartialAggregate(schools=[school], top_k=top_k)
+    try:
+        xls = TableFile(source, file_name)
+        sheet_names = xls.sheet_names
+    except Exception as e:
+        partial.errors[school] = str(e)
+        return partial
+
+    for sheet_name in sheet_names:
+        try:
+            analysis = prepare_sheet(xls.parse(sheet_name))
+        except Exception as e:
+            partial.errors[f"{school} / {sheet_name}"] = str(e)
+            continue
+        if not analysis.subject_columns or analysis.df_clean.empty:
+            continue
+
+        df_clean = analysis.df_clean
+        class_column = analysis.class_column
+        sketches = build_sketches(df_clean, class_column, analysis.subject_columns + [AVERAGE_COLUMN], error)
+        for (cls, col), sketch in sketches.items():
+            if col == AVERAGE_COLUMN:
+                partial.classes[(sheet_name, school, cls)] = sketch
+            elif (sheet_name, col) in partial.subjects:
+                partial.subjects[(sheet_name, col)].merge(sketch)
+            else:
+                partial.subjects[(sheet_name, col)] = sketch.copy()
+
+        # امتیاز نرمال‌شده درون کلاس‌های همین مدرسه محاسبه و سپس سراسری ادغام می‌شود
+        baselines = class_baselines(df_clean, class_column, analysis.subject_columns)
+        for mode in NORMALIZATION_MODES:
+            if mode == MODE_RAW:
+                scores = df_clean[AVERAGE_COLUMN]
+            else:
+                scores = normalized_average(df_clean, class_column, analysis.subject_columns, mode, baselines)
+            best = df_clean.loc[scores.dropna().nlargest(top_k).index]
+            names = student_names(best, analysis.name_cols)
+            partial.top[(sheet_name, mode)] = [
+                (float(score), float(avg), name, school, cls)
+                for score, avg, name, cls in zip(scores[best.index], best[AVERAGE_COLUMN], names, best[class_column])
+            ]
+    return partial
+
+
+def aggregate_workbooks(sources, max_workers=None, top_k=DEFAULT_TOP_K, progress=None):
+    """اجرای موازی reduce_workbook و ادغام نتایج
+
+    sources: فهرست (نام مدرسه، مسیر فایل یا محتوای بایتی، نام فایل)
+    progress: تابع اختیاری که پس از هر فایل با (تعداد انجام‌شده، کل) صدا زده می‌شود
+    """
+    merged = PartialAggregate(top_k=top_k)
+    max_workers = max_workers or min(len(sources), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(reduce_workbook, source, school, top_k, file_name=file_name)
+            for school, source, file_name in sources
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            merged.merge(future.result())
+            if progress is not None:
+                progress(done, len(futures))
+    merged.schools.sort()
+    return merged
+
+
+# ----------------- جدول‌های نمای منطقه -----------------
+def _sketch_row(sketch):
+    return {
+        'تعداد': sketch.n,
+        'میانگین': sketch.mean(),
+        'انحراف معیار': sketch.std(),
+        'کمترین': sketch.min,
+        'میانه': sketch.quantile(0.5),
+        'بیشترین': sketch.max,
+    }
+
+
+def merged_average_sketch(partial, sheet):
+    """خلاصه میانگین نمرات کل دانش‌آموزان یک پایه"""
+    merged = None
+    for (sheet_name, _, _), sketch in partial.classes.items():
+        if sheet_name == sheet:
+            merged = sketch.copy() if merged is None else merged.merge(sketch)
+    return merged
+
+
+def class_stats_table(partial, sheet):
+    """آمار کلاس‌ها با همان ستون‌های تب مقایسه کلاس‌ها"""
+    rows = []
+    for (sheet_name, school, cls), sketch in partial.classes.items():
+        if sheet_name == sheet:
+            rows.append({CLASS_LABEL_COLUMN: f"{school} / {cls}", **_sketch_row(sketch)})
+    return pd.DataFrame(rows).round(2).sort_values('میانگین', ascending=False)
+
+
+def subject_stats_table(partial, sheet):
+    """آمار دروس با همان ستون‌های بخش تحلیل دروس"""
+    rows = []
+    for (sheet_name, subject), sketch in partial.subjects.items():
+        if sheet_name == sheet:
+            rows.append({
+                'درس': subject,
+                'میانگین': sketch.mean(),
+                'بیشترین': sketch.max,
+                'کمترین': sketch.min,
+                'انحراف معیار': sketch.std(),
+                'تعداد نمره': sketch.n
+            })
+    return pd.DataFrame(rows).round(2).sort_values('میانگین', ascending=False)
+
+
+def ranking_table(partial, sheet, mode=MODE_RAW):
+    """رتبه‌بندی سراسری بهترین دانش‌آموزان یک پایه (خام یا نرمال‌شده درون کلاس)"""
+    ranking = pd.DataFrame(
+        partial.top.get((sheet, mode), []),
+        columns=[NORMALIZED_COLUMN, AVERAGE_COLUMN, 'نام کامل', SCHOOL_COLUMN, CLASS_LABEL_COLUMN]
+    )
+    if mode == MODE_RAW:
+        ranking = ranking.drop(columns=NORMALIZED_COLUMN)
+    else:
+        ranking[NORMALIZED_COLUMN] = ranking[NORMALIZED_COLUMN].round(3)
+    ranking.insert(0, 'رتبه', np.arange(1, len(ranking) + 1))
+    return ranking
+
+
+def average_histogram_counts(sketch, bin_width=1.0):
+    """شمارش‌های هیستوگرام میانگین نمرات با عرض سطل دلخواه"""
+    factor = max(int(round(bin_width / sketch.error)), 1)
+    n_bins = int(np.ceil(sketch.n_bins / factor))
+    counts = np.bincount(np.arange(sketch.n_bins) // factor, weights=sketch.counts, minlength=n_bins)
+    starts = sketch.lo + np.arange(n_bins) * factor * sketch.error
+    return starts, counts, factor * sketch.error
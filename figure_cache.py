@@ -0,0 +1,66 @@
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+# ----------------- کش نمودارها -----------------
+# نمودارها به صورت دیکشنری مشخصات (خروجی JSON) و با کلید «نسخه داده + فیلترهای فعال»
+# نگه داشته می‌شوند؛ حجم هر نمودار طول JSON آن است و با عبور از سقف حجم، قدیمی‌ترین
+# نمودارهای استفاده‌نشده حذف می‌شوند. هنگام استفاده دوباره، مشخصات بدون اعتبارسنجی
+# دوباره پیچیده می‌شوند (دیکشنری خام را st.plotly_chart کامل اعتبارسنجی می‌کند).
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    """کش LRU نمودارهای plotly با سقف حجم"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._specs = OrderedDict()  # کلید -> (دیکشنری مشخصات، حجم)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._specs)
+
+    def get(self, key):
+        """نمودار ذخیره‌شده برای کلید (یا None)"""
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self._specs.move_to_end(key)
+            self.hits += 1
+        # سازنده داده‌ها را کپی می‌کند؛ تغییر نمودار بازگشتی مشخصات ذخیره‌شده را تغییر نمی‌دهد
+        return go.Figure(spec[0], _validate=False)
+
+    def put(self, key, fig):
+        spec = fig.to_json()
+        with self._lock:
+            if key in self._specs:
+                self.size -= self._specs.pop(key)[1]
+            if len(spec) > self.max_bytes:
+                return
+            self._specs[key] = (json.loads(spec), len(spec))
+            self.size += len(spec)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._specs.popitem(last=False)
+                self.size -= evicted
+
+    def get_or_build(self, key, builder):
+        """بازگرداندن نمودار از کش یا ساخت و ذخیره آن"""
+        fig = self.get(key)
+        if fig is None:
+            fig = builder()
+            self.put(key, fig)
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self.size = 0
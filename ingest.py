@@ -0,0 +1,317 @@
+import codecs
+import hashlib
+import os
+import zipfile
+from dataclasses import dataclass, field
+from io import BytesIO
+
+# ----------------- لایه ورودی فایل‌ها -----------------
+# فهرست شیت‌ها بدون وارد کردن pandas و بدون خواندن داده‌ها به دست می‌آید تا
+# انتخاب‌گر شیت در اولین نمایش صفحه بدون تأخیر ظاهر شود.
+
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+CSV_EXTENSIONS = ('.csv',)
+PARQUET_EXTENSIONS = ('.parquet',)
+ARROW_EXTENSIONS = ('.feather', '.arrow')
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+
+def _as_handle(source):
+    return BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def file_kind(file_name):
+    """نوع فایل از روی پسوند: excel، csv، parquet یا arrow"""
+    extension = os.path.splitext(file_name or '')[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return 'csv'
+    if extension in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if extension in ARROW_EXTENSIONS:
+        return 'arrow'
+    return 'excel'
+
+
+def table_sheet_name(file_name):
+    """نام تنها شیت فایل‌های تک‌جدولی (CSV، Parquet، Arrow)"""
+    return os.path.splitext(os.path.basename(file_name))[0] or 'داده'
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Parquet/Arrow فقط با نصب pyarrow در انتخاب‌گر فایل پیشنهاد می‌شوند
+UPLOAD_TYPES = [
+    ext.lstrip('.')
+    for ext in EXCEL_EXTENSIONS + CSV_EXTENSIONS + ((PARQUET_EXTENSIONS + ARROW_EXTENSIONS) if pyarrow_available() else ())
+]
+
+
+# ----------------- فایل‌های تک‌جدولی -----------------
+# CSV با پارسر چندرشته‌ای pyarrow (در صورت نصب) و Parquet/Arrow مستقیم از بافر
+# حافظه خوانده می‌شوند؛ هر فایل یک «شیت» به نام خود فایل دارد و از همان مسیر
+# شناسایی ستون‌ها و کش فایل‌های اکسل عبور می‌کند.
+
+def detect_encoding(data):
+    """تشخیص کدگذاری فایل CSV فارسی: utf-8(-sig)، utf-16 یا cp1256"""
+    if data.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    sample = data[:ENCODING_SAMPLE_BYTES]
+    # utf-16 بدون BOM: بایت بالای نویسه‌های لاتین 0x00 و نویسه‌های فارسی 0x06 است
+    for high_bytes, encoding in ((sample[1::2], 'utf-16-le'), (sample[0::2], 'utf-16-be')):
+        if high_bytes and high_bytes.count(0) + high_bytes.count(6) > len(high_bytes) // 2:
+            return encoding
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # نویسه چندبایتی بریده‌شده در انتهای نمونه
+        if e.start < len(sample) - 3:
+            return 'cp1256'
+    return 'utf-8'
+
+
+def read_csv(source, nrows=None):
+    """خواندن CSV با تشخیص کدگذاری؛ خواندن کامل با موتور چندرشته‌ای pyarrow"""
+    import pandas as pd
+
+    data = _read_bytes(source)
+    encoding = detect_encoding(data)
+    if nrows is None and pyarrow_available():
+        return pd.read_csv(BytesIO(data), encoding=encoding, engine='pyarrow')
+    return pd.read_csv(BytesIO(data), encoding=encoding, nrows=nrows)
+
+
+def _arrow_source(source, kind):
+    """بافر حافظه (یا نگاشت حافظه فایل) بدون کپی داده‌ها"""
+    import pyarrow as pa
+
+    if isinstance(source, (bytes, bytearray)):
+        source = pa.BufferReader(pa.py_buffer(source))
+    else:
+        source = pa.memory_map(source)
+    if kind == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(source)
+    return pa.ipc.open_file(source)
+
+
+def read_columnar(source, kind, nrows=None):
+    """خواندن Parquet یا Arrow IPC؛ Arrow بدون کپی از بافر حافظه خوانده می‌شود"""
+    import pyarrow as pa
+
+    reader = _arrow_source(source, kind)
+    if kind == 'parquet':
+        if nrows is None:
+            table = reader.read()
+        else:
+            batch = next(reader.iter_batches(batch_size=nrows), None)
+            table = pa.Table.from_batches([batch]) if batch is not None else reader.schema_arrow.empty_table()
+    else:
+        table = reader.read_all()
+        if nrows is not None:
+            table = table.slice(0, nrows)
+    return table.to_pandas()
+
+
+def _row_count(source, kind):
+    """تعداد سطرها از فراداده Parquet/Arrow بدون خواندن داده‌ها"""
+    reader = _arrow_source(source, kind)
+    if kind == 'parquet':
+        return reader.metadata.num_rows
+    return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+class TableFile:
+    """دسترسی یکسان به شیت‌های اکسل و فایل‌های تک‌جدولی"""
+
+    def __init__(self, source, file_name=None):
+        self.source = source
+        self.file_name = file_name or (source if isinstance(source, str) else '')
+        self.kind = file_kind(self.file_name)
+        self._excel = None
+
+    @property
+    def sheet_names(self):
+        if self.kind == 'excel':
+            return self._excel_file().sheet_names
+        return [table_sheet_name(self.file_name)]
+
+    def _excel_file(self):
+        if self._excel is None:
+            import pandas as pd
+            self._excel = pd.ExcelFile(_as_handle(self.source))
+        return self._excel
+
+    def parse(self, sheet, nrows=None):
+        if self.kind == 'excel':
+            return self._excel_file().parse(sheet, nrows=nrows)
+        if self.kind == 'csv':
+            return read_csv(self.source, nrows=nrows)
+        return read_columnar(self.source, self.kind, nrows=nrows)
+
+
+def list_sheet_names(source, file_name=None):
+    """فهرست شیت‌های یک فایل (source: مسیر فایل یا محتوای بایتی)"""
+    file_name = file_name or (source if isinstance(source, str) else '')
+    if file_kind(file_name) != 'excel':
+        return [table_sheet_name(file_name)]
+
+    if not file_name.lower().endswith('.xls'):
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(_as_handle(source), read_only=True)
+        except zipfile.BadZipFile:
+            pass  # احتمالاً فایل xls با پسوند نادرست
+        else:
+            try:
+                return list(workbook.sheetnames)
+            finally:
+                workbook.close()
+
+    # فایل‌های xls قدیمی فقط از طریق pandas/xlrd خوانده می‌شوند
+    import pandas as pd
+    return pd.ExcelFile(_as_handle(source)).sheet_names
+
+
+def workbook_hash(source):
+    """شناسه محتوای فایل (source: مسیر فایل یا محتوای بایتی)"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+# ----------------- بررسی اولیه ساختار فایل -----------------
+# پیش از خواندن کامل، فقط سطر عنوان و چند سطر نمونه از هر شیت خوانده می‌شود تا
+# شیت‌های بدون ساختار کارنامه در چند میلی‌ثانیه رد شوند.
+
+PREFLIGHT_OK = 'ok'
+PREFLIGHT_WARN = 'warn'
+PREFLIGHT_REJECT = 'reject'
+
+
+@dataclass
+class SheetPreflight:
+    """نتیجه بررسی اولیه یک شیت"""
+    sheet: str
+    rows: object
+    columns: int
+    roles: object
+    status: str
+    messages: list = field(default_factory=list)
+
+
+def _read_samples(source, file_name, sample_rows):
+    """سطر عنوان، سطرهای نمونه و تعداد تقریبی سطرهای هر شیت"""
+    kind = file_kind(file_name)
+    if kind != 'excel':
+        sample = TableFile(source, file_name).parse(None, nrows=sample_rows)
+        total = _row_count(source, kind) if kind != 'csv' else None
+        return {table_sheet_name(file_name): (list(sample.columns), sample.values.tolist(), total)}
+
+    if not file_name.lower().endswith('.xls'):
+        from openpyxl import load_workbook
+        try:
+            workbook = load_workbook(_as_handle(source), read_only=True, data_only=True)
+        except zipfile.BadZipFile:
+            pass
+        else:
+            try:
+                samples = {}
+                for ws in workbook.worksheets:
+                    rows = ws.iter_rows(max_row=sample_rows + 1, values_only=True)
+                    header = list(next(rows, ()))
+                    body = [list(row) for row in rows]
+                    total = ws.max_row - 1 if ws.max_row else None
+                    samples[ws.title] = (header, body, total)
+                return samples
+            finally:
+                workbook.close()
+
+    import pandas as pd
+    samples = {}
+    xls = pd.ExcelFile(_as_handle(source))
+    for sheet in xls.sheet_names:
+        sample = xls.parse(sheet, nrows=sample_rows)
+        samples[sheet] = (list(sample.columns), sample.values.tolist(), None)
+    return samples
+
+
+def _sample_frame(header, body):
+    """ساخت DataFrame نمونه با نام‌گذاری ستون‌ها مانند pandas.read_excel"""
+    import pandas as pd
+
+    width = len(header)
+    # حذف ستون‌های خالی انتهایی که openpyxl در حالت فقط‌خواندنی برمی‌گرداند
+    while width and header[width - 1] is None and all(
+        len(row) < width or row[width - 1] is None for row in body
+    ):
+        width -= 1
+    columns = [
+        f"Unnamed: {i}" if name is None else name
+        for i, name in enumerate(header[:width])
+    ]
+    body = [(list(row) + [None] * width)[:width] for row in body]
+    return pd.DataFrame(body, columns=columns)
+
+
+def preflight_workbook(source, file_name=None, sample_rows=None):
+    """بررسی سریع ساختار همه شیت‌ها پیش از خواندن کامل"""
+    from analysis import DETECTION_SAMPLE_ROWS, detect_column_roles, empty_roles
+
+    file_name = file_name or (source if isinstance(source, str) else '')
+    sample_rows = sample_rows or DETECTION_SAMPLE_ROWS
+
+    results = {}
+    for sheet, (header, body, total) in _read_samples(source, file_name, sample_rows).items():
+        df = _sample_frame(header, body)
+        rows = total if total is not None else (len(body) if len(body) < sample_rows else None)
+
+        # شیت خالی بدون ستون: شناسایی نقش‌ها معنا ندارد
+        roles = detect_column_roles(df) if len(df.columns) else empty_roles()
+
+        status, messages = PREFLIGHT_OK, []
+        if len(df.columns) == 0:
+            status = PREFLIGHT_REJECT
+            messages.append("شیت خالی است")
+        elif df.empty or not roles.subject_columns:
+            status = PREFLIGHT_REJECT
+            messages.append("هیچ ستون درسی شناسایی نشد")
+        else:
+            if roles.confidence['subject'] < 0.6:
+                messages.append("ستون‌های درسی از روی عددی بودن داده‌ها حدس زده شدند")
+            if roles.confidence['class'] < 1:
+                messages.append(f"ستون کلاس با قطعیت شناسایی نشد (ستون «{roles.class_column}» انتخاب شد)")
+            if roles.confidence['name'] == 0:
+                messages.append("ستون نام پیدا نشد")
+            if messages:
+                status = PREFLIGHT_WARN
+
+        results[sheet] = SheetPreflight(
+            sheet=sheet,
+            rows=rows,
+            columns=len(df.columns),
+            roles=roles,
+            status=status,
+            messages=messages
+        )
+    return results
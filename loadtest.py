@@ -0,0 +1,421 @@
+"""آزمون بار داشبورد با نشست‌های هم‌زمان شبیه‌سازی‌شده
+
+برای هر سطح هم‌زمانی یک سرور واقعی `streamlit run app.py` بالا می‌آید و همه نشست‌ها
+(هر کدام یک رشته در همین فرآیند) از راه وب‌سوکت و همان پروتکل مرورگر به آن وصل می‌شوند؛
+بنابراین کش‌ها، ثبت نشست‌ها و کارهای پس‌زمینه سرور مثل استقرار واقعی بین نشست‌ها مشترک
+است. هر نشست یک فایل ساختگی آپلود می‌کند و سپس به صورت تصادفی شیت و کلاس عوض می‌کند،
+کنترل‌های تب‌ها را تغییر می‌دهد و خروجی می‌گیرد. برای هر سطح صدک‌های ۵۰/۹۵/۹۹ زمان
+اجرای دوباره، توان عملیاتی و افزایش حافظه مقیم فرآیند سرور به ازای هر نشست گزارش
+می‌شود. خطای یک نشست ثبت می‌شود و بقیه نشست‌ها ادامه می‌دهند.
+
+    python loadtest.py --concurrency 1 2 4 8 --actions 20
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.sync.client import connect
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+SUBJECTS = ['قرآن', 'ریاضی', 'علوم تجربی', 'ادبیات فارسی', 'عربی', 'زبان انگلیسی', 'مطالعات اجتماعی', 'تفکر']
+SHEETS = ['پایه هفتم', 'پایه هشتم', 'پایه نهم']
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+READY_POLL_INTERVAL = 0.1
+READY_TIMEOUT = 120
+SERVER_START_TIMEOUT = 60
+# پوشه‌های کش و ریزش سرور؛ هر سطح پوشه‌های تازه می‌گیرد تا نتایج اجرای قبلی برخورد گرم نسازند
+STATE_DIRS = {
+    'RAVESH_RESULT_CACHE_DIR': 'result_cache',
+    'RAVESH_SPILL_DIR': 'spill',
+    'RAVESH_VIEW_DIR': 'shared_views',
+}
+
+
+# ----------------- فایل ساختگی -----------------
+def synthetic_workbook(students=300, classes=8, subjects=SUBJECTS, sheets=SHEETS, seed=0):
+    """محتوای بایتی یک فایل اکسل کارنامه با نمرات تصادفی"""
+    rng = np.random.default_rng(seed)
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for sheet in sheets:
+            frame = pd.DataFrame({
+                'نام': [f'دانش‌آموز{i}' for i in range(students)],
+                'نام خانوادگی': [f'خانواده{i}' for i in range(students)],
+                'کلاس': rng.integers(1, classes + 1, students).astype(str),
+            })
+            for subject in subjects:
+                frame[subject] = np.clip(rng.normal(15, 3, students), 0, 20).round(2)
+            frame.to_excel(writer, sheet_name=sheet, index=False)
+    return buffer.getvalue()
+
+
+def rss_bytes(pid):
+    """حافظه مقیم فعلی یک فرآیند (در نبود /proc نامعلوم)"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return np.nan
+
+
+# ----------------- سرور مشترک -----------------
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class StreamlitServer:
+    """یک فرآیند `streamlit run app.py` با کش خالی که همه نشست‌های یک سطح به آن وصل می‌شوند"""
+
+    def __init__(self):
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.state_dir = None
+        self.process = None
+
+    def __enter__(self):
+        self.state_dir = tempfile.mkdtemp(prefix='ravesh-loadtest-')
+        env = {name: os.path.join(self.state_dir, folder) for name, folder in STATE_DIRS.items()}
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+                '--server.headless', 'true',
+                '--server.address', '127.0.0.1',
+                '--server.port', str(self.port),
+                '--server.fileWatcherType', 'none',
+                # کلاینت آزمون کوکی XSRF مرورگر را ندارد
+                '--server.enableXsrfProtection', 'false',
+                '--server.enableCORS', 'false',
+                '--browser.gatherUsageStats', 'false',
+            ],
+            env={**os.environ, **env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self._wait_until_healthy()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.state_dir, ignore_errors=True)
+
+    def _wait_until_healthy(self):
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"سرور streamlit با کد {self.process.returncode} متوقف شد")
+            try:
+                with urllib.request.urlopen(f'{self.url}/_stcore/health', timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except (urllib.error.URLError, OSError):
+                pass
+            time.sleep(READY_POLL_INTERVAL)
+        raise TimeoutError("سرور streamlit در زمان مقرر آماده نشد")
+
+    def rss(self):
+        return rss_bytes(self.process.pid)
+
+
+# ----------------- نشست شبیه‌سازی‌شده -----------------
+class SimulatedSession:
+    """یک کاربر داشبورد که مثل مرورگر از راه وب‌سوکت با سرور کار می‌کند"""
+
+    def __init__(self, server_url, workbook, seed, timeout=READY_TIMEOUT):
+        self.server_url = server_url
+        self.workbook = workbook
+        self.random = random.Random(seed)
+        self.timeout = timeout
+        self.latencies = []
+        self.errors = []
+        self.session_id = None
+        self.page_script_hash = ''
+        self.widgets = {}  # برچسب -> (نوع، پیام عنصر) در آخرین اجرا
+        self.states = {}  # شناسه ویجت -> مقداری که کاربر تنظیم کرده است
+        self.tabs = False
+        self.socket = None
+        self._connection = ExitStack()
+
+    def close(self):
+        self._connection.close()
+
+    # ---------- پروتکل ----------
+    def _send(self, message):
+        self.socket.send(message.SerializeToString())
+
+    def _receive(self):
+        return ForwardMsg.FromString(self.socket.recv(timeout=self.timeout))
+
+    def _collect(self):
+        """خواندن پیام‌های سرور تا پایان اجرای اسکریپت و ثبت ویجت‌ها و خطاها"""
+        widgets, tabs = {}, False
+        while True:
+            message = self._receive()
+            kind = message.WhichOneof('type')
+            if kind == 'new_session':
+                self.session_id = message.new_session.initialize.session_id or self.session_id
+                self.page_script_hash = message.new_session.page_script_hash
+            elif kind == 'delta':
+                delta = message.delta
+                if delta.WhichOneof('type') == 'new_element':
+                    element_kind = delta.new_element.WhichOneof('type')
+                    element = getattr(delta.new_element, element_kind)
+                    if element_kind == 'exception':
+                        self.errors.append(element.message)
+                    elif hasattr(element, 'label') and hasattr(element, 'id'):
+                        widgets[element.label] = (element_kind, element)
+                elif delta.WhichOneof('type') == 'add_block':
+                    tabs = tabs or delta.add_block.WhichOneof('type') == 'tab_container'
+            elif kind == 'script_finished':
+                # st.rerun اجرای جاری را زودتر تمام و بلافاصله اجرای تازه‌ای شروع می‌کند
+                if message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        self.widgets, self.tabs = widgets, tabs
+        # مقدار ویجت‌هایی که دیگر ساخته نمی‌شوند (مثلاً با تغییر گزینه‌ها) فرستاده نمی‌شود
+        current = {element.id for _, element in widgets.values()}
+        self.states = {key: state for key, state in self.states.items() if key in current}
+
+    def _run(self, trigger=None):
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.page_script_hash = self.page_script_hash
+        message.rerun_script.widget_states.widgets.extend(
+            list(self.states.values()) + ([trigger] if trigger is not None else [])
+        )
+        started = time.perf_counter()
+        self._send(message)
+        self._collect()
+        self.latencies.append(time.perf_counter() - started)
+
+    def _set(self, element, **value):
+        state = WidgetState(id=element.id, **value)
+        self.states[element.id] = state
+        self._run()
+
+    def _upload(self, element, name, data, mime):
+        request = BackMsg()
+        request.file_urls_request.request_id = uuid.uuid4().hex
+        request.file_urls_request.file_names.append(name)
+        request.file_urls_request.session_id = self.session_id
+        self._send(request)
+        message = self._receive()
+        while message.WhichOneof('type') != 'file_urls_response':
+            message = self._receive()
+        urls = message.file_urls_response.file_urls[0]
+
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f'Content-Type: {mime}\r\n\r\n'
+        ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+        upload = urllib.request.Request(
+            self.server_url + urls.upload_url, data=body, method='PUT',
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+        )
+        urllib.request.urlopen(upload, timeout=self.timeout).close()
+
+        state = WidgetState(id=element.id)
+        info = state.file_uploader_state_value.uploaded_file_info.add(name=name, size=len(data), file_id=urls.file_id)
+        info.file_urls.CopyFrom(urls)
+        self.states[element.id] = state
+        self._run()
+
+    def _wait_until_ready(self):
+        """اجرای دوباره تا آماده شدن شیت انتخابی در پردازش پس‌زمینه"""
+        deadline = time.monotonic() + self.timeout
+        while not self.tabs and not self.errors and time.monotonic() < deadline:
+            time.sleep(READY_POLL_INTERVAL)
+            self._run()
+
+    def _widget(self, kind, label):
+        widget = self.widgets.get(label)
+        return widget[1] if widget is not None and widget[0] == kind else None
+
+    def connect(self):
+        """باز کردن وب‌سوکت و اجرای اول صفحه"""
+        ws_url = self.server_url.replace('http', 'ws', 1) + '/_stcore/stream'
+        self.socket = self._connection.enter_context(
+            connect(ws_url, subprotocols=['streamlit'], max_size=None, open_timeout=self.timeout)
+        )
+        self._run()
+
+    def open(self):
+        self.connect()
+        uploader = next((element for kind, element in self.widgets.values() if kind == 'file_uploader'), None)
+        if uploader is None:
+            raise RuntimeError("ویجت آپلود فایل پیدا نشد")
+        self._upload(uploader, 'loadtest.xlsx', self.workbook, XLSX_MIME)
+        self._wait_until_ready()
+
+    # ---------- کارها ----------
+    def pick_sheet(self):
+        box = self._widget('selectbox', "انتخاب پایه / شیت")
+        if box is not None:
+            self._set(box, string_value=self.random.choice(box.options))
+            self._wait_until_ready()
+
+    def pick_class(self):
+        box = self._widget('selectbox', "انتخاب کلاس")
+        if box is not None:
+            self._set(box, string_value=self.random.choice(box.options))
+
+    def change_tab(self):
+        # همه تب‌ها در هر اجرا ساخته می‌شوند؛ تغییر کنترل یک تب همان هزینه را دارد
+        slider = self._widget('slider', self.random.choice(
+            ["نمره قبولی هر درس", "نمره قبولی مورد بررسی", "حداقل میانگین قابل قبول"]
+        ))
+        if slider is not None:
+            self._set(slider, double_array_value={'data': [self.random.choice([8.0, 10.0, 12.0, 14.0])]})
+
+    def export(self):
+        button = self._widget('button', "🖨️ ساخت کارنامه‌ها")
+        if button is not None:
+            self._run(trigger=WidgetState(id=button.id, trigger_value=True))
+
+    def act(self, actions):
+        tasks = [self.pick_sheet, self.pick_class, self.pick_class, self.change_tab, self.change_tab, self.export]
+        for _ in range(actions):
+            if not self.tabs:
+                break
+            self.random.choice(tasks)()
+
+
+# ----------------- اجرای سطوح هم‌زمانی -----------------
+def _error_text(error):
+    return f"{type(error).__name__}: {error}"
+
+
+def drive_session(server_url, workbook, seed, actions, ready, finished):
+    """اجرای یک نشست در یک رشته؛ خطاها ثبت می‌شوند و به بیرون پرتاب نمی‌شوند"""
+    session, errors = SimulatedSession(server_url, workbook, seed), []
+    try:
+        session.open()
+    except Exception as e:
+        errors.append(_error_text(e))
+    try:
+        # همه نشست‌ها پس از بارگذاری فایل هم‌زمان شروع می‌کنند
+        ready.wait(timeout=READY_TIMEOUT * 2)
+    except threading.BrokenBarrierError as e:
+        errors.append(_error_text(e))
+
+    started = time.time()
+    opening_runs = len(session.latencies)
+    if not errors and not session.errors:
+        try:
+            session.act(actions)
+        except Exception as e:
+            errors.append(_error_text(e))
+    finished_at = time.time()
+    try:
+        # حافظه سرور وقتی اندازه گرفته می‌شود که همه نشست‌ها هنوز وصل‌اند
+        finished.wait(timeout=READY_TIMEOUT * 2)
+    except threading.BrokenBarrierError:
+        pass
+    session.close()
+    return {
+        'latencies': session.latencies,
+        'errors': session.errors + errors,
+        'act_runs': len(session.latencies) - opening_runs,
+        'started': started,
+        'finished': finished_at,
+    }
+
+
+def run_level(workbook, concurrency, actions, seed=0):
+    """اجرای هم‌زمان چند نشست روی یک سرور مشترک و جمع‌آوری آماره‌ها"""
+    with StreamlitServer() as server:
+        # یک بار باز کردن صفحه ماژول‌های برنامه را در سرور بارگذاری می‌کند تا در
+        # حافظه نشست‌ها حساب نشوند
+        warmup = SimulatedSession(server.url, workbook, seed)
+        try:
+            warmup.connect()
+        finally:
+            warmup.close()
+        baseline = server.rss()
+
+        memory = []
+        ready = threading.Barrier(concurrency)
+        finished = threading.Barrier(concurrency, action=lambda: memory.append(server.rss()))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(drive_session, server.url, workbook, seed + i, actions, ready, finished)
+                for i in range(concurrency)
+            ]
+            results = [future.result() for future in futures]
+
+    elapsed = max(r['finished'] for r in results) - min(r['started'] for r in results)
+    latencies = np.array([lat for r in results for lat in r['latencies']])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    growth = (memory[0] - baseline) / concurrency if memory else np.nan
+    return {
+        'هم‌زمانی': concurrency,
+        'تعداد اجرا': len(latencies),
+        'p50 (ms)': round(p50 * 1000, 1),
+        'p95 (ms)': round(p95 * 1000, 1),
+        'p99 (ms)': round(p99 * 1000, 1),
+        # توان عملیاتی فقط از اجراهای پس از بارگذاری فایل (مرحله هم‌زمان)
+        'اجرا در ثانیه': round(sum(r['act_runs'] for r in results) / elapsed, 2) if elapsed > 0 else np.nan,
+        # افزایش حافظه مقیم سرور از پیش از اتصال نشست‌ها تا پایان کارها، تقسیم بر تعداد نشست‌ها
+        'حافظه سرور هر نشست (MB)': round(max(growth, 0) / 1024 / 1024, 1),
+        'نشست ناموفق': sum(bool(r['errors']) for r in results),
+        'خطا': sum(len(r['errors']) for r in results),
+    }, [error for r in results for error in r['errors']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="آزمون بار داشبورد تحلیل کارنامه")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--actions', type=int, default=20, help="تعداد کار هر نشست")
+    parser.add_argument('--students', type=int, default=300, help="تعداد دانش‌آموز هر شیت")
+    parser.add_argument('--classes', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--csv', help="ذخیره نتایج در فایل CSV")
+    args = parser.parse_args(argv)
+
+    workbook = synthetic_workbook(args.students, args.classes, seed=args.seed)
+    rows = []
+    for concurrency in args.concurrency:
+        row, errors = run_level(workbook, concurrency, args.actions, seed=args.seed)
+        rows.append(row)
+        print(pd.DataFrame(rows[-1:]).to_string(index=False), flush=True)
+        for error in dict.fromkeys(errors):
+            print(f"  ⚠️ {error}", flush=True)
+
+    results = pd.DataFrame(rows)
+    print()
+    print(results.to_string(index=False))
+    if args.csv:
+        results.to_csv(args.csv, index=False, encoding='utf-8-sig')
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from risk import class_zscores
+
+# ----------------- نرمال‌سازی نمرات درون کلاس -----------------
+# برای رتبه‌بندی منصفانه بین کلاس‌ها، نمره هر درس ابتدا درون کلاس دانش‌آموز
+# استاندارد می‌شود (نمره z از خط پایه کلاس‌ها یا رتبه درصدی) و سپس میانگین گرفته
+# می‌شود. معلمان سخت‌گیر یا آسان‌گیر دیگر رتبه کل پایه را جابه‌جا نمی‌کنند.
+
+MODE_RAW = 'raw'
+MODE_ZSCORE = 'zscore'
+MODE_PERCENTILE = 'percentile'
+NORMALIZATION_MODES = {
+    MODE_RAW: 'میانگین خام',
+    MODE_ZSCORE: 'نمره z درون کلاس',
+    MODE_PERCENTILE: 'رتبه درصدی درون کلاس',
+}
+NORMALIZED_COLUMN = 'میانگین نرمال‌شده'
+
+
+def class_percentiles(df, class_column, subject_columns):
+    """رتبه درصدی (۰ تا ۱۰۰) هر نمره درون کلاس با یک تبدیل گروهی"""
+    return df.groupby(class_column)[subject_columns].rank(pct=True).to_numpy(dtype=float) * 100
+
+
+def normalized_average(df, class_column, subject_columns, mode, baselines=None):
+    """میانگین نمرات نرمال‌شده هر دانش‌آموز (هم‌نمایه با df)"""
+    if mode == MODE_ZSCORE:
+        values = class_zscores(df, class_column, subject_columns, baselines)
+    elif mode == MODE_PERCENTILE:
+        values = class_percentiles(df, class_column, subject_columns)
+    else:
+        raise ValueError(f"حالت نرمال‌سازی ناشناخته: {mode}")
+    has_value = ~np.isnan(values).all(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average = np.nansum(values, axis=1) / (~np.isnan(values)).sum(axis=1)
+    return pd.Series(np.where(has_value, average, np.nan), index=df.index, name=NORMALIZED_COLUMN)
+
+
+def revise_normalized(previous, df, class_column, subject_columns, mode, baselines, classes):
+    """میانگین نرمال‌شده نسخه اصلاح‌شده؛ فقط سطرهای کلاس‌های تغییرکرده دوباره محاسبه می‌شوند
+
+    previous: خروجی normalized_average نسخه قبلی با همان نمایه سطرهای بدون تغییر
+    """
+    # هر دو حالت فقط به داده همان کلاس وابسته‌اند (خط پایه یا رتبه درون کلاس)
+    rows = df[class_column].isin(classes).to_numpy()
+    values = previous.reindex(df.index)
+    values[rows] = normalized_average(df[rows], class_column, subject_columns, mode, baselines).to_numpy()
+    return values
@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import pandas as pd
+
+from analysis import AVERAGE_COLUMN, prepare_sheet
+from ingest import TableFile
+
+# ----------------- نمای کلی پایه‌ها -----------------
+# هر شیت یک پایه است. برای شیت‌هایی که هنوز پردازش نشده‌اند، همان مسیر تک‌شیت
+# (خواندن، شناسایی ستون‌ها، محاسبه میانگین) در فرآیندهای کارگر به طور هم‌زمان اجرا
+# می‌شود و فقط خلاصه کوچک هر پایه بین فرآیندها جابه‌جا می‌شود.
+
+WEAKEST_COUNT = 3
+PASS_MARK = 10.0
+
+
+@dataclass
+class GradeSummary:
+    """خلاصه یک پایه"""
+    sheet: str
+    students: int = 0
+    classes: int = 0
+    average: float = None
+    std: float = None
+    pass_rate: float = None
+    # جدول میانگین هر درس (ستون‌ها: درس، میانگین)، مرتب از ضعیف‌ترین
+    subjects: pd.DataFrame = None
+    # جدول میانگین هر کلاس (ستون‌ها: کلاس، تعداد، میانگین)
+    class_means: pd.DataFrame = None
+    error: str = None
+
+
+def summarize_analysis(sheet, analysis):
+    """خلاصه یک شیت پردازش‌شده با همان آمار دروس و کلاس‌های نمای تک‌شیت"""
+    if not analysis.subject_columns or analysis.df_clean.empty:
+        return GradeSummary(sheet, error="ستون درسی شناسایی نشد")
+
+    df_clean = analysis.df_clean
+    average = df_clean[AVERAGE_COLUMN]
+    subjects = (
+        df_clean[analysis.subject_columns].mean()
+        .rename_axis('درس').reset_index(name='میانگین')
+        .sort_values('میانگین').round(2).reset_index(drop=True)
+    )
+    class_means = (
+        df_clean.groupby(analysis.class_column)[AVERAGE_COLUMN].agg(['count', 'mean'])
+        .round(2).rename(columns={'count': 'تعداد', 'mean': 'میانگین'})
+        .rename_axis('کلاس').reset_index()
+    )
+    return GradeSummary(
+        sheet=sheet,
+        students=len(df_clean),
+        classes=len(class_means),
+        average=float(average.mean()),
+        std=float(average.std()),
+        pass_rate=float((average >= PASS_MARK).mean() * 100),
+        subjects=subjects,
+        class_means=class_means
+    )
+
+
+def summarize_sheet(source, file_name, sheet):
+    """خواندن و پردازش یک شیت و ساخت خلاصه آن (در فرآیند کارگر اجرا می‌شود)"""
+    try:
+        return summarize_analysis(sheet, prepare_sheet(TableFile(source, file_name).parse(sheet)))
+    except Exception as e:
+        return GradeSummary(sheet, error=str(e))
+
+
+def grade_summaries(source, file_name, sheets, max_workers=None, progress=None):
+    """خلاصه هم‌زمان چند شیت یک فایل
+
+    source: مسیر فایل یا محتوای بایتی
+    progress: تابع اختیاری که پس از هر شیت با (تعداد انجام‌شده، کل) صدا زده می‌شود
+    """
+    if len(sheets) <= 1:
+        summaries = {sheet: summarize_sheet(source, file_name, sheet) for sheet in sheets}
+        if progress is not None and sheets:
+            progress(1, 1)
+        return summaries
+
+    summaries = {}
+    max_workers = max_workers or min(len(sheets), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(summarize_sheet, source, file_name, sheet) for sheet in sheets]
+        for done, future in enumerate(as_completed(futures), start=1):
+            summary = future.result()
+            summaries[summary.sheet] = summary
+            if progress is not None:
+                progress(done, len(futures))
+    return summaries
+
+
+# ----------------- جدول‌های نمای کلی -----------------
+def overview_table(summaries):
+    """شاخص‌های اصلی پایه‌ها در کنار هم"""
+    return pd.DataFrame([{
+        'پایه': s.sheet,
+        'تعداد دانش‌آموز': s.students,
+        'تعداد کلاس': s.classes,
+        'میانگین': s.average,
+        'انحراف معیار': s.std,
+        'درصد قبولی': s.pass_rate,
+        'ضعیف‌ترین درس': s.subjects['درس'].iloc[0] if len(s.subjects) else None,
+    } for s in summaries if s.error is None]).round(2)
+
+
+def weakest_subjects_table(summaries, count=WEAKEST_COUNT):
+    """ضعیف‌ترین دروس هر پایه (یک ستون برای هر پایه)"""
+    return pd.DataFrame({
+        s.sheet: [
+            f"{subject} ({mean:.2f})"
+            for subject, mean in s.subjects.head(count).itertuples(index=False)
+        ] + [None] * max(count - len(s.subjects), 0)
+        for s in summaries if s.error is None
+    }, index=pd.RangeIndex(1, count + 1, name='رتبه ضعف'))
@@ -0,0 +1,92 @@
+import streamlit as st
+
+import charts
+from overview import GradeSummary, grade_summaries, overview_table, summarize_analysis, weakest_subjects_table
+
+# ----------------- صفحه نمای کلی پایه‌ها -----------------
+# خلاصه هر پایه یک بار برای هر نسخه داده ساخته و در کش نتایج نشست نگه داشته
+# می‌شود؛ بازگشایی صفحه فقط همین خلاصه‌ها را نمایش می‌دهد. شیت‌هایی که هنوز در
+# پردازش پس‌زمینه هستند کش نمی‌شوند و پس از آماده شدن خلاصه می‌شوند.
+
+
+def render(sheet_names, cache, analyses, errors, source, file_name=None, pending=None):
+    """نمایش نمای کلی همه پایه‌ها
+
+    cache: دیکشنری شیت -> GradeSummary (کش نتایج نشست برای نسخه فعلی داده)
+    analyses: شیت‌هایی که از پیش پردازش شده‌اند (پردازش پس‌زمینه، پوشه پایش یا نمای اشتراکی)
+    errors: شیت -> پیام خطا برای شیت‌های رد شده یا ناموفق
+    pending: شیت -> مرحله فعلی برای شیت‌هایی که هنوز در پردازش پس‌زمینه هستند
+    """
+    st.subheader("🗂️ نمای کلی پایه‌ها")
+
+    pending = pending or {}
+    if pending:
+        st.info("⏳ در حال پردازش: " + '، '.join(f"{sheet} ({stage})" for sheet, stage in pending.items()))
+    sheet_names = [sheet for sheet in sheet_names if sheet not in pending]
+
+    for sheet in sheet_names:
+        if sheet in cache:
+            continue
+        if sheet in errors:
+            cache[sheet] = GradeSummary(sheet, error=errors[sheet])
+        elif sheet in analyses:
+            cache[sheet] = summarize_analysis(sheet, analyses[sheet])
+
+    missing = [sheet for sheet in sheet_names if sheet not in cache]
+    if missing:
+        if source is None:
+            for sheet in missing:
+                cache[sheet] = GradeSummary(sheet, error="داده این شیت در دسترس نیست")
+        else:
+            progress = st.progress(0.0, text="در حال پردازش پایه‌ها...")
+            cache.update(grade_summaries(
+                source, file_name, missing,
+                progress=lambda done, total: progress.progress(done / total, text=f"{done} از {total} پایه پردازش شد")
+            ))
+            progress.empty()
+
+    summaries = [cache[sheet] for sheet in sheet_names]
+    failed = [s for s in summaries if s.error is not None]
+    if failed:
+        with st.expander(f"⚠️ {len(failed)} شیت در نمای کلی نیامد"):
+            for s in failed:
+                st.write(f"**{s.sheet}**: {s.error}")
+
+    overview_df = overview_table(summaries)
+    if overview_df.empty:
+        if pending:
+            return
+        st.error("❌ در هیچ شیتی ستون درسی شناسایی نشد!")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("تعداد پایه", len(overview_df))
+    with col2:
+        st.metric("تعداد کل دانش‌آموزان", int(overview_df['تعداد دانش‌آموز'].sum()))
+    with col3:
+        st.metric("تعداد کل کلاس‌ها", int(overview_df['تعداد کلاس'].sum()))
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.plotly_chart(charts.grade_bar(overview_df), use_container_width=True)
+    with col2:
+        st.write("📋 شاخص‌های پایه‌ها:")
+        st.dataframe(overview_df, use_container_width=True, hide_index=True)
+
+    st.write("📉 ضعیف‌ترین دروس هر پایه:")
+    st.dataframe(weakest_subjects_table(summaries), use_container_width=True)
+
+    with st.expander("🏫 میانگین کلاس‌های هر پایه"):
+        ready = [s for s in summaries if s.error is None]
+        for column, summary in zip(st.columns(len(ready)), ready):
+            with column:
+                st.write(f"**{summary.sheet}**")
+                st.dataframe(summary.class_means, use_container_width=True, hide_index=True)
+
+    st.download_button(
+        "🗂️ دانلود نمای کلی پایه‌ها (CSV)",
+        data=overview_df.to_csv(index=False, encoding='utf-8-sig'),
+        file_name="نمای_کلی_پایه‌ها.csv",
+        mime="text/csv"
+    )
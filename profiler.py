@@ -0,0 +1,135 @@
+import cProfile
+import io
+import os
+import pstats
+import runpy
+import sysconfig
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+
+# ----------------- پروفایل یک اجرای داشبورد -----------------
+# فقط برای مدیر و فقط برای اجرایی که درخواست شده: اسکریپت در آن اجرا زیر cProfile
+# دوباره اجرا می‌شود و درخت فراخوانی (شامل pandas، openpyxl و plotly) ذخیره می‌شود. در
+# حالت عادی تنها هزینه، بررسی یک کلید در session_state است.
+
+ADMIN_TOKEN_ENV = 'RAVESH_ADMIN_TOKEN'
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LIBRARY_DIRS = {sysconfig.get_paths()['purelib'], sysconfig.get_paths()['platlib']}
+TOP_FUNCTIONS = 25
+MAX_PROFILES = 20
+
+# آخرین پروفایل هر نشست؛ پس از st.stop نوشتن در session_state ممکن نیست
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def is_admin(query_params):
+    """دسترسی مدیر با پارامتر ?admin=<توکن> برابر متغیر محیطی RAVESH_ADMIN_TOKEN"""
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    return bool(token) and query_params.get('admin') == token
+
+
+@dataclass
+class RerunProfile:
+    """نتیجه پروفایل یک اجرا"""
+    created: float
+    total_seconds: float
+    # خروجی pstats قابل باز کردن با snakeviz یا python -m pstats
+    stats_bytes: bytes
+    report_text: str
+    app_hotspots: pd.DataFrame
+    top_functions: pd.DataFrame
+    libraries: pd.DataFrame
+
+
+def start():
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+
+def run_profiled(script_path, session_id):
+    """اجرای اسکریپت زیر cProfile؛ پروفایل در هر حال (حتی با st.stop یا st.rerun) ذخیره می‌شود"""
+    profile = start()
+    try:
+        runpy.run_path(script_path, run_name='__main__')
+    finally:
+        result = finish(profile)
+        with _profiles_lock:
+            _profiles[session_id] = result
+            _profiles.move_to_end(session_id)
+            while len(_profiles) > MAX_PROFILES:
+                _profiles.popitem(last=False)
+
+
+def latest_profile(session_id):
+    """آخرین پروفایل ذخیره‌شده یک نشست (یا None)"""
+    with _profiles_lock:
+        return _profiles.get(session_id)
+
+
+def _module_group(filename):
+    """نام کتابخانه یا فایل برنامه برای یک مسیر فایل"""
+    # توابع داخلی C با نام فایل '~' یا '<...>' ثبت می‌شوند
+    if filename == '~' or filename.startswith('<'):
+        return 'builtins'
+    path = os.path.abspath(filename)
+    for library_dir in LIBRARY_DIRS:
+        if path.startswith(library_dir + os.sep):
+            return os.path.relpath(path, library_dir).split(os.sep)[0].split('.')[0]
+    if path.startswith(APP_DIR + os.sep):
+        return 'app'
+    return 'stdlib'
+
+
+def _function_table(stats):
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'تابع': name,
+            'فایل': f"{os.path.basename(filename)}:{line}",
+            'ماژول': _module_group(filename),
+            'تعداد فراخوانی': calls,
+            'زمان خالص (ms)': tottime * 1000,
+            'زمان تجمعی (ms)': cumtime * 1000,
+        })
+    return pd.DataFrame(rows)
+
+
+def finish(profile):
+    """توقف پروفایل و ساخت گزارش"""
+    profile.disable()
+    stats = pstats.Stats(profile)
+
+    with tempfile.NamedTemporaryFile(suffix='.prof', delete=False) as f:
+        path = f.name
+    try:
+        stats.dump_stats(path)
+        with open(path, 'rb') as f:
+            stats_bytes = f.read()
+    finally:
+        os.remove(path)
+
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(100)
+
+    functions = _function_table(stats)
+    app_functions = functions[functions['ماژول'] == 'app']
+    libraries = (
+        functions.groupby('ماژول')['زمان خالص (ms)'].sum()
+        .sort_values(ascending=False).round(1).reset_index()
+    )
+    return RerunProfile(
+        created=time.time(),
+        total_seconds=stats.total_tt,
+        stats_bytes=stats_bytes,
+        report_text=report.getvalue(),
+        app_hotspots=app_functions.nlargest(TOP_FUNCTIONS, 'زمان تجمعی (ms)').round(1),
+        top_functions=functions.nlargest(TOP_FUNCTIONS, 'زمان خالص (ms)').round(1),
+        libraries=libraries
+    )
@@ -0,0 +1,178 @@
+import html
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from analysis import AVERAGE_COLUMN, student_names
+
+# ----------------- تولید کارنامه فردی دانش‌آموزان -----------------
+# رتبه‌ها و میانگین‌های کلاسی یک بار و به صورت برداری محاسبه می‌شوند؛ سپس فقط
+# رکوردهای کوچک هر دانش‌آموز (نه کل جدول) بین فرآیندها جابه‌جا می‌شوند و هر سند
+# به محض آماده شدن در فایل ZIP نوشته می‌شود.
+
+DEFAULT_CHUNK_SIZE = 100
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="fa" dir="rtl">
+<head>
+<meta charset="utf-8">
+<title>کارنامه {name}</title>
+<style>
+body {{ font-family: Tahoma, sans-serif; margin: 2em; }}
+h1 {{ font-size: 1.4em; }}
+table {{ border-collapse: collapse; width: 100%; margin-top: 1em; }}
+th, td {{ border: 1px solid #999; padding: 6px 10px; text-align: center; }}
+th {{ background: #F0F2F6; }}
+.below {{ color: #B00020; }}
+.above {{ color: #1B7F3B; }}
+</style>
+</head>
+<body>
+<h1>کارنامه تحصیلی {title}</h1>
+<p><strong>نام:</strong> {name} &nbsp; | &nbsp; <strong>کلاس:</strong> {class_name}</p>
+<p><strong>میانگین:</strong> {average} &nbsp; | &nbsp; <strong>میانگین کلاس:</strong> {class_average}
+&nbsp; | &nbsp; <strong>رتبه در کلاس:</strong> {class_rank} از {class_size}</p>
+<table>
+<tr><th>درس</th><th>نمره</th><th>میانگین کلاس</th><th>اختلاف</th></tr>
+{rows}
+</table>
+</body>
+</html>
+"""
+
+
+def _format_score(value):
+    return '-' if value is None or np.isnan(value) else f"{value:.2f}"
+
+
+def build_student_records(df_clean, subject_columns, class_column, name_cols):
+    """ساخت رکورد سبک هر دانش‌آموز از رتبه‌بندی و میانگین‌های کلاسی"""
+    grouped = df_clean.groupby(class_column)
+    class_means = grouped[subject_columns + [AVERAGE_COLUMN]].transform('mean')
+    class_rank = grouped[AVERAGE_COLUMN].rank(method='min', ascending=False)
+    class_size = grouped[AVERAGE_COLUMN].transform('count')
+
+    names = student_names(df_clean, name_cols)
+
+    scores = df_clean[subject_columns].to_numpy(dtype=float, na_value=np.nan)
+    means = class_means[subject_columns].to_numpy(dtype=float, na_value=np.nan)
+    averages = df_clean[AVERAGE_COLUMN].to_numpy(dtype=float)
+    class_averages = class_means[AVERAGE_COLUMN].to_numpy(dtype=float)
+    class_rank = class_rank.to_numpy()
+    class_size = class_size.to_numpy()
+
+    records = []
+    for i, (name, class_name) in enumerate(zip(names, df_clean[class_column])):
+        records.append({
+            'row': i + 1,
+            'name': name,
+            'class_name': class_name,
+            'average': float(averages[i]),
+            'class_average': float(class_averages[i]),
+            'class_rank': int(class_rank[i]),
+            'class_size': int(class_size[i]),
+            'subjects': [
+                (str(subject), float(scores[i, j]), float(means[i, j]))
+                for j, subject in enumerate(subject_columns)
+            ]
+        })
+    return records
+
+
+def render_report_card(record, title=''):
+    """تولید HTML کارنامه یک دانش‌آموز"""
+    rows = []
+    for subject, score, class_average in record['subjects']:
+        diff = score - class_average
+        css = '' if np.isnan(diff) else ('below' if diff < 0 else 'above')
+        rows.append(
+            f"<tr><td>{html.escape(subject)}</td><td>{_format_score(score)}</td>"
+            f"<td>{_format_score(class_average)}</td><td class=\"{css}\">{_format_score(diff)}</td></tr>"
+        )
+    return REPORT_TEMPLATE.format(
+        title=html.escape(str(title)),
+        name=html.escape(record['name']),
+        class_name=html.escape(str(record['class_name'])),
+        average=_format_score(record['average']),
+        class_average=_format_score(record['class_average']),
+        class_rank=record['class_rank'],
+        class_size=record['class_size'],
+        rows='\n'.join(rows)
+    )
+
+
+def _safe_name(text):
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', str(text))
+
+
+def report_file_name(record, extension):
+    """نام فایل یکتا و امن برای هر کارنامه (شماره ردیف برای دانش‌آموزان هم‌نام)"""
+    folder = _safe_name(record['class_name'])
+    name = _safe_name(f"{record['class_name']}_{record['class_rank']:03d}_{record['name']}_{record['row']}")
+    return f"{folder}/{name}.{extension}"
+
+
+def pdf_renderer_available():
+    """بررسی نصب بودن weasyprint برای خروجی PDF"""
+    try:
+        import weasyprint  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _render_chunk(records, fmt, title):
+    """ساخت اسناد یک دسته از دانش‌آموزان (در فرآیند کارگر)"""
+    if fmt == 'pdf':
+        from weasyprint import HTML
+
+    documents = []
+    for record in records:
+        page = render_report_card(record, title)
+        if fmt == 'pdf':
+            documents.append((report_file_name(record, 'pdf'), HTML(string=page).write_pdf()))
+        else:
+            documents.append((report_file_name(record, 'html'), page.encode('utf-8')))
+    return documents
+
+
+def generate_report_cards_zip(records, output, fmt='html', title='', max_workers=None,
+                              chunk_size=DEFAULT_CHUNK_SIZE):
+    """تولید موازی کارنامه‌ها و نوشتن پیوسته آن‌ها در یک فایل ZIP
+
+    output می‌تواند مسیر فایل یا یک شیء فایل‌مانند (مثلاً BytesIO) باشد.
+    """
+    if fmt not in ('html', 'pdf'):
+        raise ValueError(f"قالب نامعتبر: {fmt}")
+    if fmt == 'pdf' and not pdf_renderer_available():
+        raise RuntimeError("برای خروجی PDF باید weasyprint نصب باشد")
+
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    max_workers = max_workers or min(len(chunks), os.cpu_count() or 1) or 1
+    # اسناد PDF از قبل فشرده هستند
+    compression = zipfile.ZIP_STORED if fmt == 'pdf' else zipfile.ZIP_DEFLATED
+
+    executor = None
+    if len(chunks) > 1 and max_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    count = 0
+    try:
+        if executor is not None:
+            results = executor.map(_render_chunk, chunks, repeat(fmt), repeat(title))
+        else:
+            results = map(_render_chunk, chunks, repeat(fmt), repeat(title))
+
+        with zipfile.ZipFile(output, 'w', compression=compression) as archive:
+            for documents in results:
+                for file_name, content in documents:
+                    archive.writestr(file_name, content)
+                    count += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return count
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+# ----------------- کش پایدار نتایج -----------------
+# جدول‌های مشتق‌شده (آمار دروس، آمار کلاس‌ها، رتبه‌بندی و خروجی‌ها) با کلید «هش
+# محتوای فایل + شیت + فیلتر کلاس + پارامترها» روی دیسک نگه داشته می‌شوند تا پس از
+# راه‌اندازی دوباره سرور هم گرم بمانند. هر فایل چکیده محتوای خود را دارد و فایل
+# خراب دور انداخته می‌شود؛ با عبور از سقف حجم، فایل‌هایی که دیرتر از همه استفاده
+# شده‌اند (بر اساس زمان تغییر) حذف می‌شوند. جلوی دیسک یک لایه LRU کوچک در حافظه
+# فرآیند قرار دارد تا اجراهای پیاپی هزینه خواندن و unpickle را نپردازند؛ دیسک فقط
+# برای شروع سرد و اشتراک بین فرآیندهای سرور خوانده می‌شود.
+
+CACHE_DIR = os.environ.get('RAVESH_RESULT_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'result_cache'
+)
+DEFAULT_MAX_BYTES = int(float(os.environ.get('RAVESH_RESULT_CACHE_MB', 256)) * 1024 * 1024)
+DEFAULT_MEMORY_BYTES = int(float(os.environ.get('RAVESH_RESULT_MEMORY_MB', 64)) * 1024 * 1024)
+# با تغییر ساختار جدول‌های ذخیره‌شده افزایش یابد تا نتایج قدیمی استفاده نشوند
+RESULT_VERSION = 1
+
+_MAGIC = b'RVR1'
+_DIGEST_SIZE = 32
+_SUFFIX = '.bin'
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+def cache_key(key):
+    """نشانی محتوایی یک کلید (تاپل رشته‌ها و اعداد)"""
+    return hashlib.blake2b(repr((RESULT_VERSION,) + tuple(key)).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """کش LRU نتایج روی دیسک با سقف حجم و بررسی سلامت"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, memory_bytes=DEFAULT_MEMORY_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.size = 0
+        self.memory_size = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.corrupt = 0
+        self._entries = OrderedDict()  # نام فایل -> حجم، از قدیمی‌ترین استفاده
+        self._memory = OrderedDict()  # نام فایل -> (مقدار، حجم سریال‌شده)
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name[:2], name + _SUFFIX)
+
+    def _load_index(self):
+        """بازسازی ترتیب LRU از زمان تغییر فایل‌های موجود"""
+        found = []
+        try:
+            for root, _, files in os.walk(self.directory):
+                for file_name in files:
+                    if file_name.endswith('.tmp'):
+                        # باقی‌مانده نوشتن نیمه‌کاره پیش از توقف سرور
+                        os.remove(os.path.join(root, file_name))
+                        continue
+                    if not file_name.endswith(_SUFFIX):
+                        continue
+                    stat = os.stat(os.path.join(root, file_name))
+                    found.append((stat.st_mtime, file_name[:-len(_SUFFIX)], stat.st_size))
+        except OSError:
+            return
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self.size += size
+        with self._lock:
+            self._evict()
+
+    # ---------- خواندن و نوشتن ----------
+    def get(self, key):
+        """نتیجه ذخیره‌شده برای کلید (یا None)"""
+        name = cache_key(key)
+        with self._lock:
+            cached = self._memory.get(name)
+            if cached is not None:
+                self._memory.move_to_end(name)
+                self.hits += 1
+                self.memory_hits += 1
+                return cached[0]
+        path = self._path(name)
+        # در نبود نسخه حافظه، فایل مستقیماً خوانده می‌شود تا نتایج نوشته‌شده توسط
+        # فرآیندهای دیگر سرور هم دیده شوند
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            header, payload = data[:len(_MAGIC) + _DIGEST_SIZE], data[len(_MAGIC) + _DIGEST_SIZE:]
+            if header != _MAGIC + _digest(payload):
+                raise ValueError("چکیده فایل کش مطابقت ندارد")
+            value = pickle.loads(payload)
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(name)
+            self.misses += 1
+            return None
+        except Exception:
+            # فایل ناقص یا خراب: حذف و محاسبه دوباره
+            self._forget(name, remove=True)
+            self.corrupt += 1
+            self.misses += 1
+            return None
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = len(data)
+                self.size += len(data)
+            self._entries.move_to_end(name)
+            self.hits += 1
+            self._remember(name, value, len(data))
+        return value
+
+    def put(self, key, value):
+        name = cache_key(key)
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        size = len(_MAGIC) + _DIGEST_SIZE + len(payload)
+        with self._lock:
+            self._remember(name, value, size)
+        if size > self.max_bytes:
+            return
+        path = self._path(name)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # نوشتن در فایل موقت و جایگزینی اتمی؛ خواننده هیچ‌گاه فایل نیمه‌کاره نمی‌بیند
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_MAGIC + _digest(payload) + payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            # کش بهینه‌سازی است؛ خطای دیسک نباید اجرا را متوقف کند
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self.size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict()
+
+    def get_or_build(self, key, builder):
+        """بازگرداندن نتیجه از کش یا ساخت و ذخیره آن"""
+        value = self.get(key)
+        if value is None:
+            value = builder()
+            self.put(key, value)
+        return value
+
+    def _remember(self, name, value, size):
+        """افزودن به لایه حافظه با سقف حجم (با قفل گرفته‌شده صدا زده می‌شود)"""
+        if name in self._memory:
+            self.memory_size -= self._memory.pop(name)[1]
+        if size > self.memory_bytes:
+            return
+        self._memory[name] = (value, size)
+        self.memory_size += size
+        while self.memory_size > self.memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self.memory_size -= evicted
+
+    # ---------- حذف ----------
+    def _forget(self, name, remove=False):
+        with self._lock:
+            self.size -= self._entries.pop(name, 0)
+        if remove:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """حذف قدیمی‌ترین فایل‌ها تا زیر سقف حجم (با قفل گرفته‌شده صدا زده می‌شود)"""
+        while self.size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._entries):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._memory.clear()
+            self.size = self.memory_size = 0
@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from analysis import AVERAGE_COLUMN, student_names
+from comparison import group_moments, revise_moments
+
+# ----------------- شناسایی دانش‌آموزان در معرض خطر -----------------
+# میانگین و انحراف معیار هر درس در هر کلاس یک بار برای هر شیت محاسبه می‌شود؛
+# با تغییر آستانه‌ها فقط یک گذر برداری روی ماتریس دانش‌آموز × درس اجرا می‌شود.
+
+FAILED_COLUMN = 'تعداد درس مردودی'
+WEAK_COLUMN = 'دروس ضعیف نسبت به کلاس'
+MIN_Z_COLUMN = 'کمترین نمره z'
+RISK_COLUMN = 'امتیاز خطر'
+REASON_COLUMN = 'دلایل'
+
+
+@dataclass
+class RiskThresholds:
+    """آستانه‌های قواعد هشدار"""
+    pass_mark: float = 10.0
+    min_average: float = 12.0
+    max_failed: int = 2
+    z_threshold: float = -1.5
+
+
+@dataclass
+class ClassBaselines:
+    """میانگین و انحراف معیار هر درس در هر کلاس (سطر: کلاس، ستون: درس)"""
+    means: pd.DataFrame
+    stds: pd.DataFrame
+    # تعداد نمرات هر خانه؛ برای به‌روزرسانی افزایشی لازم است (در نماهای اشتراکی ذخیره نمی‌شود)
+    counts: pd.DataFrame = None
+
+
+def class_baselines(df, class_column, subject_columns):
+    """محاسبه خط پایه کلاس‌ها در یک groupby"""
+    grouped = df.groupby(class_column)[subject_columns]
+    return ClassBaselines(means=grouped.mean(), stds=grouped.std(), counts=grouped.count())
+
+
+def revise_baselines(baselines, retracted, inserted, class_column):
+    """خط پایه نسخه اصلاح‌شده فقط از سطرهای کنار رفته و جایگزین
+
+    اگر کلاسی اضافه یا حذف شده باشد (یا تعدادها در دسترس نباشد) None برمی‌گرداند.
+    """
+    if baselines.counts is None or not set(inserted[class_column]) <= set(baselines.means.index):
+        return None
+    classes, subjects = baselines.means.index, list(baselines.means.columns)
+    n, mean, var = revise_moments(
+        baselines.counts.to_numpy(dtype=float),
+        baselines.means.to_numpy(dtype=float),
+        baselines.stds.to_numpy(dtype=float) ** 2,
+        group_moments(retracted, class_column, subjects, classes),
+        group_moments(inserted, class_column, subjects, classes)
+    )
+    if (n.sum(axis=1) == 0).any():
+        return None
+    frame = lambda values: pd.DataFrame(values, index=classes, columns=baselines.means.columns)
+    return ClassBaselines(means=frame(mean), stds=frame(np.sqrt(var)), counts=frame(n.astype(int)))
+
+
+def class_zscores(df, class_column, subject_columns, baselines):
+    """نمره z هر نمره نسبت به میانگین و انحراف معیار همان درس در کلاس دانش‌آموز"""
+    scores = df[subject_columns].to_numpy(dtype=float, na_value=np.nan)
+    rows = baselines.means.index.get_indexer(df[class_column])
+    means = baselines.means[subject_columns].to_numpy(dtype=float)[rows]
+    stds = baselines.stds[subject_columns].to_numpy(dtype=float)[rows]
+    # کلاس‌های تک‌نفره یا بدون پراکندگی نمره z ندارند
+    stds[~(stds > 0)] = np.nan
+    with np.errstate(invalid='ignore'):
+        return (scores - means) / stds
+
+
+def risk_signals(df, class_column, subject_columns, baselines, thresholds):
+    """شاخص‌های خطر همه دانش‌آموزان در یک گذر برداری
+
+    خروجی DataFrame هم‌نمایه با df شامل تعداد مردودی، تعداد دروس ضعیف نسبت به
+    کلاس، کمترین نمره z، ضعیف‌ترین درس و امتیاز خطر (تعداد قواعد نقض‌شده).
+    """
+    scores = df[subject_columns].to_numpy(dtype=float, na_value=np.nan)
+    z = class_zscores(df, class_column, subject_columns, baselines)
+
+    with np.errstate(invalid='ignore'):
+        failed = (scores < thresholds.pass_mark).sum(axis=1)
+        weak = (z < thresholds.z_threshold).sum(axis=1)
+
+    has_z = ~np.isnan(z).all(axis=1)
+    min_z = np.where(has_z, np.nanmin(np.where(np.isnan(z), np.inf, z), axis=1), np.nan)
+    weakest = np.where(
+        has_z,
+        np.asarray(subject_columns, dtype=object)[np.argmin(np.where(np.isnan(z), np.inf, z), axis=1)],
+        None
+    )
+
+    low_average = df[AVERAGE_COLUMN].to_numpy(dtype=float) < thresholds.min_average
+    many_failed = failed >= thresholds.max_failed
+    below_class = weak > 0
+
+    reasons = pd.Series('', index=df.index, dtype=object)
+    for flag, text in (
+        (low_average, f"میانگین زیر {thresholds.min_average:g}"),
+        (many_failed, f"{thresholds.max_failed} درس مردودی یا بیشتر"),
+        (below_class, "افت شدید نسبت به کلاس"),
+    ):
+        reasons = reasons.where(~flag, reasons + np.where(reasons == '', '', '، ') + text)
+
+    return pd.DataFrame({
+        FAILED_COLUMN: failed,
+        WEAK_COLUMN: weak,
+        MIN_Z_COLUMN: np.round(min_z, 2),
+        'ضعیف‌ترین درس': weakest,
+        RISK_COLUMN: low_average.astype(int) + many_failed.astype(int) + below_class.astype(int),
+        REASON_COLUMN: reasons,
+    }, index=df.index)
+
+
+def watch_list(df, class_column, subject_columns, name_cols, baselines, thresholds):
+    """فهرست مراقبت: دانش‌آموزانی که دست‌کم یک قاعده را نقض کرده‌اند"""
+    signals = risk_signals(df, class_column, subject_columns, baselines, thresholds)
+    flagged = signals[RISK_COLUMN] > 0
+    students = df.loc[flagged]
+    listing = pd.concat([
+        pd.DataFrame({
+            'نام کامل': student_names(students, name_cols),
+            class_column: students[class_column],
+            AVERAGE_COLUMN: students[AVERAGE_COLUMN].round(2),
+        }),
+        signals.loc[flagged],
+    ], axis=1)
+    return listing.sort_values([RISK_COLUMN, AVERAGE_COLUMN], ascending=[False, True])
+
+
+def class_risk_summary(listing, df, class_column):
+    """تعداد و درصد دانش‌آموزان در معرض خطر هر کلاس"""
+    sizes = df.groupby(class_column).size()
+    flagged = listing.groupby(class_column).size().reindex(sizes.index, fill_value=0)
+    summary = pd.DataFrame({
+        'تعداد دانش‌آموز': sizes,
+        'در معرض خطر': flagged,
+        'درصد': (100 * flagged / sizes).round(1),
+    })
+    return summary.sort_values('درصد', ascending=False).reset_index()
@@ -0,0 +1,221 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+# ----------------- حافظه نشست‌ها -----------------
+# داده‌های سنگین هر نشست (شیت‌های پردازش‌شده فایل آپلود شده و نتایج مشتق‌شده) در
+# یک ثبت مشترک نگه داشته می‌شوند. اگر نشستی مدتی اجرا نشود، شیت‌هایش روی دیسک
+# ریخته (یا رها) و نتایج مشتق‌شده پاک می‌شوند؛ با بازگشت کاربر، شیت‌ها از دیسک
+# بازسازی (یا دوباره پردازش) می‌شوند. نشست منقضی به طور کامل از ثبت حذف می‌شود.
+
+IDLE_SECONDS = float(os.environ.get('RAVESH_IDLE_MINUTES', 15)) * 60
+EXPIRE_SECONDS = float(os.environ.get('RAVESH_SESSION_EXPIRE_HOURS', 24)) * 3600
+SWEEP_INTERVAL = 60
+# پوشه والد؛ فایل‌ها در یک زیرپوشه خصوصی (0700) مخصوص همین فرآیند نوشته می‌شوند تا
+# کاربر دیگری روی سرور نتواند فایل pickle جایگزین در مسیر بازسازی بگذارد
+SPILL_DIR = os.environ.get('RAVESH_SPILL_DIR') or None
+
+POLICY_SPILL = 'spill'
+POLICY_DROP = 'drop'
+IDLE_POLICY = os.environ.get('RAVESH_IDLE_POLICY', POLICY_SPILL)
+
+STATUS_ACTIVE = 'active'
+STATUS_SPILLED = 'spilled'
+STATUS_DROPPED = 'dropped'
+STATUS_LABELS = {
+    STATUS_ACTIVE: 'فعال',
+    STATUS_SPILLED: 'روی دیسک',
+    STATUS_DROPPED: 'رها شده',
+}
+
+
+def estimate_bytes(obj, depth=0):
+    """برآورد حافظه یک شیء (DataFrame، SheetAnalysis، بایت و ظرف‌های تودرتو)"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, (bytes, bytearray, str)):
+        return sys.getsizeof(obj)
+    if depth > 4:
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sum(estimate_bytes(k, depth + 1) + estimate_bytes(v, depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(estimate_bytes(item, depth + 1) for item in obj)
+    if hasattr(obj, '__dataclass_fields__'):
+        return sum(estimate_bytes(getattr(obj, name), depth + 1) for name in obj.__dataclass_fields__)
+    return sys.getsizeof(obj)
+
+
+def analysis_bytes(analysis):
+    """حافظه df، df_clean و جدول‌های جانبی یک شیت پردازش‌شده"""
+    total = estimate_bytes(analysis.df) + estimate_bytes(analysis.df_clean)
+    if analysis.roles is not None:
+        total += estimate_bytes(analysis.roles.scores)
+    if analysis.delta is not None:
+        delta = analysis.delta
+        total += sum(estimate_bytes(frame) for frame in (delta.changes, delta.retracted, delta.inserted) if frame is not None)
+    return total
+
+
+@dataclass
+class SessionRecord:
+    """داده‌های سنگین و وضعیت یک نشست"""
+    session_id: str
+    last_seen: float
+    job: object = None
+    cache: dict = field(default_factory=dict)
+    status: str = STATUS_ACTIVE
+    spilled: dict = field(default_factory=dict)
+    spilled_bytes: int = 0
+    spill_dir: str = None
+    reclaimed_at: float = None
+
+
+class SessionRegistry:
+    """ثبت مشترک نشست‌ها با سیاست بازپس‌گیری حافظه نشست‌های بیکار"""
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, policy=IDLE_POLICY, expire_seconds=EXPIRE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.policy = policy
+        self.expire_seconds = expire_seconds
+        self._records = {}
+        self._spill_root = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._sweep_loop, name='ravesh-sessions', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    # ---------- اجرای نشست ----------
+    def resume(self, session_id):
+        """ثبت فعالیت نشست و بازسازی داده‌های ریخته‌شده؛ وضعیت پیشین را برمی‌گرداند"""
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None:
+                self._records[session_id] = SessionRecord(session_id, time.time())
+                return None
+            record.last_seen = time.time()
+            previous = record.status
+            if previous == STATUS_SPILLED:
+                self._restore(record)
+            record.status = STATUS_ACTIVE
+            return previous
+
+    def track(self, session_id, job, cache):
+        """اتصال کار پردازش و کش نتایج نشست به ثبت"""
+        with self._lock:
+            record = self._records.setdefault(session_id, SessionRecord(session_id, time.time()))
+            record.job = job
+            record.cache = cache
+            record.last_seen = time.time()
+
+    # ---------- بازپس‌گیری ----------
+    def sweep(self, idle_seconds=None):
+        """بازپس‌گیری حافظه نشست‌های بیکار؛ نشست‌های منقضی فایل‌های دیسک را هم از دست می‌دهند"""
+        idle_seconds = self.idle_seconds if idle_seconds is None else idle_seconds
+        now = time.time()
+        with self._lock:
+            for session_id, record in list(self._records.items()):
+                idle = now - record.last_seen
+                if idle >= self.expire_seconds:
+                    self._drop(record)
+                    del self._records[session_id]
+                elif idle >= idle_seconds and record.status == STATUS_ACTIVE:
+                    self._reclaim(record)
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except Exception:
+                pass  # خطای یک دور پاک‌سازی نباید رشته را متوقف کند
+
+    def _reclaim(self, record):
+        record.cache.clear()
+        record.reclaimed_at = time.time()
+        job = record.job
+        if job is None or not job.done or not job.results:
+            return
+
+        if self.policy == POLICY_SPILL:
+            try:
+                self._spill(record)
+                record.status = STATUS_SPILLED
+                return
+            except OSError:
+                pass
+        self._drop(record)
+
+    def _drop(self, record):
+        """رها کردن داده‌ها؛ با بازگشت کاربر، فایل آپلود شده دوباره پردازش می‌شود"""
+        record.cache.clear()
+        if record.job is not None:
+            record.job.release()
+        self._remove_spill(record)
+        record.job = None
+        record.status = STATUS_DROPPED
+
+    def _private_root(self):
+        """پوشه خصوصی این فرآیند برای فایل‌های ریخته‌شده (با اولین ریزش ساخته می‌شود)"""
+        if self._spill_root is None:
+            if SPILL_DIR is not None:
+                os.makedirs(SPILL_DIR, exist_ok=True)
+            self._spill_root = tempfile.mkdtemp(prefix='ravesh-spill-', dir=SPILL_DIR)
+            atexit.register(shutil.rmtree, self._spill_root, ignore_errors=True)
+        return self._spill_root
+
+    def _remove_spill(self, record):
+        if record.spill_dir is not None:
+            shutil.rmtree(record.spill_dir, ignore_errors=True)
+        record.spill_dir = None
+        record.spilled, record.spilled_bytes = {}, 0
+
+    def _spill(self, record):
+        record.spill_dir = os.path.join(self._private_root(), record.session_id)
+        os.makedirs(record.spill_dir, mode=0o700, exist_ok=True)
+        job = record.job
+        for index, (sheet, analysis) in enumerate(list(job.results.items())):
+            path = os.path.join(record.spill_dir, f'{index}.pkl')
+            pd.to_pickle(analysis, path)
+            record.spilled[sheet] = path
+        record.spilled_bytes = sum(os.path.getsize(path) for path in record.spilled.values())
+        for sheet in record.spilled:
+            del job.results[sheet]
+
+    def _restore(self, record):
+        for sheet, path in record.spilled.items():
+            record.job.results[sheet] = pd.read_pickle(path)
+        self._remove_spill(record)
+
+    # ---------- گزارش ----------
+    def usage(self, current_session=None):
+        """جدول حافظه نشست‌ها برای نمای مدیر"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for record in self._records.values():
+                results = dict(record.job.results) if record.job is not None else {}
+                sheets_bytes = sum(analysis_bytes(a) for a in results.values())
+                cache_bytes = estimate_bytes(dict(record.cache))
+                rows.append({
+                    'نشست': record.session_id[:8] + (' (شما)' if record.session_id == current_session else ''),
+                    'وضعیت': STATUS_LABELS[record.status],
+                    'بیکاری (دقیقه)': round((now - record.last_seen) / 60, 1),
+                    'شیت‌ها (MB)': round(sheets_bytes / 1024 / 1024, 2),
+                    'نتایج مشتق (MB)': round(cache_bytes / 1024 / 1024, 2),
+                    'حافظه کل (MB)': round((sheets_bytes + cache_bytes) / 1024 / 1024, 2),
+                    'روی دیسک (MB)': round(record.spilled_bytes / 1024 / 1024, 2),
+                })
+        usage = pd.DataFrame(rows)
+        return usage.sort_values('حافظه کل (MB)', ascending=False) if not usage.empty else usage
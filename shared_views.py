@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import secrets
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from analysis import ColumnRoles, SheetAnalysis
+from correlation import SubjectCorrelation
+from risk import ClassBaselines
+from thresholds import PassCurves
+
+# ----------------- نماهای اشتراکی -----------------
+# یک نما (شیت، کلاس، دروس انتخابی و آستانه‌ها) همراه با جدول‌های پردازش‌شده و
+# آماره‌های از پیش محاسبه‌شده در قالب ستونی Arrow ذخیره می‌شود. بازگشایی با شناسه،
+# فایل‌ها را به حافظه نگاشت می‌کند و بدون خواندن اکسل یا محاسبه دوباره انجام می‌شود.
+
+VIEW_DIR = os.environ.get('RAVESH_VIEW_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'shared_views'
+)
+VIEW_ID_RE = re.compile(r'^[0-9a-f]{12}$')
+INDEX_COLUMN = '__index__'
+
+
+@dataclass
+class SharedView:
+    """نمای ذخیره‌شده"""
+    view_id: str
+    created: float
+    source: str
+    sheet: str
+    params: dict
+    analysis: SheetAnalysis
+    # آماره‌های از پیش محاسبه‌شده با همان ساختار کش نتایج نشست
+    aggregates: dict = field(default_factory=dict)
+
+
+def _view_path(view_id):
+    if not VIEW_ID_RE.match(view_id or ''):
+        raise ValueError(f"شناسه نما نامعتبر است: {view_id}")
+    return os.path.join(VIEW_DIR, view_id)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+# ---------- جدول‌ها ----------
+def _write_frame(df, path):
+    """ذخیره DataFrame با نمایه و نام ستون‌های دلخواه در فایل Arrow بدون فشرده‌سازی"""
+    frame = df.copy()
+    frame.columns = [f'c{i}' for i in range(frame.shape[1])]
+    frame.insert(0, INDEX_COLUMN, df.index)
+    for col in frame.columns:
+        if frame[col].dtype == object:
+            try:
+                pa.array(frame[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # ستون‌های با نوع مختلط (مثلاً عدد و متن) به متن تبدیل می‌شوند
+                frame[col] = frame[col].where(frame[col].isna(), frame[col].astype(str))
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return {'columns': list(df.columns), 'index_name': df.index.name}
+
+
+def _read_frame(path, meta):
+    """خواندن فایل Arrow با نگاشت حافظه"""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    frame = table.to_pandas(split_blocks=True).set_index(INDEX_COLUMN)
+    frame.index.name = meta['index_name']
+    frame.columns = meta['columns']
+    return frame
+
+
+# ---------- ذخیره و بازگشایی ----------
+def save_view(analysis, params, aggregates, source):
+    """ذخیره نما و برگرداندن شناسه آن"""
+    view_id = secrets.token_hex(6)
+    path = _view_path(view_id)
+    os.makedirs(path)
+
+    frames = {'df': analysis.df, 'df_clean': analysis.df_clean}
+    arrays = {}
+    correlations = aggregates.get('correlations')
+    if correlations is not None:
+        subject_corr, class_means = correlations
+        frames.update({
+            'corr': subject_corr.corr, 'cov': subject_corr.cov,
+            'counts': subject_corr.counts, 'class_means': class_means
+        })
+    baselines = aggregates.get('risk_baselines')
+    if baselines is not None:
+        frames.update({'baseline_means': baselines.means, 'baseline_stds': baselines.stds})
+    curves = aggregates.get('pass_curves')
+    if curves is not None:
+        arrays.update({'thresholds': curves.thresholds, 'passed': curves.passed, 'totals': curves.totals})
+
+    frame_meta = {name: _write_frame(frame, os.path.join(path, f'{name}.arrow')) for name, frame in frames.items()}
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+
+    roles = analysis.roles
+    meta = {
+        'created': time.time(),
+        'source': source,
+        'params': params,
+        'frames': frame_meta,
+        'subject_columns': analysis.subject_columns,
+        'class_column': analysis.class_column,
+        'name_cols': analysis.name_cols,
+        'confidence': roles.confidence if roles is not None else {},
+        'pass_curves': {'classes': curves.classes, 'subjects': curves.subjects} if curves is not None else None,
+    }
+    with open(os.path.join(path, 'view.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, default=_json_default)
+    return view_id
+
+
+def load_view(view_id):
+    """بازگشایی نما با نگاشت حافظه فایل‌های ستونی"""
+    path = _view_path(view_id)
+    with open(os.path.join(path, 'view.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+
+    frames = {
+        name: _read_frame(os.path.join(path, f'{name}.arrow'), frame_meta)
+        for name, frame_meta in meta['frames'].items()
+    }
+    roles = ColumnRoles(
+        subject_columns=meta['subject_columns'],
+        class_column=meta['class_column'],
+        name_cols=meta['name_cols'],
+        scores=pd.DataFrame(),
+        confidence=meta['confidence']
+    )
+    analysis = SheetAnalysis(
+        df=frames['df'],
+        df_clean=frames['df_clean'],
+        subject_columns=meta['subject_columns'],
+        class_column=meta['class_column'],
+        name_cols=meta['name_cols'],
+        roles=roles
+    )
+
+    aggregates = {}
+    if 'corr' in frames:
+        aggregates['correlations'] = (
+            SubjectCorrelation(corr=frames['corr'], cov=frames['cov'], counts=frames['counts']),
+            frames['class_means']
+        )
+    if 'baseline_means' in frames:
+        aggregates['risk_baselines'] = ClassBaselines(means=frames['baseline_means'], stds=frames['baseline_stds'])
+    if meta['pass_curves'] is not None:
+        load = lambda name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        aggregates['pass_curves'] = PassCurves(
+            thresholds=load('thresholds'),
+            classes=meta['pass_curves']['classes'],
+            subjects=meta['pass_curves']['subjects'],
+            passed=load('passed'),
+            totals=load('totals')
+        )
+
+    return SharedView(
+        view_id=view_id,
+        created=meta['created'],
+        source=meta['source'],
+        sheet=meta['params']['selected_base'],
+        params=meta['params'],
+        analysis=analysis,
+        aggregates=aggregates
+    )
@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+# ----------------- خلاصه‌ساز چندکی نمرات -----------------
+# نمرات در بازه بسته ۰ تا ۲۰ هستند، پس به جای t-digest یا KLL از یک هیستوگرام
+# با عرض سطل ثابت استفاده می‌شود: خطای مقداری هر چندک حداکثر به اندازه عرض یک سطل
+# است و ادغام دو خلاصه فقط جمع آرایه‌های شمارش است.
+
+SCORE_MIN = 0.0
+SCORE_MAX = 20.0
+DEFAULT_ERROR = 0.05
+
+
+class QuantileSketch:
+    """خلاصه‌ساز قابل ادغام برای چندک‌ها، میانگین و انحراف معیار"""
+
+    def __init__(self, error=DEFAULT_ERROR, lo=SCORE_MIN, hi=SCORE_MAX):
+        if error <= 0:
+            raise ValueError("خطای مجاز باید بزرگتر از صفر باشد")
+        self.error = float(error)
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.n_bins = int(np.ceil((self.hi - self.lo) / self.error))
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def bin_index(self, values):
+        """شماره سطل هر مقدار (مقادیر خارج از بازه به سطل‌های کناری می‌روند)"""
+        idx = np.floor((np.asarray(values, dtype=float) - self.lo) / self.error)
+        return np.clip(idx, 0, self.n_bins - 1).astype(np.int64)
+
+    def update(self, values):
+        """افزودن مجموعه‌ای از مقادیر (مقادیر خالی نادیده گرفته می‌شوند)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.counts += np.bincount(self.bin_index(values), minlength=self.n_bins)
+        self.n += int(values.size)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def retract(self, values):
+        """کم کردن مقادیری که پیش‌تر افزوده شده‌اند
+
+        کمینه و بیشینه قابل کم کردن نیستند؛ اگر مقدار کنار رفته روی یکی از آن‌ها
+        باشد True برمی‌گرداند تا از داده بازسازی شوند.
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return False
+        self.counts -= np.bincount(self.bin_index(values), minlength=self.n_bins)
+        self.n -= int(values.size)
+        if self.n == 0:
+            self.total = self.total_sq = 0.0
+            self.min, self.max = np.inf, -np.inf
+            return False
+        self.total -= float(values.sum())
+        self.total_sq -= float(np.square(values).sum())
+        return bool(values.min() <= self.min or values.max() >= self.max)
+
+    def compatible(self, other):
+        return (self.error, self.lo, self.hi) == (other.error, other.lo, other.hi)
+
+    def merge(self, other):
+        """ادغام یک خلاصه دیگر در این خلاصه"""
+        if not self.compatible(other):
+            raise ValueError("خلاصه‌ها با تنظیمات متفاوت قابل ادغام نیستند")
+        self.counts += other.counts
+        self.n += other.n
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self):
+        sketch = QuantileSketch(self.error, self.lo, self.hi)
+        return sketch.merge(self)
+
+    def quantile(self, q):
+        """چندک تقریبی با درون‌یابی خطی مانند pandas"""
+        if self.n == 0:
+            return np.nan
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        rank = q * (self.n - 1)
+        cumulative = np.cumsum(self.counts)
+        bins = np.searchsorted(cumulative, rank, side='right')
+        bins = np.minimum(bins, self.n_bins - 1)
+        before = np.where(bins > 0, cumulative[bins - 1], 0)
+        inside = self.counts[bins]
+        fraction = np.where(inside > 0, (rank - before + 0.5) / np.maximum(inside, 1), 0.5)
+        values = self.lo + (bins + np.clip(fraction, 0, 1)) * self.error
+        values = np.clip(values, self.min, self.max)
+        return values if values.size > 1 else float(values[0])
+
+    def mean(self):
+        return self.total / self.n if self.n else np.nan
+
+    def std(self):
+        """انحراف معیار نمونه‌ای (ddof=1) مانند pandas"""
+        if self.n < 2:
+            return np.nan
+        variance = (self.total_sq - self.total ** 2 / self.n) / (self.n - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def describe(self):
+        """معادل تقریبی Series.describe بدون مرتب‌سازی داده‌ها"""
+        q1, median, q3 = self.quantile([0.25, 0.5, 0.75]) if self.n else (np.nan,) * 3
+        return pd.Series({
+            'count': float(self.n),
+            'mean': self.mean(),
+            'std': self.std(),
+            'min': self.min if self.n else np.nan,
+            '25%': q1,
+            '50%': median,
+            '75%': q3,
+            'max': self.max if self.n else np.nan,
+        })
+
+
+def build_sketches(df, class_column, columns, error=DEFAULT_ERROR):
+    """ساخت خلاصه چندکی برای هر ترکیب کلاس و ستون در یک گذر برداری"""
+    class_codes, class_values = pd.factorize(df[class_column], sort=True)
+    n_classes = len(class_values)
+    sketches = {}
+
+    for col in columns:
+        template = QuantileSketch(error)
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        valid = ~np.isnan(values) & (class_codes >= 0)
+        codes = class_codes[valid]
+        values = values[valid]
+
+        flat = codes * template.n_bins + template.bin_index(values)
+        counts = np.bincount(flat, minlength=n_classes * template.n_bins).reshape(n_classes, template.n_bins)
+        n = np.bincount(codes, minlength=n_classes)
+        total = np.bincount(codes, weights=values, minlength=n_classes)
+        total_sq = np.bincount(codes, weights=values ** 2, minlength=n_classes)
+        mins = np.full(n_classes, np.inf)
+        maxs = np.full(n_classes, -np.inf)
+        np.minimum.at(mins, codes, values)
+        np.maximum.at(maxs, codes, values)
+
+        for i, cls in enumerate(class_values):
+            sketch = QuantileSketch(error)
+            sketch.counts = counts[i]
+            sketch.n = int(n[i])
+            sketch.total = float(total[i])
+            sketch.total_sq = float(total_sq[i])
+            sketch.min = float(mins[i])
+            sketch.max = float(maxs[i])
+            sketches[(cls, col)] = sketch
+
+    return sketches
+
+
+def merge_sketches(sketches, classes, column):
+    """ادغام خلاصه‌های چند کلاس برای یک ستون"""
+    merged = None
+    for cls in classes:
+        sketch = sketches.get((cls, column))
+        if sketch is None:
+            continue
+        merged = sketch.copy() if merged is None else merged.merge(sketch)
+    return merged if merged is not None else QuantileSketch()
+
+
+def revise_sketches(sketches, retracted, inserted, df, class_column, columns, error=DEFAULT_ERROR):
+    """خلاصه‌های نسخه اصلاح‌شده با کم و اضافه کردن فقط سطرهای تغییرکرده
+
+    retracted و inserted: سطرهای کنار رفته و جایگزین؛ df: جدول کامل نسخه جدید که فقط
+    برای بازسازی کمینه و بیشینه کلاس‌هایی که مقدار مرزی‌شان کنار رفته خوانده می‌شود
+    """
+    old_classes = retracted[class_column].to_numpy()
+    new_classes = inserted[class_column].to_numpy()
+    old_values = retracted[columns].to_numpy(dtype=float, na_value=np.nan)
+    new_values = inserted[columns].to_numpy(dtype=float, na_value=np.nan)
+
+    revised = dict(sketches)
+    stale = []
+    for cls in set(old_classes) | set(new_classes):
+        old_block = old_values[old_classes == cls]
+        new_block = new_values[new_classes == cls]
+        for j, col in enumerate(columns):
+            sketch = revised.get((cls, col))
+            sketch = sketch.copy() if sketch is not None else QuantileSketch(error)
+            if sketch.retract(old_block[:, j]):
+                stale.append((cls, col))
+            sketch.update(new_block[:, j])
+            revised[(cls, col)] = sketch
+        # کلاسی که دیگر سطری ندارد مانند ساخت از نو کنار می‌رود
+        if all(revised[(cls, col)].n == 0 for col in columns):
+            for col in columns:
+                del revised[(cls, col)]
+
+    stale = [(cls, col) for cls, col in stale if (cls, col) in revised and revised[(cls, col)].n]
+    if stale:
+        rows = df[df[class_column].isin({cls for cls, _ in stale})]
+        grouped = rows.groupby(class_column)[sorted({col for _, col in stale}, key=columns.index)]
+        mins, maxs = grouped.min(), grouped.max()
+        for cls, col in stale:
+            revised[(cls, col)].min = float(mins.at[cls, col])
+            revised[(cls, col)].max = float(maxs.at[cls, col])
+    return revised
@@ -0,0 +1,171 @@
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparison import (
+    adjust_pvalues, anova_table, betainc, class_sufficient_stats, f_sf, pairwise_table, t_two_sided_p
+)
+
+
+@pytest.fixture(autouse=True)
+def without_scipy(monkeypatch):
+    # پیاده‌سازی جایگزین حتی با وجود scipy آزموده می‌شود
+    monkeypatch.setitem(sys.modules, 'scipy.special', None)
+
+
+@pytest.mark.parametrize('t, df, expected', [
+    (2.228, 10, 0.05),
+    (2.086, 20, 0.05),
+    (3.169, 10, 0.01),
+    (1.96, 1e6, 0.05),
+])
+def test_t_two_sided_p_matches_table(t, df, expected):
+    assert t_two_sided_p(t, df) == pytest.approx(expected, abs=5e-4)
+
+
+def test_t_two_sided_p_cauchy_closed_form():
+    # با یک درجه آزادی، توزیع t همان کوشی است
+    t = np.array([0.1, 1.0, 3.0, 50.0])
+    expected = 1 - 2 / math.pi * np.arctan(t)
+    np.testing.assert_allclose(t_two_sided_p(t, 1), expected, rtol=1e-9)
+    assert t_two_sided_p(0.0, 10) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('f, df1, df2, expected', [
+    (4.10, 2, 10, 0.05),
+    (3.89, 2, 12, 0.05),
+    (3.10, 3, 20, 0.05),
+    (7.56, 2, 10, 0.01),
+])
+def test_f_sf_matches_table(f, df1, df2, expected):
+    assert f_sf(f, df1, df2) == pytest.approx(expected, abs=5e-4)
+
+
+def test_betainc_edges():
+    assert betainc(2.5, 3.0, 0.0) == 0.0
+    assert betainc(2.5, 3.0, 1.0) == 1.0
+    assert np.isnan(betainc(2.5, 3.0, 1.5))
+    assert np.isnan(betainc(-1.0, 3.0, 0.5))
+
+
+@pytest.mark.parametrize('x', [0.1, 0.3, 0.5])
+def test_betainc_direct_branch(x):
+    # x < (a+1)/(a+b+2) = 0.6؛ I_x(2, 1) = x^2
+    assert betainc(2.0, 1.0, x) == pytest.approx(x ** 2, rel=1e-10)
+
+
+@pytest.mark.parametrize('x', [0.7, 0.9, 0.99])
+def test_betainc_symmetry_branch(x):
+    # x > (a+1)/(a+b+2) = 0.6؛ I_x(2, 1) = x^2 و I_x(1, 3) = 1 - (1-x)^3
+    assert betainc(2.0, 1.0, x) == pytest.approx(x ** 2, rel=1e-10)
+    assert betainc(1.0, 3.0, x) == pytest.approx(1 - (1 - x) ** 3, rel=1e-10)
+
+
+@pytest.mark.parametrize('a', [0.5, 2.0, 7.5])
+def test_betainc_symmetric_at_half(a):
+    assert betainc(a, a, 0.5) == pytest.approx(0.5, abs=1e-12)
+    assert betainc(a, a + 1, 0.3) == pytest.approx(1 - betainc(a + 1, a, 0.7), abs=1e-12)
+
+
+# ----------------- تصحیح مقایسه‌های چندگانه -----------------
+@pytest.mark.parametrize('p, method, expected', [
+    ([0.01, 0.04, 0.03, 0.005], 'holm', [0.03, 0.06, 0.06, 0.02]),
+    ([0.01, 0.04, 0.03, 0.005], 'fdr_bh', [0.02, 0.04, 0.04, 0.02]),
+    ([0.01, 0.04, 0.03, 0.005], 'bonferroni', [0.04, 0.16, 0.12, 0.02]),
+    ([0.01, 0.02, 0.03, 0.04, 0.05], 'holm', [0.05, 0.08, 0.09, 0.09, 0.09]),
+    ([0.01, 0.02, 0.03, 0.04, 0.05], 'fdr_bh', [0.05] * 5),
+    ([0.3, 0.6], 'bonferroni', [0.6, 1.0]),
+])
+def test_adjust_pvalues_known_values(p, method, expected):
+    np.testing.assert_allclose(adjust_pvalues(p, method)[0], expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('holm', [0.02, np.nan, 0.04]),
+    ('fdr_bh', [0.02, np.nan, 0.04]),
+    ('bonferroni', [0.02, np.nan, 0.08]),
+])
+def test_adjust_pvalues_ignores_nan(method, expected):
+    # آزمون‌های انجام‌نشده در تعداد خانواده شمرده نمی‌شوند
+    np.testing.assert_allclose(adjust_pvalues([0.01, np.nan, 0.04], method)[0], expected, rtol=1e-12)
+    assert np.isnan(adjust_pvalues([np.nan, np.nan], method)).all()
+
+
+@pytest.mark.parametrize('method', ['holm', 'fdr_bh', 'bonferroni'])
+def test_adjust_pvalues_monotone_per_row(method):
+    p = np.random.default_rng(1).uniform(0, 0.2, size=(4, 30))
+    p[0, ::7] = np.nan
+    adjusted = adjust_pvalues(p, method)
+    for row, adjusted_row in zip(p, adjusted):
+        valid = ~np.isnan(row)
+        order = np.argsort(row[valid])
+        assert (np.diff(adjusted_row[valid][order]) >= -1e-15).all()
+        assert (adjusted_row[valid] >= row[valid] - 1e-15).all() and (adjusted_row[valid] <= 1).all()
+        np.testing.assert_array_equal(np.isnan(adjusted_row), ~valid)
+    # هر سطر خانواده جداگانه است
+    np.testing.assert_allclose(adjusted[1], adjust_pvalues(p[1], method)[0])
+
+
+def test_adjust_pvalues_unknown_method():
+    with pytest.raises(ValueError):
+        adjust_pvalues([0.1], 'sidak')
+
+
+# ----------------- تحلیل واریانس و آزمون‌های جفتی -----------------
+def _stats(groups):
+    rows = [(name, score) for name, scores in groups.items() for score in scores]
+    df = pd.DataFrame(rows, columns=['کلاس', 'ریاضی'])
+    # درسی که فقط یک کلاس نمره دارد آزمون‌پذیر نیست
+    df['علوم'] = np.where(df['کلاس'] == 'الف', df['ریاضی'], np.nan)
+    return class_sufficient_stats(df, 'کلاس', ['ریاضی', 'علوم'])
+
+
+def test_anova_table_hand_computed():
+    # میانگین‌ها ۲، ۵، ۸ و میانگین کل ۵: SSB = 54، SSW = 6، F = (54/2)/(6/6) = 27
+    table = anova_table(_stats({'الف': [1, 2, 3], 'ب': [4, 5, 6], 'ج': [7, 8, 9]})).set_index('درس')
+    math_row = table.loc['ریاضی']
+    assert math_row['F'] == pytest.approx(27.0)
+    assert math_row['درجه آزادی'] == '2, 6'
+    # برای df1 = 2 دم راست F برابر (1 + 2F/df2)^(-df2/2) است
+    assert math_row['p'] == pytest.approx(10.0 ** -3, rel=1e-9)
+    assert math_row['اندازه اثر (η²)'] == pytest.approx(0.9)
+    assert bool(math_row['معنادار'])
+    assert np.isnan(table.loc['علوم', 'p']) and not table.loc['علوم', 'معنادار']
+
+
+def test_anova_table_with_single_student_and_zero_variance_classes():
+    # کلاس تک‌نفره و کلاس بدون پراکندگی با میانگین کل ۵ فقط درجه آزادی را تغییر می‌دهند
+    stats = _stats({'الف': [1, 2, 3], 'ب': [4, 5, 6], 'ج': [7, 8, 9], 'د': [5], 'ه': [5, 5]})
+    math_row = anova_table(stats).set_index('درس').loc['ریاضی']
+    assert math_row['تعداد کلاس'] == 5
+    assert math_row['درجه آزادی'] == '4, 7'
+    assert math_row['F'] == pytest.approx((54 / 4) / (6 / 7), abs=5e-4)
+    assert math_row['اندازه اثر (η²)'] == pytest.approx(0.9)
+
+
+def test_pairwise_table_welch_known_values():
+    stats = _stats({'الف': [0, 2], 'ب': [3, 5], 'ج': [10, 10], 'د': [7, 7], 'ه': [9]})
+    pairs = pairwise_table(stats, method='holm')
+    math_pairs = pairs[pairs['درس'] == 'ریاضی'].set_index(['کلاس اول', 'کلاس دوم'])
+
+    # جفت‌های دارای کلاس تک‌نفره و جفت دو کلاس بدون پراکندگی آزموده نمی‌شوند
+    assert set(math_pairs.index) == {('الف', 'ب'), ('الف', 'ج'), ('الف', 'د'), ('ب', 'ج'), ('ب', 'د')}
+    assert (pairs['درس'] == 'ریاضی').all()
+
+    # واریانس‌های برابر با n = 2: درجه آزادی ولش ۲ و p = 1 - |t| / sqrt(2 + t^2)
+    t = -3 / math.sqrt(2)
+    row = math_pairs.loc[('الف', 'ب')]
+    assert row['t'] == pytest.approx(t, abs=5e-4)
+    assert row['درجه آزادی'] == pytest.approx(2.0)
+    assert row['p'] == pytest.approx(1 - abs(t) / math.sqrt(2 + t * t), rel=1e-9)
+
+    # یک طرف بدون پراکندگی: درجه آزادی ۱ و توزیع کوشی
+    row = math_pairs.loc[('الف', 'ج')]
+    assert row['درجه آزادی'] == pytest.approx(1.0)
+    assert row['p'] == pytest.approx(1 - 2 / math.pi * math.atan(9), rel=1e-9)
+
+    # تصحیح فقط روی جفت‌های آزمون‌شده همان درس
+    np.testing.assert_allclose(math_pairs['p تصحیح‌شده'], adjust_pvalues(math_pairs['p'].to_numpy(), 'holm')[0])
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import AVERAGE_COLUMN, prepare_sheet
+from comparison import class_sufficient_stats, revise_sufficient_stats
+from delta import revise_sheet
+from risk import class_baselines, revise_baselines
+from sketches import build_sketches, revise_sketches
+from thresholds import pass_curves, revise_pass_curves
+
+SUBJECTS = ['ریاضی', 'علوم', 'ادبیات']
+
+
+@pytest.fixture
+def sheet():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'نام': [f'علی{i}' for i in range(60)],
+        'نام خانوادگی': [f'احمدی{i}' for i in range(60)],
+        'کلاس': [str(i % 3 + 1) for i in range(60)],
+    })
+    for subject in SUBJECTS:
+        df[subject] = rng.uniform(5, 20, len(df)).round(2)
+    # کلاس ۳ در ریاضی پراکندگی ندارد
+    df.loc[df['کلاس'] == '3', 'ریاضی'] = 15.0
+    return df
+
+
+def revisions(df):
+    edited = df.copy()
+    edited.loc[[0, 4], 'ریاضی'] = [2.0, 19.5]
+    edited.loc[2, 'ریاضی'] = 14.0
+    edited.loc[7, SUBJECTS] = np.nan
+    reordered = pd.concat([df.drop(index=[10, 11]), df.iloc[[1]].assign(نام='جدید')], ignore_index=True)
+    reordered.loc[30, 'علوم'] = 3.0
+    return {'edited': edited, 'reordered': reordered}
+
+
+@pytest.mark.parametrize('kind', ['edited', 'reordered'])
+def test_revision_matches_full_rebuild(sheet, kind):
+    previous = prepare_sheet(sheet)
+    new_df = revisions(sheet)[kind]
+    revised = revise_sheet(previous, new_df)
+    full = prepare_sheet(new_df)
+    columns = SUBJECTS + [AVERAGE_COLUMN]
+
+    assert revised.delta.aligned == (kind == 'edited')
+    pd.testing.assert_frame_equal(revised.df_clean, full.df_clean, check_dtype=False)
+
+    retracted, inserted = revised.delta.retracted, revised.delta.inserted
+    sketches = revise_sketches(build_sketches(previous.df_clean, 'کلاس', columns), retracted, inserted, full.df_clean, 'کلاس', columns)
+    expected = build_sketches(full.df_clean, 'کلاس', columns)
+    assert set(sketches) == set(expected)
+    for key, sketch in expected.items():
+        assert np.array_equal(sketches[key].counts, sketch.counts)
+        assert (sketches[key].min, sketches[key].max) == (sketch.min, sketch.max)
+
+    curves = revise_pass_curves(pass_curves(previous.df_clean, 'کلاس', columns), retracted, inserted, 'کلاس')
+    assert np.array_equal(curves.passed, pass_curves(full.df_clean, 'کلاس', columns).passed)
+
+    stats = revise_sufficient_stats(class_sufficient_stats(previous.df_clean, 'کلاس', columns), retracted, inserted, 'کلاس')
+    expected_stats = class_sufficient_stats(full.df_clean, 'کلاس', columns)
+    np.testing.assert_array_equal(stats.n, expected_stats.n)
+    np.testing.assert_allclose(stats.mean, expected_stats.mean)
+    np.testing.assert_allclose(stats.var, expected_stats.var, atol=1e-12)
+
+    baselines = revise_baselines(class_baselines(previous.df_clean, 'کلاس', SUBJECTS), retracted, inserted, 'کلاس')
+    expected_baselines = class_baselines(full.df_clean, 'کلاس', SUBJECTS)
+    np.testing.assert_allclose(baselines.stds, expected_baselines.stds, atol=1e-12)
+
+
+def test_zero_spread_class_stays_exact(sheet):
+    # بازگشت کلاس ۳ به نمره یکسان باید واریانس دقیقاً صفر بدهد
+    previous = prepare_sheet(revisions(sheet)['edited'])
+    revised = revise_sheet(previous, sheet)
+    stats = revise_sufficient_stats(
+        class_sufficient_stats(previous.df_clean, 'کلاس', SUBJECTS),
+        revised.delta.retracted, revised.delta.inserted, 'کلاس'
+    )
+    assert stats.var[stats.classes.index('3'), 0] == 0.0
+
+
+def test_new_class_falls_back_to_rebuild(sheet):
+    previous = prepare_sheet(sheet)
+    new_df = sheet.copy()
+    new_df.loc[5, 'کلاس'] = '9'
+    revised = revise_sheet(previous, new_df)
+    curves = pass_curves(previous.df_clean, 'کلاس', SUBJECTS)
+    assert revise_pass_curves(curves, revised.delta.retracted, revised.delta.inserted, 'کلاس') is None
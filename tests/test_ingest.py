@@ -0,0 +1,50 @@
+import importlib
+import sys
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+
+from analysis import detect_column_roles
+from ingest import PREFLIGHT_OK, PREFLIGHT_REJECT, preflight_workbook
+
+
+@pytest.fixture
+def workbook_with_empty_sheet():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'پایه هفتم'
+    sheet.append(['نام', 'نام خانوادگی', 'کلاس', 'ریاضی', 'علوم'])
+    for i in range(12):
+        sheet.append([f'علی{i}', f'احمدی{i}', str(i % 2 + 1), 12 + i % 8, 14 + i % 5])
+    workbook.create_sheet('خالی')
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_detect_column_roles_without_columns():
+    import pandas as pd
+
+    roles = detect_column_roles(pd.DataFrame())
+    assert roles.class_column is None
+    assert roles.subject_columns == []
+
+
+def test_preflight_rejects_only_the_empty_sheet(workbook_with_empty_sheet):
+    preflight = preflight_workbook(workbook_with_empty_sheet, 'a.xlsx')
+    assert preflight['خالی'].status == PREFLIGHT_REJECT
+    assert preflight['خالی'].roles.class_column is None
+    assert preflight['پایه هفتم'].status == PREFLIGHT_OK
+    assert preflight['پایه هفتم'].roles.subject_columns == ['ریاضی', 'علوم']
+
+
+def test_upload_types_without_pyarrow(monkeypatch):
+    import ingest
+
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    try:
+        assert importlib.reload(ingest).UPLOAD_TYPES == ['xlsx', 'xls', 'csv']
+    finally:
+        monkeypatch.undo()
+        importlib.reload(ingest)
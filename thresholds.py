@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ----------------- منحنی‌های «اگر نمره قبولی ... باشد» -----------------
+# نمرات هر (کلاس، درس) یک بار روی شبکه آستانه‌ها شمارش می‌شوند؛ جمع تجمعی از
+# انتها تعداد قبولی را برای همه آستانه‌ها با هم می‌دهد و هر سؤال بعدی فقط یک
+# نگاه به آرایه است.
+
+MAX_SCORE = 20
+RESOLUTIONS = [0.25, 0.5, 1.0]
+
+
+@dataclass
+class PassCurves:
+    """تعداد قبولی هر (کلاس، درس) برای همه آستانه‌ها"""
+    thresholds: np.ndarray
+    classes: list
+    subjects: list
+    # passed[c, s, t]: تعداد نمرات کلاس c در درس s که دست‌کم thresholds[t] هستند
+    passed: np.ndarray
+    # totals[c, s]: تعداد نمرات موجود
+    totals: np.ndarray
+
+    def _class_rows(self, classes):
+        if classes is None:
+            return slice(None)
+        return [self.classes.index(cls) for cls in classes if cls in self.classes]
+
+    def threshold_index(self, threshold):
+        return int(np.clip(np.searchsorted(self.thresholds, threshold - 1e-9), 0, len(self.thresholds) - 1))
+
+    def subject_curves(self, classes=None):
+        """درصد قبولی هر درس بر حسب آستانه، برای مجموع کلاس‌های داده‌شده"""
+        rows = self._class_rows(classes)
+        passed = self.passed[rows].sum(axis=0)
+        totals = self.totals[rows].sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = 100 * passed / totals[:, None]
+        return pd.DataFrame(rates.T, index=pd.Index(self.thresholds, name='آستانه'), columns=self.subjects)
+
+    def at(self, threshold, classes=None):
+        """تعداد و درصد قبولی هر (کلاس، درس) در یک آستانه"""
+        rows = self._class_rows(classes)
+        index = self.threshold_index(threshold)
+        class_labels = self.classes if classes is None else [self.classes[r] for r in rows]
+        passed = self.passed[rows, :, index]
+        totals = self.totals[rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = 100 * passed / totals
+        counts = pd.DataFrame(passed, index=class_labels, columns=self.subjects)
+        rates = pd.DataFrame(rates, index=class_labels, columns=self.subjects).round(1)
+        return counts, rates
+
+
+def pass_curves(df, class_column, columns, resolution=0.5):
+    """ساخت منحنی‌های قبولی از هیستوگرام تجمعی ماتریس نمرات"""
+    thresholds = np.round(np.arange(0, MAX_SCORE + resolution / 2, resolution), 6)
+    class_codes, classes = pd.factorize(df[class_column], sort=True)
+    counts = _bin_counts(df, class_codes, len(classes), columns, thresholds)
+    passed = counts[:, :, ::-1].cumsum(axis=2)[:, :, ::-1]
+    return PassCurves(
+        thresholds=thresholds,
+        classes=list(classes),
+        subjects=list(columns),
+        passed=passed,
+        totals=counts.sum(axis=2)
+    )
+
+
+def _bin_counts(df, class_codes, n_classes, columns, thresholds):
+    """شمارش نمرات هر (کلاس، درس) در سطل‌های آستانه"""
+    n_bins, n_subjects = len(thresholds), len(columns)
+    resolution = thresholds[1] - thresholds[0]
+    scores = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(scores) & (class_codes >= 0)[:, None]
+    # نمره x در سطل k قرار می‌گیرد اگر thresholds[k] <= x < thresholds[k + 1]
+    bins = np.clip(np.floor(np.nan_to_num(scores) / resolution + 1e-9), 0, n_bins - 1).astype(np.int64)
+    cells = (class_codes[:, None] * n_subjects + np.arange(n_subjects)) * n_bins + bins
+
+    counts = np.bincount(cells[valid], minlength=n_classes * n_subjects * n_bins)
+    return counts.reshape(n_classes, n_subjects, n_bins)
+
+
+def revise_pass_curves(curves, retracted, inserted, class_column):
+    """منحنی‌های نسخه اصلاح‌شده با کم و اضافه کردن شمارش سطرهای تغییرکرده
+
+    اگر کلاسی اضافه یا حذف شده باشد None برمی‌گرداند تا منحنی‌ها از نو ساخته شوند.
+    """
+    classes = pd.Index(curves.classes)
+    old_codes = classes.get_indexer(retracted[class_column])
+    new_codes = classes.get_indexer(inserted[class_column])
+    if (new_codes < 0).any():
+        return None
+
+    n_classes = len(classes)
+    change = (
+        _bin_counts(inserted, new_codes, n_classes, curves.subjects, curves.thresholds)
+        - _bin_counts(retracted, old_codes, n_classes, curves.subjects, curves.thresholds)
+    )
+    totals = curves.totals + change.sum(axis=2)
+    if (totals.sum(axis=1) == 0).any():
+        return None
+    return PassCurves(
+        thresholds=curves.thresholds,
+        classes=curves.classes,
+        subjects=curves.subjects,
+        passed=curves.passed + change[:, :, ::-1].cumsum(axis=2)[:, :, ::-1],
+        totals=totals
+    )
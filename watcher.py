@@ -0,0 +1,172 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from analysis import prepare_sheet
+from ingest import workbook_hash
+
+# ----------------- پایش پوشه خروجی‌های سامانه مدرسه -----------------
+# سامانه مدیریت مدرسه هر چند ساعت یک فایل با نام YYYYMMDD_HHMM.xlsx در پوشه
+# مشترک می‌گذارد. پایشگر فایل‌های جدید را پس از پایدار شدن اندازه و زمان تغییر
+# در یک مخزن کارگر محدود پردازش می‌کند و آخرین نسخه آماده را در اختیار داشبورد
+# می‌گذارد؛ جایگزینی نسخه‌ها با یک انتساب زیر قفل انجام می‌شود.
+
+EXPORT_PATTERN = re.compile(r'^\d{8}_\d{4}\.xlsx?$')
+
+
+@dataclass
+class WorkbookSnapshot:
+    """نسخه پردازش‌شده یک فایل خروجی"""
+    name: str
+    path: str
+    sheet_names: list
+    sheets: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    ready_at: float = 0.0
+    # شناسه محتوای فایل برای کلیدهای کش
+    content_hash: str = ''
+
+
+def build_snapshot(path):
+    """خواندن همه شیت‌های یک فایل و پیش‌پردازش آن‌ها"""
+    xls = pd.ExcelFile(path)
+    snapshot = WorkbookSnapshot(
+        name=os.path.basename(path),
+        path=path,
+        sheet_names=list(xls.sheet_names),
+        content_hash=workbook_hash(path)
+    )
+    for sheet_name in xls.sheet_names:
+        try:
+            snapshot.sheets[sheet_name] = prepare_sheet(xls.parse(sheet_name))
+        except Exception as e:
+            snapshot.errors[sheet_name] = str(e)
+    snapshot.ready_at = time.time()
+    return snapshot
+
+
+class WorkbookWatcher:
+    """پایشگر پس‌زمینه یک پوشه محلی برای فایل‌های خروجی جدید"""
+
+    def __init__(self, directory, poll_interval=5.0, debounce=3.0, max_workers=2):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ravesh-ingest')
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._latest = None
+        self._seen = {}       # نام فایل -> (اندازه، زمان تغییر، اولین زمان مشاهده این وضعیت)
+        self._submitted = {}  # نام فایل -> (اندازه، زمان تغییر) آخرین نسخه ارسال‌شده
+        self._pending = set()
+        self.errors = {}  # نام فایل یا پوشه -> آخرین خطا، به ترتیب وقوع
+
+    # ---------- چرخه عمر ----------
+    def start(self):
+        if self._thread is None:
+            self._seed_existing()
+            self._thread = threading.Thread(target=self._run, name='ravesh-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def latest(self):
+        """آخرین نسخه آماده (یا None)"""
+        with self._lock:
+            return self._latest
+
+    @property
+    def pending(self):
+        """نسخه‌ای از فهرست فایل‌های در حال پردازش (ایمن برای خواندن از رشته دیگر)"""
+        with self._lock:
+            return frozenset(self._pending)
+
+    def latest_error(self):
+        """آخرین خطای پایش به صورت (نام، پیام) یا None"""
+        with self._lock:
+            return next(reversed(self.errors.items()), None)
+
+    def _record_error(self, name, error):
+        with self._lock:
+            # حذف و درج دوباره تا ترتیب دیکشنری همان ترتیب وقوع بماند
+            self.errors.pop(name, None)
+            self.errors[name] = str(error)
+
+    def _seed_existing(self):
+        """ثبت فایل‌های موجود پوشه به عنوان دیده‌شده تا خروجی‌های قدیمی دوباره پردازش نشوند
+
+        فقط جدیدترین خروجی (بر اساس نام تاریخ‌دار) برای نمایش اولیه پردازش می‌شود.
+        """
+        try:
+            entries = [
+                entry for entry in os.scandir(self.directory)
+                if entry.is_file() and EXPORT_PATTERN.match(entry.name)
+            ]
+        except OSError as e:
+            self._record_error(self.directory, e)
+            return
+        for entry in sorted(entries, key=lambda e: e.name)[:-1]:
+            stat = entry.stat()
+            self._submitted[entry.name] = (stat.st_size, stat.st_mtime)
+
+    # ---------- حلقه پایش ----------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except OSError as e:
+                self._record_error(self.directory, e)
+            else:
+                with self._lock:
+                    self.errors.pop(self.directory, None)
+            self._stop.wait(self.poll_interval)
+
+    def scan(self):
+        """بررسی یک‌باره پوشه و ارسال فایل‌های پایدار برای پردازش"""
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not EXPORT_PATTERN.match(entry.name):
+                continue
+            stat = entry.stat()
+            state = (stat.st_size, stat.st_mtime)
+
+            previous = self._seen.get(entry.name)
+            if previous is None or previous[:2] != state:
+                # فایل تازه است یا هنوز در حال نوشته شدن است
+                self._seen[entry.name] = state + (now,)
+                continue
+            if now - previous[2] < self.debounce:
+                continue
+            with self._lock:
+                if self._submitted.get(entry.name) == state or entry.name in self._pending:
+                    continue
+                self._submitted[entry.name] = state
+                self._pending.add(entry.name)
+            future = self._executor.submit(build_snapshot, entry.path)
+            future.add_done_callback(lambda f, name=entry.name: self._on_done(name, f))
+
+    def _on_done(self, name, future):
+        with self._lock:
+            self._pending.discard(name)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._record_error(name, error)
+            return
+
+        snapshot = future.result()
+        with self._lock:
+            self.errors.pop(name, None)
+            # نام فایل‌ها بر اساس تاریخ و ساعت مرتب می‌شوند؛ فقط نسخه جدیدتر جایگزین می‌شود
+            if self._latest is None or snapshot.name >= self._latest.name:
+                self._latest = snapshot